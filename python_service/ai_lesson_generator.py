@@ -2,48 +2,71 @@
 import json
 import joblib
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any
 from ai_service import AIService
+from lesson_store import LessonContentStore, lesson_key, validate_lesson_content
+from lesson_index import DatasetLessonIndex
+
+# Serve dataset lessons immediately and let the LLM enrich them in the background
+LESSON_ENRICHMENT_ENABLED = os.getenv("LESSON_ENRICHMENT_ENABLED", "1") == "1"
 
 class AILessonGenerator:
-    def __init__(self):
+    def __init__(self, encoder=None):
         self.ai_service = AIService()
+        self.content_store = LessonContentStore()    # Pre-generated lessons (pregenerate_lessons.py)
+        self.lesson_index = DatasetLessonIndex(encoder=encoder)    # Lessons from trig_dataset.json
         self.is_trained = True
         
+        # Dataset lessons merged with LLM content, keyed by lesson_key()
+        self._enriched_lessons = {}
+        self._enrichment_pending = set()
+        self._enrichment_lock = threading.Lock()
+        self._enrichment_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="lesson-enrich")
+        
     def train_lesson_generator(self):
         """No training needed for API-based service"""
         print("🎓 AI Lesson Generator ready (API-based)")
         return True
 
-    def generate_ai_lesson(self, topic_id: str, section_index: int) -> Dict[str, Any]:
+    def generate_ai_lesson(self, topic_id: str, section_index: int, student_level: str = "beginner") -> Dict[str, Any]:
         """Generate AI-powered lesson content using Namibia syllabus"""
+        
+        # Serve the pre-generated section if it was produced from the current prompt
+        stored_content = self.content_store.get(
+            topic_id, section_index, student_level,
+            self.ai_service.lesson_prompt_hash(topic_id, section_index, student_level)
+        )
+        if stored_content:
+            print(f"📦 Serving pre-generated lesson for {topic_id}, section {section_index}")
+            return self._build_lesson_structure(topic_id, section_index, stored_content, 'pregenerated_namibia_syllabus')
+        
+        key = lesson_key(topic_id, section_index, student_level)
+        with self._enrichment_lock:
+            enriched_content = self._enriched_lessons.get(key)
+        if enriched_content:
+            return self._build_lesson_structure(topic_id, section_index, enriched_content, 'dataset_lesson_enriched')
+        
+        # Dataset lessons render without a network call; the LLM only adds to them
+        dataset_content = self.lesson_index.get_section(topic_id, section_index)
+        if dataset_content:
+            print(f"📚 Serving dataset lesson {dataset_content['dataset_lesson_id']} for {topic_id}, section {section_index}")
+            self._schedule_enrichment(topic_id, section_index, student_level, dataset_content)
+            return self._build_lesson_structure(topic_id, section_index, dataset_content, 'dataset_lesson')
+        
+        if not self.ai_service.is_available():
+            return self._get_degraded_lesson(topic_id, section_index, student_level)
+        
         print(f"🤖 Generating Namibia syllabus lesson for {topic_id}, section {section_index}")
         
         try:
             # Get AI-generated content with Namibia context
-            ai_content = self.ai_service.generate_lesson_content(topic_id, section_index)
+            ai_content = self.ai_service.generate_lesson_content(topic_id, section_index, student_level)
+            if ai_content.get('fallback'):
+                return self._get_degraded_lesson(topic_id, section_index, student_level)
             
-            # Build comprehensive lesson structure
-            lesson_structure = {
-                'topic_id': topic_id,
-                'title': f"Namibia NSSCAS: {ai_content.get('title', topic_id.replace('_', ' ').title())}",
-                'description': f"Namibia Syllabus 8227 - {topic_id.replace('_', ' ').title()}",
-                'current_section': {
-                    'title': ai_content.get('title', f'Section {section_index + 1}'),
-                    'content': ai_content.get('content', []),
-                    'worked_examples': ai_content.get('worked_examples', []),
-                    'applications': ai_content.get('applications', []),
-                    'misconceptions': ai_content.get('misconceptions', []),
-                    'practice_questions': ai_content.get('practice_questions', []),
-                    'ai_generated': True
-                },
-                'section_index': section_index,
-                'total_sections': 4,
-                'learning_objectives': self._generate_learning_objectives(topic_id),
-                'ai_generated': True,
-                'method': 'namibia_syllabus_ai',
-                'syllabus_alignment': ai_content.get('syllabus_alignment', {})
-            }
+            lesson_structure = self._build_lesson_structure(topic_id, section_index, ai_content, 'namibia_syllabus_ai')
             
             print(f"✅ Generated Namibia lesson with {len(ai_content.get('content', []))} content points")
             return lesson_structure
@@ -52,6 +75,79 @@ class AILessonGenerator:
             print(f"❌ Error generating Namibia lesson: {e}")
             return self._get_fallback_lesson(topic_id, section_index)
 
+    def _build_lesson_structure(self, topic_id: str, section_index: int, ai_content: Dict[str, Any], method: str) -> Dict[str, Any]:
+        """Build comprehensive lesson structure"""
+        return {
+            'topic_id': topic_id,
+            'title': f"Namibia NSSCAS: {ai_content.get('title', topic_id.replace('_', ' ').title())}",
+            'description': f"Namibia Syllabus 8227 - {topic_id.replace('_', ' ').title()}",
+            'current_section': {
+                'title': ai_content.get('title', f'Section {section_index + 1}'),
+                'content': ai_content.get('content', []),
+                'worked_examples': ai_content.get('worked_examples', []),
+                'applications': ai_content.get('applications', []),
+                'misconceptions': ai_content.get('misconceptions', []),
+                'practice_questions': ai_content.get('practice_questions', []),
+                'ai_generated': method != 'dataset_lesson'
+            },
+            'section_index': section_index,
+            'total_sections': 4,
+            'learning_objectives': self._generate_learning_objectives(topic_id),
+            'ai_generated': method != 'dataset_lesson',
+            'method': method,
+            'syllabus_alignment': ai_content.get('syllabus_alignment', {})
+        }
+
+    def _schedule_enrichment(self, topic_id: str, section_index: int, student_level: str, dataset_content: Dict[str, Any]):
+        """Ask the LLM for the section once, in the background, and merge it into the dataset lesson"""
+        if not LESSON_ENRICHMENT_ENABLED or not self.ai_service.is_available():
+            return
+        key = lesson_key(topic_id, section_index, student_level)
+        with self._enrichment_lock:
+            if key in self._enrichment_pending or key in self._enriched_lessons:
+                return
+            self._enrichment_pending.add(key)
+        self._enrichment_pool.submit(self._enrich_lesson, key, topic_id, section_index, student_level, dataset_content)
+
+    def _enrich_lesson(self, key: str, topic_id: str, section_index: int, student_level: str, dataset_content: Dict[str, Any]):
+        try:
+            ai_content = self.ai_service.generate_lesson_content(topic_id, section_index, student_level)
+            problems = validate_lesson_content(ai_content)
+            if problems:
+                print(f"⚠️ Lesson enrichment for {key} skipped: {', '.join(problems)}")
+                return
+            enriched = self._merge_lesson_content(dataset_content, ai_content)
+            with self._enrichment_lock:
+                self._enriched_lessons[key] = enriched
+            print(f"✨ Enriched dataset lesson for {key}")
+        except Exception as e:
+            print(f"❌ Lesson enrichment failed for {key}: {e}")
+        finally:
+            with self._enrichment_lock:
+                self._enrichment_pending.discard(key)
+
+    def _merge_lesson_content(self, dataset_content: Dict[str, Any], ai_content: Dict[str, Any]) -> Dict[str, Any]:
+        """Dataset content first, followed by whatever the LLM adds that the dataset does not have"""
+        def merged(field, identity):
+            items = list(dataset_content.get(field, []))
+            seen = {identity(item) for item in items}
+            for item in ai_content.get(field, []):
+                if identity(item) not in seen:
+                    items.append(item)
+                    seen.add(identity(item))
+            return items
+        
+        text = lambda item: str(item).strip().lower()
+        return {
+            **dataset_content,
+            'content': merged('content', text),
+            'worked_examples': merged('worked_examples', lambda e: text(e.get('problem', '')) if isinstance(e, dict) else text(e)),
+            'applications': merged('applications', text),
+            'misconceptions': merged('misconceptions', text),
+            'practice_questions': merged('practice_questions', lambda q: text(q.get('question', '')) if isinstance(q, dict) else text(q)),
+            'syllabus_alignment': ai_content.get('syllabus_alignment') or dataset_content.get('syllabus_alignment', {})
+        }
+
     def answer_student_question(self, question: str, topic_id: str, conversation_history: List = None) -> Dict[str, Any]:
         """Answer student questions using Namibia syllabus AI"""
         try:
@@ -62,6 +158,7 @@ class AILessonGenerator:
                 'worked_example': response.get('worked_example', {}),
                 'key_concepts': response.get('key_concepts', []),
                 'examination_tips': response.get('examination_tips', []),
+                'fallback': response.get('fallback', False) or 'error' in response,
                 'method': 'namibia_syllabus_qa'
             }
         except Exception as e:
@@ -143,6 +240,18 @@ class AILessonGenerator:
         formatted += "\n*Aligned with Namibia NSSCAS Mathematics Syllabus 8227*"
         return formatted
 
+    def _get_degraded_lesson(self, topic_id: str, section_index: int, student_level: str) -> Dict[str, Any]:
+        """Lesson to serve while the AI service is unavailable: any stored version, else the fallback"""
+        stored_content = self.content_store.get_any(topic_id, section_index, student_level)
+        if stored_content:
+            print(f"🛟 AI unavailable, serving stored lesson for {topic_id}, section {section_index}")
+            lesson = self._build_lesson_structure(topic_id, section_index, stored_content, 'degraded_stored_lesson')
+        else:
+            print(f"🛟 AI unavailable, serving fallback lesson for {topic_id}, section {section_index}")
+            lesson = self._get_fallback_lesson(topic_id, section_index)
+        lesson['degraded'] = True
+        return lesson
+
     def _get_fallback_lesson(self, topic_id: str, section_index: int) -> Dict[str, Any]:
         """Provide fallback Namibia syllabus lesson content"""
         return {
@@ -20,6 +20,14 @@ else:
     load_dotenv()
     print(f"📁 Trying current directory: {os.getcwd()}")
 from namibia_syllabus_context import get_syllabus_context, get_topic_specific_prompt, generate_namibia_style_question
+from single_flight import SingleFlight, make_request_key
+from token_accounting import TokenUsageTracker, compact_prompt, estimate_tokens
+from json_extract import IncrementalJSONExtractor, extract_json
+from model_router import ModelRouter
+from circuit_breaker import CircuitBreaker
+import time
+
+SYSTEM_PROMPT = "You are an expert Namibia NSSCAS Mathematics examiner and teacher. Always provide accurate, syllabus-aligned responses with step-by-step working. Always return valid JSON format."
 
 class AIService:
     def __init__(self):
@@ -33,13 +41,27 @@ class AIService:
         else:
             print(f"✅ Groq API Key loaded: {self.api_key[:8]}...")
         
-        self.base_url = "https://api.groq.com/openai/v1"
+        # AI_BASE_URL lets any OpenAI-compatible server (e.g. llm_stub_server.py) stand in for Groq
+        self.base_url = os.getenv("AI_BASE_URL", "https://api.groq.com/openai/v1").rstrip("/")
         self.model = "llama-3.1-8b-instant"  
+        self.temperature = 0.3
+        self.max_tokens = 2000
+        
+        # Identical concurrent prompts share one upstream call
+        self.single_flight = SingleFlight()
+        self.token_usage = TokenUsageTracker()
+        # Set from Retry-After when the API answers 429, so batch jobs can back off
+        self.rate_limited_until = 0.0
+        # Picks model, max_tokens and temperature per request
+        self.model_router = ModelRouter()
+        # Fails fast while Groq is down or slow instead of waiting out the timeout
+        self.circuit_breaker = CircuitBreaker("groq")
+        self.request_timeout = float(os.getenv("AI_REQUEST_TIMEOUT", "30"))
         
-        print(f"🤖 AI Service: Groq + {self.model}")
+        print(f"🤖 AI Service: {self.base_url} + {self.model}")
     
-    def generate_lesson_content(self, topic_id: str, section_index: int, student_level: str = "beginner") -> Dict[str, Any]:
-        """Generate Namibia syllabus-aligned lesson content"""
+    def build_lesson_prompt(self, topic_id: str, section_index: int, student_level: str = "beginner") -> str:
+        """Render the lesson generation prompt for one section"""
         
         syllabus_context = get_syllabus_context(topic_id)
         topic_focus = get_topic_specific_prompt(topic_id, section_index)
@@ -97,8 +119,19 @@ class AIService:
         }}
         """
         
-        response = self._call_ai_api(prompt)
-        return self._parse_lesson_response(response)
+        return prompt
+    
+    def lesson_prompt_hash(self, topic_id: str, section_index: int, student_level: str = "beginner") -> str:
+        """Hash of the full request a lesson would be generated from (prompt, model, temperature...)"""
+        prompt = self.build_lesson_prompt(topic_id, section_index, student_level)
+        return make_request_key(self._build_request_payload(prompt, self.model_router.route("lesson")))
+    
+    def generate_lesson_content(self, topic_id: str, section_index: int, student_level: str = "beginner") -> Dict[str, Any]:
+        """Generate Namibia syllabus-aligned lesson content"""
+        prompt = self.build_lesson_prompt(topic_id, section_index, student_level)
+        return self._coalesced_call(prompt, self._parse_lesson_response, "lesson",
+                                    self._context_tokens_saved(topic_id, get_syllabus_context(topic_id)),
+                                    self.model_router.route("lesson"))
     
     def answer_student_question(self, question: str, topic_id: str, conversation_history: List = None) -> Dict[str, Any]:
         
@@ -141,8 +174,9 @@ class AIService:
         IMPORTANT: Make sure ALL steps are complete and nothing is cut off.
         """
     
-       response = self._call_ai_api(prompt)
-       return self._parse_qa_response(response)
+       return self._coalesced_call(prompt, self._parse_qa_response, "qa",
+                                   self._context_tokens_saved(topic_id, syllabus_context),
+                                   self.model_router.route("qa", question, topic_id))
     
     def generate_assessment_questions(self, topic_id: str, question_type: str, difficulty: str, num_questions: int = 5) -> List[Dict]:
         """Generate Namibia examination-style assessment questions"""
@@ -177,141 +211,195 @@ class AIService:
         ]
         """
         
-        response = self._call_ai_api(prompt)
-        return self._parse_assessment_response(response)
+        return self._coalesced_call(prompt, self._parse_assessment_response, "assessment",
+                                    self._context_tokens_saved(topic_id, syllabus_context),
+                                    self.model_router.route("assessment"))
     
     def clean_ai_response(self, response: str) -> str:
         """Clean AI response to extract pure JSON"""
-    # Remove all text before first [ and after last ]
-        start = response.find('[')
-        end = response.rfind(']') + 1
+        value, _ = extract_json(response, expect='[')
+        if value is None:
+            return response  # Return as-is if no cleaning worked
+        return json.dumps(value, ensure_ascii=False)
+    
+    def _build_request_payload(self, prompt: str, tier: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Render the exact chat completion request sent upstream"""
+        tier = tier or {}
+        return {
+            "model": tier.get("model", self.model),
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": compact_prompt(prompt)}
+            ],
+            "temperature": tier.get("temperature", self.temperature),
+            "max_tokens": tier.get("max_tokens", self.max_tokens)
+        }
+    
+    def _coalesced_call(self, prompt: str, parser, endpoint: str = "direct", tokens_saved: int = 0,
+                        tier: Dict[str, Any] = None):
+        """Call the API and parse, sharing one in-flight request between identical concurrent prompts"""
+        # The key covers model, max_tokens and temperature, so different tiers never share a call
+        key = make_request_key(self._build_request_payload(prompt, tier))
+        return self.single_flight.do(key, lambda: parser(self._call_ai_api(prompt, endpoint, tokens_saved, tier)))
+    
+    def _context_tokens_saved(self, topic_id: str, syllabus_context: str) -> int:
+        """Tokens dropped by trimming the syllabus context to its budget"""
+        return estimate_tokens(get_syllabus_context(topic_id, token_budget=None)) - estimate_tokens(syllabus_context)
+    
+    def get_token_usage(self) -> Dict[str, Any]:
+        """Prompt/completion token counts per endpoint"""
+        return self.token_usage.get_stats()
+    
+    def is_available(self) -> bool:
+        """False while there is no API key or the circuit breaker is open"""
+        return bool(self.api_key) and self.circuit_breaker.is_available()
     
-        if start != -1 and end != -1:
-          return response[start:end]
+    def get_circuit_state(self) -> Dict[str, Any]:
+        """Circuit breaker state for /health"""
+        return self.circuit_breaker.get_state()
     
-    # Fallback: try to extract from markdown
-        if '```json' in response:
-           start = response.find('```json') + 7
-           end = response.find('```', start)
-           if end != -1:
-              return response[start:end]
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """Calls, latency and tokens saved per model tier"""
+        return self.model_router.get_stats()
     
-        return response  # Return as-is if no cleaning worked
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """Counters showing how many calls were served by an in-flight request"""
+        return self.single_flight.get_stats()
     
-    def _call_ai_api(self, prompt: str) -> str:
+    def _call_ai_api(self, prompt: str, endpoint: str = "direct", tokens_saved: int = 0,
+                     tier: Dict[str, Any] = None) -> str:
         """Call the AI API"""
         try:
             if not self.api_key:
                 return json.dumps({"error": "No API key configured"})
             
+            if not self.circuit_breaker.allow_request():
+                print("⛔ AI API circuit open, skipping call")
+                return json.dumps({"error": "AI service temporarily unavailable"})
+            
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
             }
             
-            data = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": "You are an expert Namibia NSSCAS Mathematics examiner and teacher. Always provide accurate, syllabus-aligned responses with step-by-step working. Always return valid JSON format."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.3,
-                "max_tokens": 2000
-            }
+            data = self._build_request_payload(prompt, tier)
             
-            print(f"🤖 Calling AI API with model: {self.model}")
-            response = requests.post(f"{self.base_url}/chat/completions", 
-                                   headers=headers, json=data, timeout=30)
-            response.raise_for_status()
+            print(f"🤖 Calling AI API with model: {data['model']}")
+            started = time.perf_counter()
+            try:
+                response = requests.post(f"{self.base_url}/chat/completions", 
+                                       headers=headers, json=data, timeout=self.request_timeout)
+                response.raise_for_status()
+                body = response.json()
+                result = body["choices"][0]["message"]["content"]
+            except Exception:
+                self.circuit_breaker.record_failure(time.perf_counter() - started)
+                raise
             
-            result = response.json()["choices"][0]["message"]["content"]
+            latency = time.perf_counter() - started
+            self.circuit_breaker.record_success(latency)
+            prompt_tokens, completion_tokens = self._record_token_usage(endpoint, prompt, data, result, body.get("usage"),
+                                                                        tokens_saved, latency)
+            if tier:
+                self.model_router.record(tier, latency, prompt_tokens, completion_tokens,
+                                         truncated=body["choices"][0].get("finish_reason") == "length")
             print("✅ AI API call successful")
             return result
             
         except Exception as e:
             print(f"❌ API call failed: {e}")
+            if isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code == 429:
+                retry_after = e.response.headers.get("Retry-After", "")
+                retry_seconds = float(retry_after) if retry_after.replace('.', '', 1).isdigit() else 5.0
+                self.rate_limited_until = max(self.rate_limited_until, time.time() + retry_seconds)
             return self._get_fallback_response()
     
+    def _record_token_usage(self, endpoint, raw_prompt, data, completion, usage, tokens_saved, latency):
+        """Record token counts, preferring the API's own usage figures over estimates"""
+        sent_prompt = data["messages"][-1]["content"]
+        tokens_saved += estimate_tokens(raw_prompt) - estimate_tokens(sent_prompt)
+        
+        if usage and "prompt_tokens" in usage:
+            prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+            self.token_usage.record(endpoint, prompt_tokens, completion_tokens,
+                                    tokens_saved, reported=True, latency=latency)
+        else:
+            prompt_tokens = sum(estimate_tokens(message["content"]) for message in data["messages"])
+            completion_tokens = estimate_tokens(completion)
+            self.token_usage.record(endpoint, prompt_tokens, completion_tokens,
+                                    tokens_saved, latency=latency)
+        return prompt_tokens, completion_tokens
+    
     def _parse_lesson_response(self, response: str) -> Dict[str, Any]:
         """Parse AI response for lesson content"""
-        try:
-            # Clean the response (sometimes AI adds extra text)
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.endswith("```"):
-                response = response[:-3]
-            
-            return json.loads(response)
-        except json.JSONDecodeError as e:
-            print(f"❌ Failed to parse lesson response: {e}")
+        lesson, complete = extract_json(response, expect='{')
+        
+        if not isinstance(lesson, dict) or 'error' in lesson or not (lesson.get('content') or lesson.get('worked_examples')):
+            print("❌ Failed to parse lesson response")
             print(f"Raw response: {response}")
             return self._get_default_lesson()
+        
+        if not complete:
+            # Keep every complete section of a truncated reply instead of discarding it
+            print("⚠️ Lesson response was truncated, recovered the complete parts")
+            lesson['partial'] = True
+        return lesson
     
     def _parse_qa_response(self, response: str) -> Dict[str, Any]:
         """Parse AI response for Q&A"""
-        try:
-           response = response.strip()
+        extractor = IncrementalJSONExtractor(expect='{').feed(response)
+        parsed_data = extractor.snapshot()
         
-        # Remove markdown code blocks if present
-           if response.startswith("```json"):
-              response = response[7:]
-           if response.endswith("```"):
-             response = response[:-3]
-           response = response.strip()
-        
-        # Extract only the JSON part
-           start_idx = response.find('{')
-           end_idx = response.rfind('}') + 1
+        if not isinstance(parsed_data, dict) or not (parsed_data.get('explanation') or parsed_data.get('steps')):
+            print("❌ Failed to parse Q&A response")
+            print(f"Raw response: {response}")
+            return self._get_default_qa_response()
         
-           if start_idx == -1 or end_idx == 0:
-              raise json.JSONDecodeError("No JSON object found", response, 0)
-         
-           json_str = response[start_idx:end_idx]
-           parsed_data = json.loads(json_str)
+        if not extractor.complete:
+            print("⚠️ Q&A response was truncated, recovered the complete parts")
+            parsed_data["partial"] = True
         
         # Extract and clean answer text
-           answer_text = response[end_idx:].strip()
-           if answer_text:
+        answer_text = extractor.trailing_text().replace('```', '').strip()
+        if answer_text:
             # Remove server log lines
-              lines = answer_text.split('\n')
-              clean_lines = []
-              for line in lines:
-                  line = line.strip()
+            clean_lines = []
+            for line in answer_text.split('\n'):
+                line = line.strip()
                 # Skip common log patterns
-                  if (line.startswith('127.0.0.1') or 
-                     line.startswith('HTTP') or 
-                     line.startswith('POST') or 
-                     line.startswith('GET')):
-                     continue
-                  if line:
-                     clean_lines.append(line)
+                if (line.startswith('127.0.0.1') or 
+                    line.startswith('HTTP') or 
+                    line.startswith('POST') or 
+                    line.startswith('GET')):
+                    continue
+                if line:
+                    clean_lines.append(line)
             
-              clean_answer = '\n'.join(clean_lines)
-              if clean_answer:
-                 parsed_data["extracted_answer"] = clean_answer
+            clean_answer = '\n'.join(clean_lines)
+            if clean_answer:
+                parsed_data["extracted_answer"] = clean_answer
         
-           return parsed_data
-        except json.JSONDecodeError as e:
-         print(f"❌ Failed to parse Q&A response: {e}")
-         print(f"Raw response: {response}")
-         return self._get_default_qa_response()
+        return parsed_data
     
     def _parse_assessment_response(self, response: str) -> List[Dict]:
         """Parse AI response for assessments"""
-        try:
-            response = self.clean_ai_response(response.strip())
-            return json.loads(response)
-        except json.JSONDecodeError as e:
-            print(f"❌ Failed to parse assessment response: {e}")
+        questions, complete = extract_json(response, expect='[')
+        
+        if not isinstance(questions, list):
+            print("❌ Failed to parse assessment response")
             print(f"Raw response: {response}")
-        return self._get_default_assessment()
+            return self._get_default_assessment()
+        
+        if not complete:
+            print(f"⚠️ Assessment response was truncated, recovered {len(questions)} complete questions")
+        return [question for question in questions if isinstance(question, dict)]
     
     def _get_fallback_response(self):
         return json.dumps({"error": "AI service unavailable"})
     
     def _get_default_lesson(self):
         return {
+            "fallback": True,
             "title": "Namibia NSSCAS Mathematics",
             "content": ["Please check your API configuration for Namibia syllabus content."],
             "worked_examples": [],
@@ -329,7 +417,8 @@ class AIService:
             "steps": [],
             "worked_example": {},
             "key_concepts": [],
-            "examination_tips": []
+            "examination_tips": [],
+            "fallback": True
         }
     
     def _get_default_assessment(self):
@@ -0,0 +1,253 @@
+# ann_index.py
+"""
+Approximate nearest-neighbour index for large question banks (pure NumPy).
+
+An inverted-file (IVF) index: spherical k-means splits the normalised question
+embeddings into nlist cells, and vectors are stored grouped by cell so each
+cell is one contiguous block. A query scores the centroids, then only the
+nprobe closest cells. With product quantization (pq_subspaces > 0) the
+residual of every vector from its centroid is stored as one byte per
+subspace, and a query scores a cell with a per-subspace lookup table instead
+of the full vectors.
+
+model_trainer.py builds the index once the bank reaches ANN_MIN_QUESTIONS;
+the retrieval index in TrigSolver then scores only its candidates.
+
+Benchmark against exact search:
+    python ann_index.py --benchmark --sizes 1000 10000 100000 1000000
+(1M x 384 float32 embeddings take about 1.5 GB of memory.)
+"""
+import argparse
+import math
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+ANN_MIN_QUESTIONS = int(os.getenv("ANN_MIN_QUESTIONS", "50000"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+ANN_PQ_SUBSPACES = int(os.getenv("ANN_PQ_SUBSPACES", "0"))
+ANN_CANDIDATES = int(os.getenv("ANN_CANDIDATES", "100"))
+PQ_CODEBOOK_SIZE = 256
+ASSIGN_BATCH = 65536
+
+
+def _normalise(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, inner_product: bool = True) -> np.ndarray:
+    """Nearest centroid per vector, in batches so the distance matrix stays small"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    centroid_norms = None if inner_product else (centroids ** 2).sum(axis=1)
+    for start in range(0, len(vectors), ASSIGN_BATCH):
+        products = vectors[start:start + ASSIGN_BATCH] @ centroids.T
+        if inner_product:
+            labels[start:start + ASSIGN_BATCH] = np.argmax(products, axis=1)
+        else:
+            # ||x - c||² = ||x||² - 2x·c + ||c||², and ||x||² does not change the argmin
+            labels[start:start + ASSIGN_BATCH] = np.argmin(centroid_norms[None, :] - 2.0 * products, axis=1)
+    return labels
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 20, spherical: bool = True,
+           sample_size: Optional[int] = None, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means on a sample; spherical keeps centroids unit length for inner-product search"""
+    rng = np.random.default_rng(seed)
+    if sample_size and len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = assign(vectors, centroids, inner_product=spherical)
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind='stable')
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)])[:-1][filled]
+        sums = np.add.reduceat(vectors[order], starts, axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]    # Reseed empty cells
+        if spherical:
+            centroids = _normalise(centroids)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """IVF index over normalised embeddings, flat or product-quantized"""
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = ANN_NPROBE,
+                 pq_subspaces: int = ANN_PQ_SUBSPACES, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_subspaces = pq_subspaces
+        self.seed = seed
+        self.centroids = None
+        self.ids = None        # storage position -> original row
+        self.offsets = None    # cell c occupies positions offsets[c]:offsets[c + 1]
+        self.vectors = None    # flat mode
+        self.codebooks = None  # PQ mode: (subspaces, 256, dim / subspaces)
+        self.codes = None      # PQ mode: (n, subspaces) uint8
+
+    def __len__(self):
+        return 0 if self.ids is None else len(self.ids)
+
+    def train(self, embeddings) -> "IVFIndex":
+        vectors = _normalise(embeddings)
+        count, dim = vectors.shape
+        nlist = self.nlist or max(1, int(4 * math.sqrt(count)))
+        self.centroids = kmeans(vectors, nlist, spherical=True, sample_size=max(64 * nlist, 20000), seed=self.seed)
+        self.nlist = len(self.centroids)
+
+        labels = assign(vectors, self.centroids)
+        order = np.argsort(labels, kind='stable')
+        self.ids = order.astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=self.nlist))]).astype(np.int64)
+
+        if self.pq_subspaces:
+            if dim % self.pq_subspaces:
+                raise ValueError(f"Embedding size {dim} is not divisible by {self.pq_subspaces} PQ subspaces")
+            residuals = vectors[order] - self.centroids[labels[order]]
+            self.codebooks, self.codes = self._train_pq(residuals)
+        else:
+            self.vectors = np.ascontiguousarray(vectors[order])
+        return self
+
+    def _train_pq(self, residuals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        width = residuals.shape[1] // self.pq_subspaces
+        codebooks = np.empty((self.pq_subspaces, PQ_CODEBOOK_SIZE, width), dtype=np.float32)
+        codes = np.empty((len(residuals), self.pq_subspaces), dtype=np.uint8)
+        for j in range(self.pq_subspaces):
+            block = np.ascontiguousarray(residuals[:, j * width:(j + 1) * width])
+            centroids = kmeans(block, PQ_CODEBOOK_SIZE, iterations=15, spherical=False,
+                               sample_size=64 * PQ_CODEBOOK_SIZE, seed=self.seed + j + 1)
+            codebooks[j, :len(centroids)] = centroids
+            codebooks[j, len(centroids):] = 0.0    # Tiny banks: fewer codes than the codebook size
+            codes[:, j] = assign(block, centroids, inner_product=False)
+        return codebooks, codes
+
+    def search(self, query, k: int = 10, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(original rows, approximate scores) of the k best matches, best first"""
+        query = _normalise(query).ravel()
+        coarse = self.centroids @ query
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        cells = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+
+        sizes = self.offsets[cells + 1] - self.offsets[cells]
+        positions = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells])
+        if not len(positions):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if self.codes is not None:
+            # q·x = q·centroid + q·residual, and q·residual is a sum of per-subspace table lookups
+            width = self.codebooks.shape[2]
+            lut = np.einsum('jcw,jw->jc', self.codebooks, query.reshape(self.pq_subspaces, width))
+            scores = np.repeat(coarse[cells], sizes)
+            scores = scores + lut[np.arange(self.pq_subspaces)[None, :], self.codes[positions]].sum(axis=1)
+        else:
+            scores = self.vectors[positions] @ query
+
+        k = min(k, len(positions))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return self.ids[positions[top]], scores[top].astype(np.float32)
+
+    def memory_bytes(self) -> int:
+        parts = [self.centroids, self.ids, self.offsets, self.vectors, self.codebooks, self.codes]
+        return int(sum(part.nbytes for part in parts if part is not None))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'nlist': self.nlist, 'nprobe': self.nprobe, 'pq_subspaces': self.pq_subspaces,
+                'centroids': self.centroids, 'ids': self.ids, 'offsets': self.offsets,
+                'vectors': self.vectors, 'codebooks': self.codebooks, 'codes': self.codes}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IVFIndex":
+        index = cls(data['nlist'], int(os.getenv("ANN_NPROBE", data['nprobe'])), data['pq_subspaces'])
+        for field in ('centroids', 'ids', 'offsets', 'vectors', 'codebooks', 'codes'):
+            setattr(index, field, data.get(field))
+        return index
+
+
+def exact_search(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    scores = vectors @ _normalise(query).ravel()
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def recall_at_k(index: IVFIndex, vectors, queries, k: int = 10, nprobe: Optional[int] = None) -> float:
+    """Fraction of the exact top-k that the index returns, averaged over the queries"""
+    vectors = _normalise(vectors)
+    hits = 0
+    for query in queries:
+        approximate, _ = index.search(query, k, nprobe)
+        hits += len(np.intersect1d(approximate, exact_search(vectors, query, k)))
+    return hits / (k * len(queries))
+
+
+def synthetic_embeddings(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, shaped roughly like sentence embeddings of a topical question bank"""
+    rng = np.random.default_rng(seed)
+    centres = _normalise(rng.standard_normal((max(count // 200, 16), dim), dtype=np.float32))
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, ASSIGN_BATCH):
+        stop = min(start + ASSIGN_BATCH, count)
+        noise = rng.standard_normal((stop - start, dim), dtype=np.float32) * (0.6 / math.sqrt(dim))
+        vectors[start:stop] = _normalise(centres[rng.integers(0, len(centres), stop - start)] + noise)
+    return vectors
+
+
+def _time_queries(search, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        search(query)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def benchmark(sizes, dim: int = 384, queries: int = 100, k: int = 10, nprobes=(1, 4, 8, 16, 32),
+              pq_subspaces: int = 48):
+    print(f"🚀 IVF benchmark: dim={dim}, {queries} queries, recall@{k}")
+    rng = np.random.default_rng(1)
+    for size in sizes:
+        vectors = synthetic_embeddings(size, dim)
+        sample = vectors[rng.choice(size, queries, replace=False)]
+        query_set = _normalise(sample + rng.standard_normal(sample.shape).astype(np.float32) * (0.3 / math.sqrt(dim)))
+        exact_ms = _time_queries(lambda q: exact_search(vectors, q, k), query_set)
+        print(f"\n📊 {size:,} vectors ({vectors.nbytes / 1e6:.0f} MB), exact search {exact_ms:.2f} ms/query")
+
+        for label, subspaces in (("IVF-Flat", 0), (f"IVF-PQ{pq_subspaces}", pq_subspaces)):
+            start = time.perf_counter()
+            index = IVFIndex(pq_subspaces=subspaces).train(vectors)
+            build_s = time.perf_counter() - start
+            print(f"   {label}: nlist={index.nlist}, built in {build_s:.1f}s, {index.memory_bytes() / 1e6:.0f} MB")
+            for nprobe in nprobes:
+                if nprobe > index.nlist:
+                    continue
+                ms = _time_queries(lambda q: index.search(q, k, nprobe), query_set)
+                recall = recall_at_k(index, vectors, query_set, k, nprobe)
+                print(f"      nprobe={nprobe:<3} {ms:7.3f} ms/query  speed-up {exact_ms / max(ms, 1e-9):6.1f}x  "
+                      f"recall@{k} {recall:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF approximate nearest-neighbour index")
+    parser.add_argument("--benchmark", action="store_true", help="Compare against exact search on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=384, help="Embedding size (all-MiniLM-L6-v2 is 384)")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-subspaces", type=int, default=48)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.sizes, args.dim, args.queries, args.k, pq_subspaces=args.pq_subspaces)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# answer_cache.py
+"""
+Semantic answer cache for /lessons/ask.
+
+Students in the same topic often ask the same question in different words.
+Each topic keeps a small index of already-answered questions as a matrix of
+L2-normalised MiniLM embeddings, so a lookup is one matrix-vector product.
+
+Only standalone questions are cached. A question asked inside a conversation,
+or one that reads as a follow-up ("can you explain that more simply?"), is
+answered for that student's context and is neither looked up nor stored.
+"""
+import os
+import re
+import threading
+import time
+import copy
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.88"))
+# Used while the LLM is unavailable, when a near miss is better than no answer
+DEGRADED_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_DEGRADED_THRESHOLD", "0.8"))
+DEFAULT_MAX_ENTRIES_PER_TOPIC = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+DEFAULT_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+# Phrases meaning "don't give me the same answer again"
+FRESH_EXPLANATION_PHRASES = [
+    'different explanation', 'explain differently', 'explain it differently',
+    'another explanation', 'another way', 'different way', 'explain again differently'
+]
+
+# Follow-ups refer back to an earlier answer; the same words mean different things per conversation
+_FOLLOW_UP_PATTERN = re.compile(
+    r"\b(?:again|previous|earlier|above|you said|your (?:answer|explanation)|last (?:answer|step|one)"
+    r"|step\s*\d+|(?:explain|clarify|simplify|repeat|expand on) (?:that|this|it)\b"
+    r"|(?:more|even) simpl[ey]|simpler|what do you mean|why is that|how so"
+    r"|i (?:still )?do(?:n'?t| not) (?:understand|get)|break it down|go over it)")
+
+_NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+
+
+def _numbers_in(text: str) -> tuple:
+    """Numbers mentioned in a question; paraphrases must agree on these"""
+    return tuple(sorted(_NUMBER_PATTERN.findall(text)))
+
+
+def wants_fresh_explanation(question: str) -> bool:
+    """Check whether the student explicitly asked for a new explanation"""
+    question_lower = question.lower()
+    return any(phrase in question_lower for phrase in FRESH_EXPLANATION_PHRASES)
+
+
+def is_follow_up(question: str) -> bool:
+    """Check whether the question refers back to an earlier answer"""
+    return _FOLLOW_UP_PATTERN.search(question.lower()) is not None
+
+
+def is_cacheable(question: str, conversation=None) -> bool:
+    """Only questions that stand on their own may share answers between students"""
+    return not conversation and not is_follow_up(question)
+
+
+class _TopicIndex:
+    """Answered questions for one topic, embeddings stored row-wise and normalised"""
+
+    def __init__(self, dim: int):
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.entries: List[Dict[str, Any]] = []
+
+    def remove(self, keep_mask: np.ndarray):
+        self.matrix = self.matrix[keep_mask]
+        self.entries = [entry for entry, keep in zip(self.entries, keep_mask) if keep]
+
+
+class SemanticAnswerCache:
+    """Per-topic cache of LLM answers keyed by question meaning"""
+
+    def __init__(self, encoder=None, similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 max_entries_per_topic: int = DEFAULT_MAX_ENTRIES_PER_TOPIC,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.encoder = encoder
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_topic = max_entries_per_topic
+        self.ttl_seconds = ttl_seconds
+        self._topics: Dict[str, _TopicIndex] = {}
+        self._lock = threading.Lock()
+        # A miss is usually followed by store() for the same question; avoid encoding it twice
+        self._last_embedding = threading.local()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0, "bypassed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.encoder is not None
+
+    def set_encoder(self, encoder):
+        """Attach the MiniLM encoder once the solver model has been loaded"""
+        self.encoder = encoder
+
+    def _embed(self, question: str, embedding=None) -> np.ndarray:
+        last = self._last_embedding
+        # A vector from before a model swap came from the old encoder
+        if getattr(last, 'question', None) == question and getattr(last, 'encoder', None) is self.encoder:
+            return last.vector
+        if embedding is None:
+            embedding = self.encoder.encode([question])[0]
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm > 0 else vector
+        last.question, last.encoder, last.vector = question, self.encoder, vector
+        return vector
+
+    def _expire(self, index: _TopicIndex, now: float):
+        if not index.entries:
+            return
+        created = np.fromiter((entry['created_at'] for entry in index.entries), dtype=np.float64,
+                              count=len(index.entries))
+        keep = (now - created) < self.ttl_seconds
+        if not keep.all():
+            self.stats["expired"] += int((~keep).sum())
+            index.remove(keep)
+
+    def lookup(self, topic_id: str, question: str, similarity_threshold: Optional[float] = None,
+               conversation=None, embedding=None) -> Optional[Dict[str, Any]]:
+        """Return a stored answer for a question with the same meaning, or None
+
+        similarity_threshold overrides the configured threshold for this lookup.
+        conversation is the student's prior messages; with any, the lookup is skipped.
+        embedding is the question's MiniLM vector if the caller already has it.
+        """
+        if not self.enabled:
+            return None
+        if wants_fresh_explanation(question) or not is_cacheable(question, conversation):
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return None
+
+        with self._lock:
+            index = self._topics.get(topic_id)
+            if index is None or not index.entries:
+                self.stats["misses"] += 1
+                return None
+
+        embedding = self._embed(question, embedding)
+        numbers = _numbers_in(question)
+
+        with self._lock:
+            index = self._topics.get(topic_id)
+            if index is not None:
+                self._expire(index, time.time())
+            if index is None or not index.entries:
+                self.stats["misses"] += 1
+                return None
+
+            similarities = index.matrix @ embedding
+            threshold = self.similarity_threshold if similarity_threshold is None else similarity_threshold
+            for row in np.argsort(-similarities):
+                if similarities[row] < threshold:
+                    break
+                entry = index.entries[row]
+                # "sin 30" and "sin 60" embed almost identically; never mix up the numbers
+                if entry['numbers'] != numbers:
+                    continue
+                entry['hits'] += 1
+                entry['last_used'] = time.time()
+                self.stats["hits"] += 1
+                return {
+                    "response": copy.deepcopy(entry['response']),
+                    "matched_question": entry['question'],
+                    "similarity": float(similarities[row])
+                }
+
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, topic_id: str, question: str, response: Dict[str, Any], conversation=None, embedding=None):
+        """Remember the answer to a question, unless it only makes sense within its conversation"""
+        if not self.enabled or not response or not is_cacheable(question, conversation):
+            return
+
+        embedding = self._embed(question, embedding)
+        now = time.time()
+
+        with self._lock:
+            index = self._topics.get(topic_id)
+            if index is None:
+                index = _TopicIndex(embedding.shape[0])
+                self._topics[topic_id] = index
+            self._expire(index, now)
+
+            if len(index.entries) >= self.max_entries_per_topic:
+                # Evict the least recently used entries to make room
+                order = np.argsort([entry['last_used'] for entry in index.entries])
+                overflow = len(index.entries) - self.max_entries_per_topic + 1
+                keep = np.ones(len(index.entries), dtype=bool)
+                keep[order[:overflow]] = False
+                index.remove(keep)
+                self.stats["evictions"] += overflow
+
+            index.matrix = np.vstack([index.matrix, embedding[np.newaxis, :]])
+            index.entries.append({
+                'question': question,
+                'numbers': _numbers_in(question),
+                'response': copy.deepcopy(response),
+                'created_at': now,
+                'last_used': now,
+                'hits': 0
+            })
+            self.stats["stores"] += 1
+
+    def clear(self, topic_id: str = None):
+        """Drop cached answers for one topic or for all topics"""
+        with self._lock:
+            if topic_id is None:
+                self._topics.clear()
+            else:
+                self._topics.pop(topic_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = {topic: len(index.entries) for topic, index in self._topics.items()}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        stats["similarity_threshold"] = self.similarity_threshold
+        return stats
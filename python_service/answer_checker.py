@@ -0,0 +1,526 @@
+# answer_checker.py
+"""
+Answer checking for student responses.
+
+Compares a student's answer with the expected final_answer from the dataset,
+the assessment bank or the parametric generator. Both sides are parsed into
+labelled values ("x = 30°, 150°", "Amplitude = 3, Period = π",
+"Range: [-1, 7]"), numbers with units (degrees, radians, surds, multiples of
+π) or expressions in x/θ. Numbers are compared with the NSSCAS tolerances
+(3 significant figures, angles in degrees to 1 decimal place); expressions
+are sampled at many points in one NumPy pass. Proofs are not auto-graded.
+
+check_batch() grades a whole class: each distinct expected answer is parsed
+once and all expression answers to the same question are compared as one
+matrix.
+"""
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Points expressions are sampled at; offset so special angles (where tan blows up) are avoided
+SAMPLE_POINTS = np.linspace(-3.0, 3.0, 121) + 0.0123
+EXPRESSION_RTOL = 5e-3
+EXPRESSION_ATOL = 5e-3
+DEGREE_TOLERANCE = 0.05    # answers in degrees are given to 1 decimal place
+
+_FUNCTIONS = {
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+    'sec': lambda v: 1.0 / np.cos(v), 'cosec': lambda v: 1.0 / np.sin(v),
+    'csc': lambda v: 1.0 / np.sin(v), 'cot': lambda v: 1.0 / np.tan(v),
+    'asin': np.arcsin, 'acos': np.arccos, 'atan': np.arctan, 'sqrt': np.sqrt,
+}
+_CONSTANTS = {'π': math.pi, 'pi': math.pi, 'e': math.e}
+_VARIABLES = {'x', 'θ', 'φ'}
+
+_TOKEN = re.compile(r'\s*(?:'
+                    r'(?P<num>\d+\.?\d*|\.\d+)'
+                    r'|(?P<name>asin|acos|atan|cosec|sqrt|sin|cos|tan|sec|csc|cot|pi|π|θ|φ|x|e)'
+                    r'|(?P<sqrt>√)'
+                    r'|(?P<op>[-+*/^()])'
+                    r'|(?P<sup>[²³])'
+                    r'|(?P<deg>°))')
+
+_REPLACEMENTS = [
+    ('≈', '='), ('−', '-'), ('–', '-'), ('×', '*'), ('÷', '/'), ('½', '(1/2)'), ('¼', '(1/4)'),
+    ('sin⁻¹', 'asin'), ('cos⁻¹', 'acos'), ('tan⁻¹', 'atan'),
+    ('arcsin', 'asin'), ('arccos', 'acos'), ('arctan', 'atan'),
+]
+_UNIT_WORDS = re.compile(r'(?<![a-zA-Z])(?:cm|mm|km|m)[²³]?(?![a-zA-Z0-9])|\b(?:radians?|rad|units?|degrees?)\b',
+                         re.IGNORECASE)
+_RADIAN_WORDS = re.compile(r'\b(radians?|rad)\b', re.IGNORECASE)
+_DEGREE_WORDS = re.compile(r'\bdegrees?\b', re.IGNORECASE)
+_PROOF = re.compile(r'\b(proof|proven|proved|shown|identity holds)\b', re.IGNORECASE)
+_WORD_LABEL = re.compile(r'^([a-zA-Z]{2,}(?: [a-zA-Z]+)*)\s+([-+√(.\d].*)$')
+_ALTERNATIVES = re.compile(r'\s+or\s+', re.IGNORECASE)
+
+
+class AnswerParseError(ValueError):
+    pass
+
+
+# ---------- Expression parsing ----------
+
+class _ExpressionParser:
+    """Recursive descent parser for school notation: implicit products, sinθ, sin²x, √3, 30°"""
+
+    def __init__(self, text: str):
+        self.tokens = []
+        position = 0
+        text = text.strip()
+        while position < len(text):
+            match = _TOKEN.match(text, position)
+            if not match or match.end() == position:
+                raise AnswerParseError(f"Unexpected '{text[position:position + 10]}'")
+            kind = match.lastgroup
+            self.tokens.append((kind, match.group(kind)))
+            position = match.end()
+        self.pos = 0
+        self.has_variable = False
+        self.has_degrees = False
+        self.has_pi = False
+
+    def parse(self):
+        if not self.tokens:
+            raise AnswerParseError("Empty expression")
+        node = self._expr()
+        if self.pos != len(self.tokens):
+            raise AnswerParseError(f"Unexpected '{self.tokens[self.pos][1]}'")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _take(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _starts_factor(self) -> bool:
+        kind, value = self._peek()
+        return kind in ('num', 'name', 'sqrt') or (kind == 'op' and value == '(')
+
+    def _expr(self):
+        node = self._term()
+        while self._peek() in (('op', '+'), ('op', '-')):
+            op = self._take()[1]
+            node = ('bin', op, node, self._term())
+        return node
+
+    def _term(self):
+        node = self._unary()
+        while True:
+            kind, value = self._peek()
+            if kind == 'op' and value in '*/':
+                self._take()
+                node = ('bin', value, node, self._unary())
+            elif self._starts_factor():
+                node = ('bin', '*', node, self._power())    # implicit product: 2π, 3sinθ, 2√3
+            else:
+                return node
+
+    def _unary(self):
+        if self._peek() == ('op', '-'):
+            self._take()
+            return ('neg', self._unary())
+        if self._peek() == ('op', '+'):
+            self._take()
+            return self._unary()
+        return self._power()
+
+    def _power(self):
+        node = self._atom()
+        while True:
+            kind, value = self._peek()
+            if kind == 'op' and value == '^':
+                self._take()
+                node = ('pow', node, self._unary())
+            elif kind == 'sup':
+                self._take()
+                node = ('pow', node, ('num', 2.0 if value == '²' else 3.0))
+            elif kind == 'deg':
+                self._take()
+                self.has_degrees = True
+                node = ('deg', node)
+            else:
+                return node
+
+    def _atom(self):
+        kind, value = self._peek()
+        if kind == 'num':
+            self._take()
+            return ('num', float(value))
+        if kind == 'sqrt':
+            self._take()
+            return ('call', 'sqrt', self._power())
+        if kind == 'op' and value == '(':
+            self._take()
+            node = self._expr()
+            if self._peek() != ('op', ')'):
+                raise AnswerParseError("Missing ')'")
+            self._take()
+            return node
+        if kind == 'name':
+            self._take()
+            if value in _CONSTANTS:
+                if value in ('π', 'pi'):
+                    self.has_pi = True
+                return ('num', _CONSTANTS[value])
+            if value in _VARIABLES:
+                self.has_variable = True
+                return ('var',)
+            return self._function(value)
+        raise AnswerParseError(f"Unexpected '{value}'")
+
+    def _function(self, name: str):
+        # sin²θ means (sin θ)²
+        exponent = None
+        if self._peek()[0] == 'sup':
+            exponent = 2.0 if self._take()[1] == '²' else 3.0
+
+        if self._peek() == ('op', '('):
+            argument = self._atom()    # sin(x)² squares the sine, so postfix operators stay with the caller
+        else:
+            # sinθ, cos2x, tan 3x: the argument runs over numbers, constants and variables only
+            argument = self._power()
+            while self._peek()[0] in ('num', 'name') and self._peek()[1] not in _FUNCTIONS:
+                argument = ('bin', '*', argument, self._power())
+
+        node = ('call', name, argument)
+        return ('pow', node, ('num', exponent)) if exponent else node
+
+
+def _evaluate(node, x):
+    kind = node[0]
+    if kind == 'num':
+        return node[1]
+    if kind == 'var':
+        return x
+    if kind == 'neg':
+        return -_evaluate(node[1], x)
+    if kind == 'deg':
+        return _evaluate(node[1], x) * (math.pi / 180.0)
+    if kind == 'pow':
+        return np.power(_evaluate(node[1], x), _evaluate(node[2], x))
+    if kind == 'call':
+        return _FUNCTIONS[node[1]](_evaluate(node[2], x))
+    left, right = _evaluate(node[2], x), _evaluate(node[3], x)
+    op = node[1]
+    if op == '+':
+        return left + right
+    if op == '-':
+        return left - right
+    if op == '*':
+        return left * right
+    return np.divide(left, right)
+
+
+# ---------- Answer parsing ----------
+
+def _normalise(text: str) -> str:
+    text = str(text).strip()
+    for old, new in _REPLACEMENTS:
+        text = text.replace(old, new)
+    return text
+
+
+def _split_top_level(text: str, separators: str = ',;') -> List[str]:
+    """Split on separators outside brackets, so [-1, 7] and (0.253, 0) stay whole"""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        if char in separators and depth == 0:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+@lru_cache(maxsize=4096)
+def parse_value(text: str) -> Dict[str, Any]:
+    """One value: a number (with unit), an ordered pair/interval, or an expression in x/θ"""
+    text = text.strip().rstrip('.')
+    is_radians = bool(_RADIAN_WORDS.search(text))
+    is_degrees = bool(_DEGREE_WORDS.search(text))
+    text = _UNIT_WORDS.sub('', text).strip()
+
+    if text.startswith('[') and text.endswith(']'):
+        values = [parse_value(part) for part in _split_top_level(text[1:-1], ',')]
+        if not values or any(value['kind'] != 'number' for value in values):
+            raise AnswerParseError("Interval must contain numbers")
+        return {'kind': 'interval', 'values': values}
+
+    plus_minus = '±' in text
+    parser = _ExpressionParser(text.replace('±', ''))
+    node = parser.parse()
+    if parser.has_variable:
+        return {'kind': 'expression', 'node': node}
+
+    with np.errstate(all='ignore'):
+        value = float(_evaluate(node, 0.0))
+    if not math.isfinite(value):
+        raise AnswerParseError("Value is not finite")
+    unit = 'deg' if (parser.has_degrees or is_degrees) else ('rad' if (is_radians or parser.has_pi) else None)
+    if parser.has_degrees:
+        value = math.degrees(value)    # ° was evaluated as radians; keep degree answers in degrees
+    number = {'kind': 'number', 'value': value, 'unit': unit}
+    if plus_minus:
+        return {'kind': 'plus_minus', 'values': [number, dict(number, value=-value)]}
+    return number
+
+
+def _clean_label(label: str) -> str:
+    return re.sub(r'\s+', '', label.lower())
+
+
+@lru_cache(maxsize=4096)
+def parse_answer(text: str) -> Dict[str, Any]:
+    """Parse a full answer into labelled groups of values; alternatives ("12π or 37.7") are kept apart"""
+    text = _normalise(text)
+    if _PROOF.search(text) and not re.search(r'\d', text):
+        return {'kind': 'proof', 'alternatives': []}
+
+    alternatives = []
+    for alternative in _ALTERNATIVES.split(text):
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        order: List[str] = []
+        label = ''
+        for part in _split_top_level(alternative):
+            # "x = 30°" or "Range: [-1, 7]"; the last '=' separates the label from the value
+            match = re.match(r'^(.*?)(?:=|:)\s*([^=:]*)$', part)
+            worded = _WORD_LABEL.match(part)
+            if match and match.group(1).strip():
+                label = _clean_label(match.group(1))
+                part = match.group(2)
+            elif match:
+                part = match.group(2)
+            elif worded and worded.group(1).lower() not in _FUNCTIONS:
+                label, part = _clean_label(worded.group(1)), worded.group(2)    # "maximum 4"
+            if not part.strip():
+                continue
+            value = parse_value(part)
+            values = value['values'] if value['kind'] == 'plus_minus' else [value]
+            key = '' if label in _VARIABLES or len(label) == 1 else label
+            if key not in groups:
+                groups[key] = []
+                order.append(key)
+            groups[key].extend(values)
+        if groups:
+            alternatives.append({'groups': groups, 'order': order})
+
+    if not alternatives:
+        raise AnswerParseError("No values found")
+    return {'kind': 'values', 'alternatives': alternatives}
+
+
+# ---------- Comparison ----------
+
+def _tolerance(expected: Dict[str, Any]) -> float:
+    """3 significant figures of the expected value; 1 decimal place for angles in degrees"""
+    value = abs(expected['value'])
+    tolerance = 0.5 * 10 ** (math.floor(math.log10(value)) - 2) if value > 0 else 5e-4
+    if expected.get('unit') == 'deg':
+        tolerance = max(tolerance, DEGREE_TOLERANCE)
+    return tolerance + 1e-9
+
+
+def _in_expected_units(student: Dict[str, Any], expected: Dict[str, Any]) -> float:
+    """Student value converted to the expected value's unit (unitless answers take the expected unit)"""
+    value = student['value']
+    if expected.get('unit') == 'deg' and student.get('unit') == 'rad':
+        return math.degrees(value)
+    if expected.get('unit') == 'rad' and student.get('unit') == 'deg':
+        return math.radians(value)
+    return value
+
+
+def _match_numbers(student: List[Dict[str, Any]], expected: List[Dict[str, Any]], ordered: bool) -> int:
+    """How many expected numbers the student matched, each student number used at most once"""
+    if not student or not expected:
+        return 0
+    if ordered:
+        return sum(1 for s, e in zip(student, expected)
+                   if abs(_in_expected_units(s, e) - e['value']) <= _tolerance(e))
+
+    # |student - expected| <= tolerance as one matrix, then a greedy one-to-one assignment
+    values = np.array([[_in_expected_units(s, e) for e in expected] for s in student])
+    targets = np.array([e['value'] for e in expected])
+    tolerances = np.array([_tolerance(e) for e in expected])
+    close = np.abs(values - targets[None, :]) <= tolerances[None, :]
+    used_students, matched = set(), 0
+    for column in np.argsort(close.sum(axis=0)):    # scarcest expected values first
+        for row in np.flatnonzero(close[:, column]):
+            if row not in used_students:
+                used_students.add(row)
+                matched += 1
+                break
+    return matched
+
+
+def _expression_values(node) -> np.ndarray:
+    with np.errstate(all='ignore'):
+        values = _evaluate(node, SAMPLE_POINTS)
+    return np.broadcast_to(np.asarray(values, dtype=float), SAMPLE_POINTS.shape)
+
+
+def _expressions_match(student_values: np.ndarray, expected_values: np.ndarray) -> np.ndarray:
+    """Row-wise comparison of sampled expressions; rows are students"""
+    student_values = np.atleast_2d(student_values)
+    valid = np.isfinite(expected_values) & (np.abs(expected_values) < 1e6)
+    finite = np.isfinite(student_values)
+    with np.errstate(invalid='ignore'):
+        close = np.isclose(student_values, expected_values[None, :], rtol=EXPRESSION_RTOL, atol=EXPRESSION_ATOL)
+    agree = (close & finite) | ~valid[None, :]
+    return np.all(agree, axis=1) & (valid.sum() >= len(expected_values) // 2)
+
+
+def _compare_group(student: List[Dict[str, Any]], expected: List[Dict[str, Any]]) -> int:
+    """How many of one labelled group's expected values the student matched"""
+    if expected and expected[0]['kind'] == 'expression':
+        if len(student) == 1 and student[0]['kind'] == 'expression':
+            return int(bool(_expressions_match(_expression_values(student[0]['node']),
+                                               _expression_values(expected[0]['node']))[0]))
+        return 0
+    if expected and expected[0]['kind'] == 'interval':
+        if len(student) == 1 and student[0]['kind'] == 'interval':
+            matched = _match_numbers(student[0]['values'], expected[0]['values'], ordered=True)
+            return int(matched == len(expected[0]['values']))
+        return 0
+
+    student_numbers = [s for s in student if s['kind'] == 'number']
+    return _match_numbers(student_numbers, expected, ordered=False)
+
+
+def _score(student_alt: Dict[str, Any], expected_alt: Dict[str, Any]) -> Dict[str, Any]:
+    expected_groups, student_groups = expected_alt['groups'], student_alt['groups']
+    total = sum(len(values) for values in expected_groups.values())
+    student_count = sum(len(values) for values in student_groups.values())
+    matched = 0
+
+    labels_line_up = all(label in expected_groups for label in student_groups)
+    if labels_line_up:
+        for label, expected_values in expected_groups.items():
+            matched += _compare_group(student_groups.get(label, []), expected_values)
+    else:
+        # Student used other (or no) labels: compare values in the order they were given
+        student_values = [v for label in student_alt['order'] for v in student_groups[label]]
+        position = 0
+        for label in expected_alt['order']:
+            expected_values = expected_groups[label]
+            chunk = student_values[position:position + len(expected_values)]
+            position += len(expected_values)
+            matched += _compare_group(chunk, expected_values)
+
+    # Extra values are the ones beyond the expected count; a wrong value in place of a right one is not extra
+    extra = max(student_count - total, 0)
+    return {'matched': matched, 'expected_count': total, 'extra': extra,
+            'score': round(matched / total, 3) if total else 0.0,
+            'correct': matched == total and extra == 0}
+
+
+def check_answer(student_answer: str, expected_answer: str) -> Dict[str, Any]:
+    """Grade one answer; correct is None when the answer needs a teacher (proofs, unparseable text)"""
+    try:
+        expected = parse_answer(str(expected_answer))
+    except AnswerParseError as e:
+        return _text_comparison(student_answer, expected_answer, f"expected answer not parseable: {e}")
+
+    if expected['kind'] == 'proof':
+        return {'correct': None, 'score': None, 'kind': 'proof', 'needs_review': True,
+                'feedback': "Proofs are marked by the teacher"}
+
+    try:
+        student = parse_answer(str(student_answer))
+    except AnswerParseError as e:
+        return {'correct': False, 'score': 0.0, 'kind': 'unparseable', 'needs_review': False,
+                'feedback': f"Could not read the answer: {e}"}
+    if student['kind'] == 'proof':
+        return {'correct': False, 'score': 0.0, 'kind': 'values', 'needs_review': False,
+                'feedback': "A value was expected"}
+
+    # Any accepted form of the expected answer will do, but every form the student
+    # offers ("12π or 37.7") must be right: "10 or 20 or 30" is a hedge, not an answer
+    worst = None
+    for student_alt in student['alternatives']:
+        best = None
+        for expected_alt in expected['alternatives']:
+            result = _score(student_alt, expected_alt)
+            if best is None or (result['correct'], result['score']) > (best['correct'], best['score']):
+                best = result
+        if worst is None or (best['correct'], best['score']) < (worst['correct'], worst['score']):
+            worst = best
+    hedged = len(student['alternatives']) > 1 and not worst['correct']
+
+    kinds = {v['kind'] for alt in expected['alternatives'] for values in alt['groups'].values() for v in values}
+    worst['kind'] = 'expression' if 'expression' in kinds else ('list' if worst['expected_count'] > 1 else 'numeric')
+    worst['needs_review'] = False
+    worst['feedback'] = "Give one answer: not every alternative is correct" if hedged else _feedback(worst)
+    return worst
+
+
+def _feedback(result: Dict[str, Any]) -> str:
+    if result['correct']:
+        return "Correct"
+    if result['matched'] and result['matched'] < result['expected_count']:
+        return f"{result['matched']} of {result['expected_count']} values correct"
+    if result['extra']:
+        return "Includes values that are not solutions"
+    return "Incorrect"
+
+
+def _text_comparison(student_answer: str, expected_answer: str, reason: str) -> Dict[str, Any]:
+    same = re.sub(r'\s+', '', str(student_answer).lower()) == re.sub(r'\s+', '', str(expected_answer).lower())
+    return {'correct': True if same else None, 'score': 1.0 if same else None, 'kind': 'text',
+            'needs_review': not same, 'feedback': "Correct" if same else reason}
+
+
+def check_batch(submissions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Grade many submissions: [{'id', 'answer', 'expected'}] -> results in the same order.
+
+    Expected answers are parsed once per distinct text, and plain expression
+    answers to the same question are compared against it as one matrix.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(submissions)
+    expression_rows: Dict[str, List[Tuple[int, np.ndarray]]] = {}
+
+    for position, submission in enumerate(submissions):
+        expected_text = str(submission.get('expected', ''))
+        answer_text = str(submission.get('answer', ''))
+        try:
+            expected = parse_answer(expected_text)
+            student = parse_answer(answer_text)
+            single_expression = all(
+                len(parsed['alternatives']) == 1 and list(parsed['alternatives'][0]['groups']) == ['']
+                and len(parsed['alternatives'][0]['groups']['']) == 1
+                and parsed['alternatives'][0]['groups'][''][0]['kind'] == 'expression'
+                for parsed in (expected, student) if parsed['kind'] == 'values'
+            ) and expected['kind'] == student['kind'] == 'values'
+        except AnswerParseError:
+            single_expression = False
+
+        if single_expression:
+            node = student['alternatives'][0]['groups'][''][0]['node']
+            expression_rows.setdefault(expected_text, []).append((position, _expression_values(node)))
+        else:
+            results[position] = check_answer(answer_text, expected_text)
+
+    for expected_text, rows in expression_rows.items():
+        expected_node = parse_answer(expected_text)['alternatives'][0]['groups'][''][0]['node']
+        matches = _expressions_match(np.vstack([values for _, values in rows]), _expression_values(expected_node))
+        for (position, _), ok in zip(rows, matches):
+            results[position] = {'matched': int(ok), 'expected_count': 1, 'extra': 0, 'score': float(ok),
+                                 'correct': bool(ok), 'kind': 'expression', 'needs_review': False,
+                                 'feedback': "Correct" if ok else "Incorrect"}
+
+    for submission, result in zip(submissions, results):
+        if 'id' in submission:
+            result['id'] = submission['id']
+    return results
@@ -2,8 +2,11 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 import os
 import base64
+import hmac
+import threading
 import time
 import uuid
+from collections import OrderedDict
 import numpy as np
 from io import BytesIO
 from unified_backend import UnifiedBackendService, TOPICS
@@ -12,7 +15,9 @@ from ai_lesson_generator import AILessonGenerator
 from dotenv import load_dotenv
 import re
 
-from trig_solver import TrigSolver
+from trig_solver import ConversationContext
+from assessment_bank import DIFFICULTIES as ASSESSMENT_DIFFICULTIES
+from model_registry import ModelRegistry, MODEL_WATCH_INTERVAL, RELOAD_ALREADY_RUNNING, RELOAD_NOT_FOUND
 from trig_graphs import generate_graph_for_question
 
 # Loading environment variables
@@ -31,18 +36,6 @@ else:
 app = Flask(__name__)
 CORS(app)
 
-# Initialized the unified backend service
-print("🔄 Loading Namibia NSSCAS Backend Service...")
-try:
-   
-    unified_service = UnifiedBackendService()
-    
-    print(" Namibia NSSCAS Backend Service loaded successfully!")
-    
-except Exception as e:
-    print(f" Error loading service: {e}")
-    unified_service = None
-
 # ---------- GLOBAL JSON CLEANER ----------
 def make_json_safe(obj):
     """Recursively convert NumPy types to JSON-safe Python types"""
@@ -58,28 +51,62 @@ def make_json_safe(obj):
 
 
 # ---------- LOADING MODEL ----------
+# The registry holds the serving TrigSolver; POST /admin/reload-model swaps in a new artifact version
 print("🔄 Loading AI Tutor (TrigSolver)...")
-try:
-    ai_tutor = TrigSolver()
+model_registry = ModelRegistry()
+if model_registry.load_initial():
     print(" AI Tutor model loaded successfully!")
-    if hasattr(ai_tutor.model_data, 'final_answers'):
-        final_answers_count = sum(1 for fa in ai_tutor.model_data.get('final_answers', []) if fa)
-        print(f" Loaded {final_answers_count} final answers from dataset")
+else:
+    print(" Error loading AI Tutor: no usable model artifact")
+# The CURRENT watcher is a thread, so it is started by whichever process serves requests
+# (__main__ below, or each gunicorn worker after the fork), not at import
+ai_tutor = model_registry.solver()
+
+
+def current_solver():
+    """The solver for this request; fetched once so a reload mid-request cannot mix versions"""
+    return model_registry.solver()
+
+# Initialized the unified backend service
+print("🔄 Loading Namibia NSSCAS Backend Service...")
+try:
+   
+    # Share the solver (and its MiniLM encoder) with /lessons/ask local routing and answer cache
+    semantic_encoder = ai_tutor.model_data.get('semantic_model') if ai_tutor and ai_tutor.model_data else None
+    unified_service = UnifiedBackendService(encoder=semantic_encoder, solver=ai_tutor)
+    model_registry.on_swap(unified_service.set_solver)
+    
+    print(" Namibia NSSCAS Backend Service loaded successfully!")
+    
 except Exception as e:
-    print(f" Error loading AI Tutor: {e}")
-    ai_tutor = None
+    print(f" Error loading service: {e}")
+    unified_service = None
 
 
-conversations = {}
+# Each conversation keeps its own immutable context, passed to and returned by solve();
+# the solver itself is shared by every request and survives model reloads untouched.
+# Clients pick their own ids, so only the MAX_CONVERSATIONS most recently used are kept
+MAX_CONVERSATIONS = int(os.getenv("MAX_CONVERSATIONS", "1000"))
+conversations = OrderedDict()
+conversations_lock = threading.Lock()
 
 def get_conversation(conversation_id):
-    """Get or create a conversation"""
-    if conversation_id not in conversations:
-        conversations[conversation_id] = {
-            'solver': TrigSolver(),
-            'history': []
-        }
-    return conversations[conversation_id]
+    """Get or create a conversation, dropping the least recently used beyond MAX_CONVERSATIONS"""
+    with conversations_lock:
+        if conversation_id in conversations:
+            conversations.move_to_end(conversation_id)
+        else:
+            conversations[conversation_id] = {
+                'context': ConversationContext(),
+                'history': []
+            }
+            while len(conversations) > MAX_CONVERSATIONS:
+                conversations.popitem(last=False)
+        return conversations[conversation_id]
+
+def new_conversation_id():
+    """A fresh, unguessable conversation id; never a shared literal"""
+    return f"conv_{int(time.time())}_{uuid.uuid4().hex[:8]}"
 
 # ---------- HOME ROUTE ----------
 @app.route("/", methods=["GET"])
@@ -87,7 +114,7 @@ def home():
     return jsonify(
         {
             "message": "AS TrigTutor Python Service is running 🚀",
-            "ai_tutor_loaded": ai_tutor is not None,
+            "ai_tutor_loaded": current_solver() is not None,
             "unified_service_loaded": unified_service is not None,
             "available_endpoints": [
                 "POST /solve - Solve trig problems with AI",
@@ -99,6 +126,12 @@ def home():
                 "POST /lessons/continue-topic - Continue a topic",
                 "POST /lessons/section - Get lesson section",
                 "GET /lessons/topics - Get all topics",
+                "POST /lessons/assessment - Draw a pre/post-test from the question bank",
+                "POST /lessons/practice - Generate verified practice questions",
+                "POST /answers/check - Check one student answer",
+                "POST /answers/check-batch - Check a class's answers in one call",
+                "GET /metrics - AI pipeline counters",
+                "POST /admin/reload-model - Load a new model version without downtime (X-Admin-Token)",
                 
                
             ],
@@ -193,12 +226,13 @@ def ask_question():
         question = data.get('question')
         conversation = data.get('conversation', [])
         student_id = data.get('student_id')
+        fresh_explanation = bool(data.get('fresh_explanation', False))
         
         if not topic_id or not question or not student_id:
             return jsonify({"error": "Missing topic_id, question, or student_id"}), 400
         
         print(f"🔍 DEBUG: Calling unified_service.ask_question...")
-        result = unified_service.ask_question(topic_id, question, conversation, student_id)
+        result = unified_service.ask_question(topic_id, question, conversation, student_id, fresh_explanation)
         print(f"🔍 DEBUG: Result: {result}")
         
         # ✅ MAKE SURE THIS RETURN STATEMENT EXISTS
@@ -209,6 +243,119 @@ def ask_question():
         import traceback
         traceback.print_exc()
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
+@app.route('/lessons/assessment', methods=['POST'])
+def get_assessment():
+    """Draw a pre-test or post-test from the pre-built assessment bank"""
+    try:
+        if not unified_service:
+            return jsonify({"error": "Unified service not loaded"}), 500
+        
+        data = request.get_json() or {}
+        topic_id = data.get('topic_id')
+        assessment_type = data.get('assessment_type', 'pre_test')
+        
+        if not topic_id:
+            return jsonify({"error": "Missing topic_id"}), 400
+        if assessment_type not in ('pre_test', 'post_test'):
+            return jsonify({"error": "assessment_type must be pre_test or post_test"}), 400
+        # Checked here once: the bank would quietly read an unknown difficulty as medium
+        difficulty = data.get('difficulty')
+        if difficulty is not None and difficulty not in ASSESSMENT_DIFFICULTIES:
+            return jsonify({"error": f"difficulty must be one of {', '.join(ASSESSMENT_DIFFICULTIES)}"}), 400
+        count = int(data.get('count', 10))
+        if count <= 0:
+            return jsonify({"error": "count must be a positive number"}), 400
+        
+        result = unified_service.get_assessment(
+            topic_id,
+            assessment_type,
+            count=min(count, 50),
+            difficulty=difficulty,
+            concept=data.get('concept'),
+            marks=data.get('marks'),
+            seed=data.get('seed')
+        )
+        if result.get('error'):
+            return jsonify(result), 404
+        return jsonify(make_json_safe(result))
+        
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"❌ ERROR in /lessons/assessment route: {str(e)}")
+        return jsonify({"error": "Failed to build assessment", "details": str(e)}), 500
+
+@app.route('/lessons/practice', methods=['POST'])
+def get_practice_questions():
+    """Verified parametric practice questions, generated locally"""
+    try:
+        if not unified_service:
+            return jsonify({"error": "Unified service not loaded"}), 500
+        
+        data = request.get_json() or {}
+        topic_id = data.get('topic_id')
+        if not topic_id:
+            return jsonify({"error": "Missing topic_id"}), 400
+        
+        result = unified_service.get_practice_questions(
+            topic_id,
+            count=min(int(data.get('count', 5)), 100),
+            difficulty=data.get('difficulty'),
+            template=data.get('template')
+        )
+        if result.get('error'):
+            return jsonify(result), 404
+        return jsonify(make_json_safe(result))
+        
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"❌ ERROR in /lessons/practice route: {str(e)}")
+        return jsonify({"error": "Failed to generate practice questions", "details": str(e)}), 500
+
+@app.route('/answers/check', methods=['POST'])
+def check_student_answer():
+    """Check one answer against 'expected' or a bank 'question_id'"""
+    try:
+        if not unified_service:
+            return jsonify({"error": "Unified service not loaded"}), 500
+        
+        data = request.get_json() or {}
+        if 'answer' not in data:
+            return jsonify({"error": "Missing answer"}), 400
+        
+        result = unified_service.check_single_answer(data['answer'], data.get('expected'), data.get('question_id'))
+        if result.get('error'):
+            return jsonify(result), 400
+        return jsonify(make_json_safe(result))
+        
+    except Exception as e:
+        print(f"❌ ERROR in /answers/check route: {str(e)}")
+        return jsonify({"error": "Failed to check answer", "details": str(e)}), 500
+
+@app.route('/answers/check-batch', methods=['POST'])
+def check_student_answers():
+    """Check many answers at once: {"submissions": [{"id", "answer", "expected" | "question_id"}]}"""
+    try:
+        if not unified_service:
+            return jsonify({"error": "Unified service not loaded"}), 500
+        
+        data = request.get_json(silent=True) or {}
+        submissions = data.get('submissions') if isinstance(data, dict) else None
+        if not isinstance(submissions, list):
+            return jsonify({"error": "Missing submissions list"}), 400
+        if len(submissions) > 5000:
+            return jsonify({"error": "At most 5000 submissions per batch"}), 400
+        invalid = [i for i, submission in enumerate(submissions) if not isinstance(submission, dict)]
+        if invalid:
+            return jsonify({"error": "Each submission must be an object", "invalid": invalid[:20]}), 400
+        
+        return jsonify(make_json_safe(unified_service.check_answers(submissions)))
+        
+    except Exception as e:
+        print(f"❌ ERROR in /answers/check-batch route: {str(e)}")
+        return jsonify({"error": "Failed to check answers", "details": str(e)}), 500
+
 @app.route('/lessons/syllabus-info', methods=['GET'])
 def get_syllabus_info():
     """Get Namibia syllabus information"""
@@ -243,10 +390,13 @@ def get_lessons_topics():
 @app.route('/health', methods=['GET'])
 def health_check():
     namibia_status = "Active" if unified_service and hasattr(unified_service, 'lesson_generator') else "❌ Inactive"
+    ai_circuit = unified_service.lesson_generator.ai_service.get_circuit_state() if unified_service else None
     
     return jsonify({
-        "status": "healthy",
-        "ai_tutor_loaded": ai_tutor is not None,
+        "status": "degraded" if ai_circuit and ai_circuit["state"] != "closed" else "healthy",
+        "ai_service": ai_circuit,
+        "ai_tutor_loaded": current_solver() is not None,
+        "model": model_registry.get_status(),
         "unified_service_loaded": unified_service is not None,
         "namibia_syllabus": namibia_status,
         "syllabus_code": "8227",
@@ -254,12 +404,41 @@ def health_check():
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def service_metrics():
+    """Runtime counters for caching, coalescing and LLM usage"""
+    if not unified_service:
+        return jsonify({"error": "Unified service not loaded"}), 500
+    
+    return jsonify(make_json_safe(unified_service.get_service_metrics()))
+
+
+# ---------- ADMIN ROUTES ----------
+RELOAD_ERROR_STATUS = {RELOAD_ALREADY_RUNNING: 409, RELOAD_NOT_FOUND: 404}
+
+@app.route('/admin/reload-model', methods=['POST'])
+def reload_model():
+    """Load a model version in the background and swap it in once warm: {"version": optional, "wait": false}"""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        return jsonify({"error": "Model reload is disabled (ADMIN_TOKEN not set)"}), 403
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), admin_token.encode()):
+        return jsonify({"error": "Invalid admin token"}), 401
+    
+    data = request.get_json(silent=True) or {}
+    result = model_registry.reload(data.get("version"), wait=bool(data.get("wait", False)))
+    if not result["started"]:
+        return jsonify(result), RELOAD_ERROR_STATUS[result["reason"]]
+    return jsonify(make_json_safe(result)), 200 if result.get("completed") else 202
+
+
 # ---------- SOLVER ROUTES ----------
 @app.route("/solve", methods=["POST"])
 def solve_trig():
     try:
         print(" Entering /solve endpoint")
         
+        ai_tutor = current_solver()
         if not ai_tutor:
             print(" AI Tutor not loaded")
             return jsonify({"error": "AI Tutor model not loaded"}), 500
@@ -276,17 +455,24 @@ def solve_trig():
             print(" No question provided")
             return jsonify({"error": "Please provide a trigonometric question"}), 400
 
-        # Get the appropriate conversation
-        if conversation_id:
+        # Without a conversation id (or with the old shared "default" id) the question is
+        # answered from a fresh context and nothing is stored: a shared id would mix students'
+        # contexts, and a new entry per call would grow without bound. Clients that want
+        # follow-ups send their own id or get one from /conversations/new
+        if not conversation_id or conversation_id == "default":
+            conversation_id = None
+            conversation_data = None
+            context = ConversationContext()
+            print(" No conversation ID: answering without context")
+        else:
             print(f" Using conversation ID: {conversation_id}")
             conversation_data = get_conversation(conversation_id)
-            solver_instance = conversation_data['solver']
-        else:
-            print(" Using default solver")
-            solver_instance = ai_tutor
+            context = conversation_data['context']
 
         print(" Calling solver.solve()...")
-        result = solver_instance.solve(question)
+        result, new_context = ai_tutor.solve(question, context)
+        if conversation_data is not None:
+            conversation_data['context'] = new_context
         print(f" Solver result keys: {result.keys() if result else 'None'}")
         
         safe_result = make_json_safe(result)
@@ -298,12 +484,12 @@ def solve_trig():
             del safe_result["solution"]
 
       
-        safe_result["conversation_id"] = conversation_id or "default"
+        safe_result["conversation_id"] = conversation_id
         safe_result["available_alternative"] = True
 
-        # Store in conversation history if using conversation system
-        if conversation_id and conversation_id in conversations:
-            conversations[conversation_id]['history'].append({
+        # Store in conversation history
+        if conversation_data is not None:
+            conversation_data['history'].append({
                 'question': question,
                 'response': safe_result,
                 'timestamp': time.time()
@@ -378,8 +564,9 @@ def graph_generation():
         print(f"🔍 USING INPUT: '{input_text}'")
         
        
+        ai_tutor = current_solver()
         if ai_tutor:
-            result = ai_tutor.solve(input_text)
+            result, _ = ai_tutor.solve(input_text)
             if result.get("has_graph", False) and result.get("graph_image"):
                 # Ensure consistent format - convert to base64 if needed
                 graph_image = result["graph_image"]
@@ -432,11 +619,12 @@ def graph_generation():
 def graph_status():
     """Check if graph functionality is working"""
     try:
+        ai_tutor = current_solver()
         if not ai_tutor:
             return jsonify({"graph_enabled": False, "message": "AI Tutor not loaded"})
         
        
-        test_result = ai_tutor.solve("Sketch y = sin x")
+        test_result, _ = ai_tutor.solve("Sketch y = sin x")
         
         return jsonify({
             "graph_enabled": True,
@@ -457,16 +645,12 @@ def graph_status():
 def create_new_conversation():
     """Create a new conversation"""
     try:
-        conversation_id = f"conv_{int(time.time())}_{uuid.uuid4().hex[:8]}"
-        conversation_data = get_conversation(conversation_id)
-        
-        # Explicitly start a new conversation in the solver
-        solver_instance = conversation_data['solver']
-        new_conv_id = solver_instance.memory.start_new_conversation(conversation_id)
+        conversation_id = new_conversation_id()
+        get_conversation(conversation_id)
         
         return jsonify({
             "success": True,
-            "conversation_id": new_conv_id,
+            "conversation_id": conversation_id,
             "message": "New conversation created"
         })
     except Exception as e:
@@ -477,7 +661,9 @@ def get_all_conversations():
     """Get list of all conversations"""
     try:
         conv_list = []
-        for conv_id, conv_data in conversations.items():
+        with conversations_lock:
+            snapshot = list(conversations.items())
+        for conv_id, conv_data in snapshot:
             conv_list.append({
                 'id': conv_id,
                 'message_count': len(conv_data['history']),
@@ -492,13 +678,14 @@ def get_all_conversations():
 def get_conversation_history(conversation_id):
     """Get history of a specific conversation"""
     try:
-        if conversation_id not in conversations:
+        conversation_data = conversations.get(conversation_id)
+        if conversation_data is None:
             return jsonify({"error": "Conversation not found"}), 404
         
         return jsonify({
             "success": True,
             "conversation_id": conversation_id,
-            "history": conversations[conversation_id]['history']
+            "history": conversation_data['history']
         })
     except Exception as e:
         return jsonify({"error": f"Failed to get conversation: {str(e)}"}), 500
@@ -507,8 +694,9 @@ def get_conversation_history(conversation_id):
 def delete_conversation(conversation_id):
     """Delete a specific conversation"""
     try:
-        if conversation_id in conversations:
-            del conversations[conversation_id]
+        with conversations_lock:
+            deleted = conversations.pop(conversation_id, None) is not None
+        if deleted:
             return jsonify({"success": True, "message": "Conversation deleted"})
         else:
             return jsonify({"error": "Conversation not found"}), 404
@@ -517,48 +705,14 @@ def delete_conversation(conversation_id):
 
 
 # ---------- START SERVER ----------
+# Development server only. In production run the pre-fork server: gunicorn -c gunicorn.conf.py wsgi:application
+# Self-tests are a separate command: python self_test.py
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 7000))
     print(f"\n AS TrigTutor Flask service running on http://127.0.0.1:{port}")
-    print(f" AI Tutor Status: {' Loaded' if ai_tutor else ' Not loaded'}")
+    print(f" AI Tutor Status: {' Loaded' if current_solver() else ' Not loaded'}")
     print(f" Unified Service Status: {' Loaded' if unified_service else ' Not loaded'}")
     
-   
-    if ai_tutor:
-     print("\n🧪 Testing Template System...")
-     test_questions = [
-        "Sketch y = 2 sin(3x)",  # Should use GRAPH_PROPERTIES template
-        "Find the exact value of cos(45°)",  # Should use EXACT_VALUES template  
-        "Prove that sin²θ + cos²θ = 1",  # Should use PROVE_IDENTITIES template
-        "Solve sin x = 0.5",  # Should use SOLVE_EQUATIONS template
-        "A ladder leans against a wall at 60°, find the height"  # Should use APPLICATIONS template
-    ]
-    
-    for test_q in test_questions:
-        try:
-            result = ai_tutor.solve(test_q)
-            source = result.get('source', 'unknown')
-            template = result.get('template_used', 'none')
-            print(f"   '{test_q}'")
-            print(f"   Source: {source}, Template: {template}")
-            print(f"   Confidence: {result.get('confidence', 0):.2f}")
-        except Exception as e:
-            print(f"    Error testing '{test_q}': {e}")
-    
-    # Test unified service if loaded
-    if unified_service:
-        print("\n Testing Unified Backend Service...")
-        try:
-            # Test getting topics
-            topics_result = unified_service.get_available_topics()
-            print(f"  Available topics: {len(topics_result.get('topics', []))}")
-            
-            # Test student initialization
-            test_student_id = "test_student_001"
-            unified_service.topic_manager.initialize_student(test_student_id)
-            print(f"   Test student initialized: {test_student_id}")
-            
-        except Exception as e:
-            print(f"   Error testing unified service: {e}")
-    
-    app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
+    model_registry.start_watcher(MODEL_WATCH_INTERVAL)
+    # No reloader: it would start a second process and load the model twice
+    app.run(host="0.0.0.0", port=port, debug=os.getenv("FLASK_DEBUG") == "1", use_reloader=False, threaded=True)
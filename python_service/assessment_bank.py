@@ -0,0 +1,336 @@
+# assessment_bank.py
+"""
+Pre-built assessment question bank.
+
+Built offline from the dataset's exam_questions, the past paper questions in
+exam_preparation and (optionally) LLM-generated items, then saved to
+trig_assessments.json. At runtime every item is indexed by topic,
+difficulty, concept and marks, and a pre-test is drawn from the precomputed
+(topic, difficulty) buckets, so assembling one costs O(k) for k questions
+and never calls the LLM.
+
+    python assessment_bank.py                      # dataset items only
+    python assessment_bank.py --parametric-per-topic 40
+    python assessment_bank.py --generate-per-topic 6
+"""
+import argparse
+import json
+import os
+import random
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+DATASET_PATH = os.path.join(os.path.dirname(__file__), "trig_dataset.json")
+ASSESSMENT_BANK_PATH = os.getenv(
+    "ASSESSMENT_BANK_PATH", os.path.join(os.path.dirname(__file__), "trig_assessments.json")
+)
+BANK_SCHEMA_VERSION = 1
+
+TOPIC_IDS = ["circular_measure", "trigonometric_graphs", "trigonometric_identities",
+             "trigonometric_equations", "advanced_trigonometry"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+# Share of each difficulty in a drawn assessment
+ASSESSMENT_MIXES = {
+    "pre_test": {"easy": 0.4, "medium": 0.4, "hard": 0.2},
+    "post_test": {"easy": 0.2, "medium": 0.4, "hard": 0.4},
+}
+
+_DIFFICULTY_MAP = {"basic": "easy", "easy": "easy", "moderate": "medium", "intermediate": "medium",
+                   "medium": "medium", "advanced": "hard", "hard": "hard"}
+
+# Checked in order; the first match decides the syllabus topic
+_TOPIC_KEYWORDS = [
+    ("advanced_trigonometry", ["compound angle", "double angle", "half angle", "r-form", "r-formula",
+                               "rsin", "rcos", "secant", "cosec", "cot"]),
+    ("circular_measure", ["circular measure", "radian", "arc length", "sector", "segment"]),
+    ("trigonometric_graphs", ["graph", "sketch", "amplitude", "period", "exact value"]),
+    ("trigonometric_identities", ["identit", "prove", "show that", "≡"]),
+    ("trigonometric_equations", ["equation", "solve"]),
+]
+
+_STEP_LINE = re.compile(r'^\s*step\s*\d+', re.IGNORECASE)
+
+
+def map_topic(dataset_topic: str, question: str) -> str:
+    """Syllabus topic id for a dataset item, from its topic label first and its text second"""
+    for text in (dataset_topic or "", question or ""):
+        lowered = text.lower()
+        for topic_id, keywords in _TOPIC_KEYWORDS:
+            if any(keyword in lowered for keyword in keywords):
+                return topic_id
+    return "trigonometric_graphs"
+
+
+def normalise_difficulty(difficulty: str) -> str:
+    return _DIFFICULTY_MAP.get(str(difficulty or "").strip().lower(), "medium")
+
+
+def estimate_marks(solution_steps: List[str]) -> int:
+    """Roughly one method mark per numbered step, as in the marking schemes"""
+    steps = sum(1 for step in solution_steps if _STEP_LINE.match(str(step))) or len(solution_steps)
+    return max(2, min(steps, 8))
+
+
+def _concepts_for(dataset_topic: str, syllabus_ref: str) -> List[str]:
+    concepts = []
+    if dataset_topic:
+        concepts.append(re.sub(r'[^a-z0-9]+', '_', dataset_topic.lower()).strip('_'))
+    if syllabus_ref:
+        section = re.match(r'\s*(\d+(?:\.\d+)*)', syllabus_ref)
+        if section:
+            concepts.append(f"syllabus_{section.group(1)}")
+    return concepts
+
+
+def item_from_dataset(entry: Dict[str, Any], source: str) -> Dict[str, Any]:
+    """Assessment item in the shape the lesson endpoints already return"""
+    steps = [str(step) for step in entry.get("step_by_step_solution", [])]
+    dataset_topic = entry.get("topic", "")
+    return {
+        "question_id": entry.get("id"),
+        "question": entry.get("question", ""),
+        "options": [],
+        "correct_answer": entry.get("final_answer", ""),
+        "solution_steps": steps,
+        "explanation": entry.get("source", ""),
+        "topic_id": map_topic(dataset_topic, entry.get("question", "")),
+        "difficulty": normalise_difficulty(entry.get("difficulty")),
+        "concepts": _concepts_for(dataset_topic, entry.get("syllabus_ref", "")),
+        "marks": int(entry.get("marks") or estimate_marks(steps)),
+        "source": source,
+    }
+
+
+def item_from_generated(question: Dict[str, Any], topic_id: str, difficulty: str, number: int) -> Optional[Dict[str, Any]]:
+    """Normalise an LLM-generated question; None if it is missing its question or answer"""
+    if not question.get("question") or not question.get("correct_answer"):
+        return None
+    correct_answer = question["correct_answer"]
+    return {
+        "question_id": f"GEN_{topic_id}_{difficulty}_{number:03d}",
+        "question": question["question"],
+        "options": question.get("options") or [],
+        "correct_answer": correct_answer if isinstance(correct_answer, str) else json.dumps(correct_answer, ensure_ascii=False),
+        "solution_steps": [],
+        "explanation": question.get("explanation", ""),
+        "topic_id": topic_id,
+        "difficulty": normalise_difficulty(question.get("difficulty", difficulty)),
+        "concepts": [str(c) for c in question.get("concepts", [])],
+        "marks": int(question.get("marks") or 4),
+        "source": "generated",
+    }
+
+
+def build_bank_items(dataset: Dict[str, Any], include_practice: bool = True) -> List[Dict[str, Any]]:
+    """Assessment items from the dataset, de-duplicated by question text"""
+    entries = [(entry, "exam_questions") for entry in dataset.get("exam_questions", [])]
+    entries += [(entry, "past_paper") for entry in dataset.get("exam_preparation", {}).get("past_paper_questions", [])]
+    if include_practice:
+        for section in ("fundamentals", "identities", "equations"):
+            entries += [(entry, f"dataset_{section}") for entry in dataset.get(section, [])]
+
+    items, seen = [], set()
+    for entry, source in entries:
+        if not isinstance(entry, dict) or not entry.get("question") or not entry.get("final_answer"):
+            continue
+        key = re.sub(r'\s+', ' ', entry["question"].strip().lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        items.append(item_from_dataset(entry, source))
+    return items
+
+
+class AssessmentBank:
+    """Indexed, in-memory assessment items with O(k) draws"""
+
+    def __init__(self, items: List[Dict[str, Any]], built_at: Optional[str] = None):
+        self.items = items
+        self.built_at = built_at
+        self._build_indexes()
+
+    def _build_indexes(self):
+        self.by_topic = defaultdict(list)
+        self.by_topic_difficulty = defaultdict(list)
+        self.by_concept = defaultdict(list)
+        self.by_marks = defaultdict(list)
+        self.by_id = {}
+        for position, item in enumerate(self.items):
+            self.by_id[item.get("question_id")] = position
+            self.by_topic[item["topic_id"]].append(position)
+            self.by_topic_difficulty[(item["topic_id"], item["difficulty"])].append(position)
+            for concept in item.get("concepts", []):
+                self.by_concept[concept].append(position)
+            self.by_marks[item.get("marks", 0)].append(position)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, question_id: str) -> Optional[Dict[str, Any]]:
+        position = self.by_id.get(question_id)
+        return dict(self.items[position]) if position is not None else None
+
+    @classmethod
+    def load(cls, path: str = ASSESSMENT_BANK_PATH, dataset_path: str = DATASET_PATH) -> "AssessmentBank":
+        """Load the built bank, or build the dataset-only bank in memory if there is none"""
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("schema_version") == BANK_SCHEMA_VERSION:
+                    bank = cls(data.get("items", []), data.get("built_at"))
+                    print(f"📝 Assessment bank: {len(bank)} questions across {len(bank.by_topic)} topics")
+                    return bank
+                print(f"⚠️ {path} is not an assessment bank (schema {data.get('schema_version')}), rebuild it")
+            else:
+                print(f"⚠️ No assessment bank at {path}, building one from the dataset")
+        except Exception as e:
+            print(f"⚠️ Could not load assessment bank: {e}")
+
+        try:
+            with open(dataset_path, 'r', encoding='utf-8') as f:
+                return cls(build_bank_items(json.load(f)), datetime.now().isoformat())
+        except Exception as e:
+            print(f"⚠️ Could not build assessment bank from dataset: {e}")
+            return cls([])
+
+    @classmethod
+    def from_legacy(cls, assessments: Dict[str, Dict[str, List[Dict[str, Any]]]]) -> "AssessmentBank":
+        """Bank from the old {topic: {"pre_test": [...], "post_test": [...]}} layout"""
+        items = []
+        for topic_id, tests in assessments.items():
+            for questions in tests.values():
+                for question in questions:
+                    items.append({
+                        **question,
+                        "topic_id": topic_id,
+                        "difficulty": normalise_difficulty(question.get("difficulty")),
+                        "marks": int(question.get("marks") or estimate_marks(question.get("solution_steps", []))),
+                        "source": "default"
+                    })
+        return cls(items)
+
+    def save(self, path: str = ASSESSMENT_BANK_PATH):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "schema_version": BANK_SCHEMA_VERSION,
+                "built_at": self.built_at or datetime.now().isoformat(),
+                "items": self.items
+            }, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def draw(self, topic_id: str, count: int = 10, assessment_type: str = "pre_test",
+             difficulty: Optional[str] = None, concept: Optional[str] = None,
+             marks: Optional[int] = None, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Draw up to count distinct questions for a topic.
+
+        Without filters the draw follows the assessment type's difficulty mix and
+        samples straight from the precomputed (topic, difficulty) buckets.
+        """
+        rng = random.Random(seed)
+
+        if concept is not None or marks is not None:
+            # Filtered draws intersect the smaller index with the topic
+            candidates = self.by_topic.get(topic_id, [])
+            if concept is not None:
+                concept_positions = set(self.by_concept.get(concept, []))
+                candidates = [p for p in candidates if p in concept_positions]
+            if marks is not None:
+                marks_positions = set(self.by_marks.get(int(marks), []))
+                candidates = [p for p in candidates if p in marks_positions]
+            if difficulty is not None:
+                candidates = [p for p in candidates if self.items[p]["difficulty"] == normalise_difficulty(difficulty)]
+            chosen = rng.sample(candidates, min(count, len(candidates)))
+            return [dict(self.items[p]) for p in chosen]
+
+        if difficulty is not None:
+            bucket = self.by_topic_difficulty.get((topic_id, normalise_difficulty(difficulty)), [])
+            return [dict(self.items[p]) for p in rng.sample(bucket, min(count, len(bucket)))]
+
+        mix = ASSESSMENT_MIXES.get(assessment_type, ASSESSMENT_MIXES["pre_test"])
+        # Whole questions per level; the remainder goes to the largest fractional shares,
+        # so the levels add up to count exactly (rounding each one gave 10 for count=9)
+        shares = {level: count * mix[level] for level in DIFFICULTIES}
+        wanted = {level: int(share) for level, share in shares.items()}
+        by_fraction = sorted(DIFFICULTIES, key=lambda level: wanted[level] - shares[level])
+        for level in by_fraction[:count - sum(wanted.values())]:
+            wanted[level] += 1
+
+        chosen: List[int] = []
+        for level in DIFFICULTIES:
+            bucket = self.by_topic_difficulty.get((topic_id, level), [])
+            chosen.extend(rng.sample(bucket, min(wanted[level], len(bucket))))
+
+        # Top up from the whole topic when a difficulty bucket ran short
+        shortfall = count - len(chosen)
+        if shortfall > 0:
+            taken = set(chosen)
+            topic_positions = self.by_topic.get(topic_id, [])
+            # Sampling shortfall + len(taken) guarantees enough positions that were not drawn yet
+            extra = rng.sample(topic_positions, min(len(topic_positions), shortfall + len(taken)))
+            chosen.extend([p for p in extra if p not in taken][:shortfall])
+
+        return [dict(self.items[p]) for p in chosen[:count]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "questions": len(self.items),
+            "built_at": self.built_at,
+            "by_topic": {topic: len(positions) for topic, positions in self.by_topic.items()},
+            "by_difficulty": {f"{topic}:{level}": len(positions)
+                              for (topic, level), positions in self.by_topic_difficulty.items()},
+            "concepts": len(self.by_concept)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the assessment question bank")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--output", default=ASSESSMENT_BANK_PATH)
+    parser.add_argument("--exam-only", action="store_true",
+                        help="only exam and past paper questions, not the practice sections")
+    parser.add_argument("--parametric-per-topic", type=int, default=0,
+                        help="add this many verified parametric variants per topic (no LLM)")
+    parser.add_argument("--generate-per-topic", type=int, default=0,
+                        help="also ask the LLM for this many questions per topic and difficulty")
+    args = parser.parse_args()
+
+    with open(args.dataset, 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+    items = build_bank_items(dataset, include_practice=not args.exam_only)
+    print(f"📚 {len(items)} questions from the dataset")
+
+    if args.parametric_per_topic > 0:
+        from question_generator import ParametricQuestionGenerator
+        generator = ParametricQuestionGenerator()
+        for topic_id in TOPIC_IDS:
+            variants = generator.generate(topic_id, args.parametric_per_topic)
+            items.extend(variants)
+            print(f"   🧮 {topic_id}: {len(variants)} parametric questions")
+
+    if args.generate_per_topic > 0:
+        from ai_service import AIService
+        ai_service = AIService()
+        for topic_id in TOPIC_IDS:
+            for difficulty in DIFFICULTIES:
+                generated = ai_service.generate_assessment_questions(
+                    topic_id, "structured", difficulty, args.generate_per_topic)
+                added = [item for number, question in enumerate(generated, 1)
+                         if (item := item_from_generated(question, topic_id, difficulty, number))]
+                items.extend(added)
+                print(f"   🤖 {topic_id} ({difficulty}): {len(added)} generated questions")
+
+    bank = AssessmentBank(items, datetime.now().isoformat())
+    bank.save(args.output)
+    print(f"💾 Assessment bank saved to {args.output}")
+    for topic_id in TOPIC_IDS:
+        counts = {level: len(bank.by_topic_difficulty.get((topic_id, level), [])) for level in DIFFICULTIES}
+        print(f"   {topic_id:<26} {counts}")
+
+
+if __name__ == "__main__":
+    main()
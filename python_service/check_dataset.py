@@ -1,21 +1,19 @@
-import json
-import os
+import sys
 
-DATASET_PATH = os.path.join(os.path.dirname(__file__), "trig_dataset.json")
+from dataset_loader import DATASET_SOURCE, load_section, print_report, validate_dataset
 
-try:
-    with open(DATASET_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
-    print("✅ JSON loaded successfully!")
-    print(f"📊 Data type: {type(data)}")
-    print(f"📊 Data length: {len(data)}")
-    print(f"📊 Dictionary keys: {list(data.keys())}")
-    
-    # Check what's under the first key
-    first_key = list(data.keys())[0]
-    print(f"📊 First key '{first_key}' contains: {type(data[first_key])}")
-    print(f"📊 Sample of first key content: {data[first_key]}")
-    
-except Exception as e:
-    print(f"❌ Error loading dataset: {e}")
\ No newline at end of file
+# One streaming pass: every entry is schema-checked and reported with its path
+source = sys.argv[1] if len(sys.argv) > 1 else DATASET_SOURCE
+report = validate_dataset(source)
+
+if report["errors"]:
+    print(f"❌ Dataset has problems: {source}")
+else:
+    print(f"✅ Dataset is valid: {source}")
+print_report(report)
+
+metadata = load_section("metadata", source)
+if isinstance(metadata, dict):
+    print(f"📊 Metadata keys: {list(metadata.keys())}")
+
+sys.exit(1 if report["errors"] else 0)
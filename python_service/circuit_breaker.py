@@ -0,0 +1,152 @@
+# circuit_breaker.py
+"""
+Circuit breaker for the Groq dependency.
+
+While Groq is down or crawling, every request used to sit out the full HTTP
+timeout before receiving placeholder text. The breaker watches a sliding
+window of recent calls and trips OPEN when too many fail or are too slow.
+While open, calls fail immediately and callers serve stored, cached or
+dataset-backed content instead. After a cool-down it goes HALF_OPEN and lets
+a few trial calls through: if they succeed the circuit closes again,
+otherwise it re-opens.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+BREAKER_WINDOW_SIZE = int(os.getenv("AI_BREAKER_WINDOW_SIZE", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("AI_BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("AI_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("AI_BREAKER_SLOW_CALL_SECONDS", "12"))
+BREAKER_SLOW_CALL_RATE = float(os.getenv("AI_BREAKER_SLOW_CALL_RATE", "0.8"))
+BREAKER_OPEN_SECONDS = float(os.getenv("AI_BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_TRIALS = int(os.getenv("AI_BREAKER_HALF_OPEN_TRIALS", "2"))
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker driven by error rate and slow-call rate"""
+
+    def __init__(self, name: str, window_size: int = BREAKER_WINDOW_SIZE,
+                 minimum_calls: int = BREAKER_MIN_CALLS,
+                 failure_rate_threshold: float = BREAKER_FAILURE_RATE,
+                 slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+                 slow_call_rate_threshold: float = BREAKER_SLOW_CALL_RATE,
+                 open_seconds: float = BREAKER_OPEN_SECONDS,
+                 half_open_trials: int = BREAKER_HALF_OPEN_TRIALS):
+        self.name = name
+        self.minimum_calls = minimum_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_trials = half_open_trials
+
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=window_size)    # (failed, slow) per call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials_started = 0
+        self._trials_succeeded = 0
+        self.stats = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "times_opened": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.time())
+
+    def _current_state(self, now: float) -> str:
+        # Called with the lock held; an expired OPEN becomes HALF_OPEN lazily
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._trials_started = 0
+            self._trials_succeeded = 0
+            print(f"🔌 Circuit '{self.name}' half-open, probing recovery")
+        return self._state
+
+    def is_available(self) -> bool:
+        """Would a call be attempted right now? Does not use up a half-open trial"""
+        with self._lock:
+            state = self._current_state(time.time())
+            return state == CLOSED or (state == HALF_OPEN and self._trials_started < self.half_open_trials)
+
+    def allow_request(self) -> bool:
+        """Ask permission for one call; in half-open only the trial calls are let through"""
+        with self._lock:
+            state = self._current_state(time.time())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._trials_started < self.half_open_trials:
+                self._trials_started += 1
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self, latency: float):
+        self._record(failed=False, latency=latency)
+
+    def record_failure(self, latency: float):
+        self._record(failed=True, latency=latency)
+
+    def _record(self, failed: bool, latency: float):
+        slow = latency >= self.slow_call_seconds
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["failures"] += int(failed)
+            self.stats["slow_calls"] += int(slow)
+            state = self._current_state(time.time())
+
+            if state == HALF_OPEN:
+                if failed or slow:
+                    self._trip("half-open trial failed")
+                    return
+                self._trials_succeeded += 1
+                if self._trials_succeeded >= self.half_open_trials:
+                    self._state = CLOSED
+                    self._window.clear()
+                    print(f"✅ Circuit '{self.name}' closed, upstream recovered")
+                return
+
+            if state == OPEN:
+                return    # A call that started before the trip finished late
+
+            self._window.append((failed, slow))
+            if len(self._window) < self.minimum_calls:
+                return
+            failure_rate = sum(1 for f, _ in self._window if f) / len(self._window)
+            slow_rate = sum(1 for _, s in self._window if s) / len(self._window)
+            if failure_rate >= self.failure_rate_threshold:
+                self._trip(f"failure rate {failure_rate:.0%}")
+            elif slow_rate >= self.slow_call_rate_threshold:
+                self._trip(f"slow call rate {slow_rate:.0%}")
+
+    def _trip(self, reason: str):
+        # Called with the lock held
+        self._state = OPEN
+        self._opened_at = time.time()
+        self._window.clear()
+        self.stats["times_opened"] += 1
+        print(f"⛔ Circuit '{self.name}' opened ({reason}), failing fast for {self.open_seconds:.0f}s")
+
+    def get_state(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            state = self._current_state(now)
+            window = list(self._window)
+            stats = dict(self.stats)
+            retry_in = max(self.open_seconds - (now - self._opened_at), 0.0) if state == OPEN else 0.0
+
+        return {
+            "name": self.name,
+            "state": state,
+            "retry_in_seconds": round(retry_in, 1),
+            "window_calls": len(window),
+            "window_failure_rate": round(sum(1 for f, _ in window if f) / len(window), 3) if window else 0.0,
+            "window_slow_rate": round(sum(1 for _, s in window if s) / len(window), 3) if window else 0.0,
+            **stats
+        }
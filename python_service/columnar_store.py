@@ -0,0 +1,269 @@
+# columnar_store.py
+"""
+Columnar storage for the per-question answer data in model_data.
+
+solutions, alternative_solutions, final_answers, categories, question_ids and
+plotting_data used to be parallel Python lists of lists of str and dicts. Each
+step is its own str object (about 50 bytes of header), each row its own list,
+and each category name is repeated once per row.
+
+Here every string lives in one UTF-8 blob, and an offsets array marks where
+each one starts. Solution steps are stored one after another, so a row's
+steps are just a range of string numbers. Categories are interned into small
+integer codes. Plotting data goes into a side table with one entry per row
+that has a graph. function_type is interned, matplotlib_code and equation
+are blob strings, and the irregular remainder of each dict (key points,
+axes config, ...) is a JSON string in the blob.
+
+Strings are decoded only when a row is read, so a lookup costs a few slices.
+
+    python columnar_store.py --report [true_ai_tutor.pkl]
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+COLUMNS = ('solutions', 'alternative_solutions', 'final_answers', 'categories', 'question_ids', 'plotting_data')
+_PLOT_TEXT_FIELDS = ('equation', 'matplotlib_code')
+
+
+class _StringPool:
+    """Appends strings to a UTF-8 buffer and remembers their offsets"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.offsets: List[int] = [0]
+
+    def add(self, text) -> int:
+        data = str(text).encode("utf-8")
+        self.chunks.append(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+        return len(self.offsets) - 2
+
+    def freeze(self):
+        dtype = np.uint32 if self.offsets[-1] < 2 ** 32 else np.uint64
+        return b"".join(self.chunks), np.array(self.offsets, dtype=dtype)
+
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """Approximate memory held by a structure of lists, dicts, str and arrays"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + (0 if obj.base is None else obj.nbytes)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+class ColumnarStore:
+    """Read-only, row-addressed answer data backed by one string blob and a few integer arrays"""
+
+    def __init__(self, blob: bytes, offsets: np.ndarray, solution_starts: np.ndarray,
+                 alternative_starts: np.ndarray, final_answers: np.ndarray, question_ids: np.ndarray,
+                 category_codes: np.ndarray, category_names: List[str], plot_rows: np.ndarray,
+                 plot_function_codes: np.ndarray, function_types: List[str], plot_text: np.ndarray,
+                 plot_extra: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+        self.solution_starts = solution_starts    # Row r's steps are strings [starts[r], starts[r + 1])
+        self.alternative_starts = alternative_starts
+        self.final_answers = final_answers    # String number per row
+        self.question_ids = question_ids
+        self.category_codes = category_codes
+        self.category_names = category_names
+        # Plotting side table, sorted by row: one entry per row with plotting data
+        self.plot_rows = plot_rows
+        self.plot_function_codes = plot_function_codes    # -1: no function_type
+        self.function_types = function_types
+        self.plot_text = plot_text    # (entries, len(_PLOT_TEXT_FIELDS)) string numbers, -1 if absent
+        self.plot_extra = plot_extra    # String number of the JSON remainder, -1 if empty
+
+    @classmethod
+    def build(cls, solutions: Sequence[Sequence[str]], alternative_solutions: Sequence[Sequence[str]],
+              final_answers: Sequence[str], categories: Sequence[str], question_ids: Sequence[str],
+              plotting_data: Sequence[Dict[str, Any]]) -> "ColumnarStore":
+        pool = _StringPool()
+
+        def step_column(rows):
+            starts = [len(pool.offsets) - 1]
+            for steps in rows:
+                if isinstance(steps, str):
+                    steps = [steps]
+                for step in steps or []:
+                    pool.add(step)
+                starts.append(len(pool.offsets) - 1)
+            return starts
+
+        # Steps of the main and alternative solutions are two contiguous runs of string numbers
+        solution_starts = step_column(solutions)
+        alternative_starts = step_column(alternative_solutions)
+        final_numbers = [pool.add(answer if answer is not None else "") for answer in final_answers]
+        id_numbers = [pool.add(question_id) for question_id in question_ids]
+
+        category_names = list(dict.fromkeys(categories))
+        category_index = {name: code for code, name in enumerate(category_names)}
+        function_types: List[str] = []
+        plot_rows, plot_codes, plot_text, plot_extra = [], [], [], []
+        for row, plot in enumerate(plotting_data):
+            if not plot:
+                continue
+            plot = dict(plot)
+            code = -1
+            if isinstance(plot.get('function_type'), str):
+                function_type = plot.pop('function_type')
+                if function_type not in function_types:
+                    function_types.append(function_type)
+                code = function_types.index(function_type)
+            # Any other function_type (even None) stays in the JSON remainder
+            text = []
+            for field in _PLOT_TEXT_FIELDS:
+                value = plot.get(field)
+                text.append(pool.add(plot.pop(field)) if isinstance(value, str) else -1)
+            plot_rows.append(row)
+            plot_codes.append(code)
+            plot_text.append(text)
+            plot_extra.append(pool.add(json.dumps(plot, ensure_ascii=False)) if plot else -1)
+
+        blob, offsets = pool.freeze()
+        code_dtype = np.uint8 if len(category_names) < 256 else np.uint16
+        return cls(
+            blob, offsets,
+            np.array(solution_starts, dtype=np.int32), np.array(alternative_starts, dtype=np.int32),
+            np.array(final_numbers, dtype=np.int32), np.array(id_numbers, dtype=np.int32),
+            np.array([category_index[name] for name in categories], dtype=code_dtype), category_names,
+            np.array(plot_rows, dtype=np.int32), np.array(plot_codes, dtype=np.int16), function_types,
+            np.array(plot_text, dtype=np.int32).reshape(-1, len(_PLOT_TEXT_FIELDS)),
+            np.array(plot_extra, dtype=np.int32),
+        )
+
+    @classmethod
+    def from_model_data(cls, model_data: Dict[str, Any]) -> "ColumnarStore":
+        """The artifact's store, or one built from the list columns of an older artifact"""
+        if model_data.get('columnar_store'):
+            return cls.from_dict(model_data['columnar_store'])
+        size = len(model_data['questions'])
+        return cls.build(model_data.get('solutions', [[]] * size),
+                         model_data.get('alternative_solutions', [[]] * size),
+                         model_data.get('final_answers', [""] * size),
+                         model_data.get('categories', ["unknown"] * size),
+                         model_data.get('question_ids', ["unknown"] * size),
+                         model_data.get('plotting_data', [{}] * size))
+
+    def __len__(self):
+        return len(self.final_answers)
+
+    # ---------- Read API ----------
+
+    def text(self, number: int) -> str:
+        return self.blob[self.offsets[number]:self.offsets[number + 1]].decode("utf-8")
+
+    def _steps(self, starts: np.ndarray, row: int) -> List[str]:
+        return [self.text(number) for number in range(starts[row], starts[row + 1])]
+
+    def solution(self, row: int) -> List[str]:
+        return self._steps(self.solution_starts, row)
+
+    def alternative_solution(self, row: int) -> List[str]:
+        return self._steps(self.alternative_starts, row)
+
+    def final_answer(self, row: int) -> str:
+        return self.text(self.final_answers[row])
+
+    def question_id(self, row: int) -> str:
+        return self.text(self.question_ids[row])
+
+    def category(self, row: int) -> str:
+        return self.category_names[self.category_codes[row]]
+
+    def plotting(self, row: int) -> Dict[str, Any]:
+        """The row's plotting data as the original dict, or {} if it has none"""
+        entry = int(np.searchsorted(self.plot_rows, row))
+        if entry >= len(self.plot_rows) or self.plot_rows[entry] != row:
+            return {}
+        plot = json.loads(self.text(self.plot_extra[entry])) if self.plot_extra[entry] >= 0 else {}
+        if self.plot_function_codes[entry] >= 0:
+            plot['function_type'] = self.function_types[self.plot_function_codes[entry]]
+        for field, number in zip(_PLOT_TEXT_FIELDS, self.plot_text[entry]):
+            if number >= 0:
+                plot[field] = self.text(number)
+        return plot
+
+    def rows_in_category(self, category: str) -> np.ndarray:
+        if category not in self.category_names:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.category_codes == self.category_names.index(category))
+
+    def column(self, name: str) -> List[Any]:
+        """A whole column as the original Python list (for training-time diffs and exports)"""
+        readers = {'solutions': self.solution, 'alternative_solutions': self.alternative_solution,
+                   'final_answers': self.final_answer, 'categories': self.category,
+                   'question_ids': self.question_id, 'plotting_data': self.plotting}
+        return [readers[name](row) for row in range(len(self))]
+
+    # ---------- Persistence and reporting ----------
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain structure for the joblib artifact"""
+        return {name: getattr(self, name) for name in (
+            'blob', 'offsets', 'solution_starts', 'alternative_starts', 'final_answers', 'question_ids',
+            'category_codes', 'category_names', 'plot_rows', 'plot_function_codes', 'function_types',
+            'plot_text', 'plot_extra')}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnarStore":
+        return cls(**data)
+
+    def nbytes(self) -> int:
+        return deep_sizeof(self.to_dict())
+
+    def memory_report(self, lists: Dict[str, Any]) -> Dict[str, Any]:
+        """Bytes held by the list columns versus this store"""
+        before = {name: deep_sizeof(lists[name]) for name in COLUMNS if name in lists}
+        total_before = sum(before.values())
+        after = self.nbytes()
+        return {
+            "rows": len(self),
+            "strings": len(self.offsets) - 1,
+            "blob_bytes": len(self.blob),
+            "lists_bytes": before,
+            "lists_total_bytes": total_before,
+            "columnar_bytes": after,
+            "saved_bytes": total_before - after,
+            "ratio": round(total_before / after, 2) if after else None,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar answer store memory report")
+    parser.add_argument("--report", action="store_true")
+    parser.add_argument("artifact", nargs="?", default=os.path.join(os.path.dirname(__file__), "true_ai_tutor.pkl"))
+    args = parser.parse_args()
+    if not args.report:
+        parser.print_help()
+        return
+
+    import joblib
+    model_data = joblib.load(args.artifact)
+    store = ColumnarStore.from_model_data(model_data)
+    lists = {name: model_data[name] if name in model_data else store.column(name) for name in COLUMNS}
+    report = store.memory_report(lists)
+    print(f"📦 {report['rows']} rows, {report['strings']} strings, {report['blob_bytes'] / 1024:.1f} KiB of UTF-8")
+    for name, size in report["lists_bytes"].items():
+        print(f"   {name:<22} {size / 1024:9.1f} KiB as Python lists")
+    print(f"   {'total (lists)':<22} {report['lists_total_bytes'] / 1024:9.1f} KiB")
+    print(f"   {'total (columnar)':<22} {report['columnar_bytes'] / 1024:9.1f} KiB  "
+          f"({report['ratio']}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+# dataset_loader.py
+"""
+Streaming loader and schema validator for trig_dataset.json.
+
+The trainer, the lesson generator, trig_graphs.py and check_dataset.py each
+used json.load on the whole file. This module reads the document
+incrementally instead: the top-level object (and one nested level, e.g.
+exam_preparation.past_paper_questions) is walked key by key, and lists are
+decoded one element at a time with JSONDecoder.raw_decode over a fixed-size
+read buffer. Memory use is bounded by the largest single entry rather than
+by the size of the file.
+
+The dataset can also be split into NDJSON shards, one file per section with
+one entry per line:
+    python dataset_loader.py shard --out trig_dataset_shards
+    TRIG_DATASET=trig_dataset_shards python model_trainer.py
+
+One-pass validation, reporting each problem with its path:
+    python dataset_loader.py validate [path]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DATASET_PATH = os.path.join(os.path.dirname(__file__), "trig_dataset.json")
+DATASET_SOURCE = os.getenv("TRIG_DATASET", DATASET_PATH)    # A .json file or a directory of NDJSON shards
+READ_CHUNK_SIZE = 64 * 1024
+SHARD_DOCUMENT = "_document.json"    # Sections that are not lists of entries
+_NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*\Z")    # Only number characters up to the end of the buffer
+
+QUESTION_SECTIONS = ("fundamentals", "identities", "equations", "exam_questions", "Graphs")
+QUESTION_LISTS = QUESTION_SECTIONS + ("exam_preparation.past_paper_questions",)
+DIFFICULTIES = {"basic", "moderate", "intermediate", "advanced", "easy", "medium", "hard"}
+
+Path = Tuple[Any, ...]
+
+
+class DatasetFormatError(ValueError):
+    pass
+
+
+def format_path(path: Path) -> str:
+    """('fundamentals', 3, 'final_answer') -> 'fundamentals[3].final_answer'"""
+    text = ""
+    for part in path:
+        text += f"[{part}]" if isinstance(part, int) else (f".{part}" if text else str(part))
+    return text
+
+
+# ---------- Incremental JSON reading ----------
+
+class _StreamReader:
+    """Decodes JSON values one at a time from a file, keeping only a small window in memory"""
+
+    def __init__(self, f, chunk_size: int = READ_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.consumed = 0    # Characters dropped from the front of the buffer, for error offsets
+
+    def _fill(self) -> bool:
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.consumed += self.pos
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of file), without consuming it"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise DatasetFormatError(f"Expected '{char}' at offset {self.consumed + self.pos}, found '{found}'")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof or not self._fill():
+                    raise DatasetFormatError(f"Invalid JSON at offset {self.consumed + e.pos}: {e.msg}") from e
+                continue
+            # A number cut by the end of the buffer ("12", "1.", "1e-") may continue in the next chunk
+            if (not self.eof and isinstance(value, (int, float))
+                    and _NUMBER_TAIL.match(self.buffer, end) and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+
+def _stream_object(reader: _StreamReader, prefix: Path, depth: int) -> Iterator[Tuple[Path, Any]]:
+    while True:
+        char = reader.peek()
+        if char == "}":
+            reader.pos += 1
+            return
+        if char == ",":
+            reader.pos += 1
+            continue
+        key = reader.value()
+        reader.expect(":")
+        char = reader.peek()
+        if char == "[":
+            reader.pos += 1
+            yield from _stream_array(reader, prefix + (key,))
+        elif char == "{" and depth < 1 and key != "metadata":
+            reader.pos += 1
+            yield from _stream_object(reader, prefix + (key,), depth + 1)
+        else:
+            yield prefix + (key,), reader.value()
+
+
+def _stream_array(reader: _StreamReader, prefix: Path) -> Iterator[Tuple[Path, Any]]:
+    index = 0
+    while True:
+        char = reader.peek()
+        if char == "]":
+            reader.pos += 1
+            return
+        if char == ",":
+            reader.pos += 1
+            continue
+        if char == "":
+            raise DatasetFormatError(f"Unexpected end of file inside {format_path(prefix)}")
+        yield prefix + (index,), reader.value()
+        index += 1
+
+
+def iter_entries(source: str = DATASET_SOURCE) -> Iterator[Tuple[Path, Any]]:
+    """(path, value) for every list element and every other value, in document order.
+
+    List elements have an int as the last path part: ('identities', 12) or
+    ('exam_preparation', 'past_paper_questions', 3).
+    """
+    if os.path.isdir(source):
+        yield from _iter_shards(source)
+        return
+    with open(source, "r", encoding="utf-8") as f:
+        reader = _StreamReader(f)
+        reader.expect("{")
+        yield from _stream_object(reader, (), 0)
+
+
+def iter_items(source: str = DATASET_SOURCE, sections=None, validate: bool = True) -> Iterator[Tuple[Path, Dict[str, Any]]]:
+    """Dataset entries (dicts inside lists), optionally only from some top-level sections.
+
+    With validate, entries with schema errors are reported and skipped.
+    """
+    for path, value in iter_entries(source):
+        if not isinstance(path[-1], int) or not isinstance(value, dict):
+            continue
+        if sections is not None and path[0] not in sections:
+            continue
+        if validate:
+            errors = [problem for problem in validate_entry(path, value) if problem[0] == "error"]
+            if errors:
+                for _, problem_path, message in errors:
+                    print(f"⚠️ Skipping {problem_path}: {message}")
+                continue
+        yield path, value
+
+
+def load_section(name: str, source: str = DATASET_SOURCE) -> Any:
+    """One top-level section: the list of its entries, or its value"""
+    entries = []
+    for path, value in iter_entries(source):
+        if path[0] != name:
+            continue
+        if len(path) == 1:
+            return value
+        if len(path) == 2 and isinstance(path[1], int):
+            entries.append(value)
+    return entries
+
+
+# ---------- NDJSON shards ----------
+
+def write_shards(out_dir: str, source: str = DATASET_PATH) -> Dict[str, int]:
+    """Split the dataset into <section>.ndjson files plus a small document for everything else"""
+    os.makedirs(out_dir, exist_ok=True)
+    handles, counts, document = {}, Counter(), {}
+    try:
+        for path, value in iter_entries(source):
+            if isinstance(path[-1], int):
+                name = ".".join(str(part) for part in path[:-1])
+                if name not in handles:
+                    handles[name] = open(os.path.join(out_dir, f"{name}.ndjson.tmp"), "w", encoding="utf-8")
+                handles[name].write(json.dumps(value, ensure_ascii=False) + "\n")
+                counts[name] += 1
+            else:
+                target = document
+                for part in path[:-1]:
+                    target = target.setdefault(part, {})
+                target[path[-1]] = value
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    for name in handles:
+        os.replace(os.path.join(out_dir, f"{name}.ndjson.tmp"), os.path.join(out_dir, f"{name}.ndjson"))
+    with open(os.path.join(out_dir, SHARD_DOCUMENT), "w", encoding="utf-8") as f:
+        json.dump({"sections": list(counts), "document": document}, f, ensure_ascii=False, indent=2)
+    return dict(counts)
+
+
+def _iter_shards(directory: str) -> Iterator[Tuple[Path, Any]]:
+    with open(os.path.join(directory, SHARD_DOCUMENT), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    def walk(value, prefix):
+        if isinstance(value, dict) and len(prefix) < 2 and prefix[:1] != ("metadata",):
+            for key, child in value.items():
+                yield from walk(child, prefix + (key,))
+        else:
+            yield prefix, value
+
+    for key, value in manifest["document"].items():
+        yield from walk(value, (key,)) if key != "metadata" else [((key,), value)]
+    for name in manifest["sections"]:
+        prefix = tuple(name.split("."))
+        with open(os.path.join(directory, f"{name}.ndjson"), "r", encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                if line.strip():
+                    yield prefix + (index,), json.loads(line)
+
+
+# ---------- Schema validation ----------
+
+def _string_list_problem(value) -> Optional[str]:
+    if not isinstance(value, list):
+        return f"expected a list of strings, got {type(value).__name__}"
+    bad = [i for i, step in enumerate(value) if not isinstance(step, str)]
+    return f"items {bad[:5]} are not strings" if bad else None
+
+
+def validate_entry(path: Path, entry: Any) -> List[Tuple[str, str, str]]:
+    """(severity, path, message) problems for one dataset entry; severity is 'error' or 'warning'"""
+    where = format_path(path)
+    problems = []
+    if not isinstance(entry, dict):
+        if path[0] == "lessons" or format_path(path[:-1]) in QUESTION_LISTS:
+            problems.append(("error", where, f"expected an object, got {type(entry).__name__}"))
+        return problems
+
+    if path[0] == "lessons":
+        for field in ("lesson_id", "title"):
+            if not isinstance(entry.get(field), str) or not entry.get(field):
+                problems.append(("error", f"{where}.{field}", "missing or not a string"))
+        for field in ("worked_examples", "practice_exercises"):
+            items = entry.get(field, [])
+            if not isinstance(items, list):
+                problems.append(("error", f"{where}.{field}", "expected a list"))
+                continue
+            for i, item in enumerate(items):
+                if not isinstance(item, dict) or not item.get("question"):
+                    problems.append(("warning", f"{where}.{field}[{i}]", "missing question"))
+        for field in ("learning_objectives", "theory_explanation", "key_formulas"):
+            if field in entry and not isinstance(entry[field], list):
+                problems.append(("warning", f"{where}.{field}",
+                                 f"expected a list of strings, got {type(entry[field]).__name__}"))
+        return problems
+    if format_path(path[:-1]) not in QUESTION_LISTS:
+        return problems    # Free-form sections such as exam_preparation.exam_tips
+
+    if not isinstance(entry.get("question"), str) or not entry.get("question", "").strip():
+        problems.append(("error", f"{where}.question", "missing or empty"))
+    if not entry.get("id"):
+        problems.append(("warning", f"{where}.id", "missing"))
+    if "step_by_step_solution" in entry:
+        problem = _string_list_problem(entry["step_by_step_solution"])
+        if problem:
+            problems.append(("error", f"{where}.step_by_step_solution", problem))
+    elif "solution" not in entry:
+        problems.append(("warning", f"{where}.step_by_step_solution", "no solution"))
+    if "final_answer" in entry and not isinstance(entry["final_answer"], str):
+        problems.append(("warning", f"{where}.final_answer", f"expected a string, got {type(entry['final_answer']).__name__}"))
+    if entry.get("difficulty") and str(entry["difficulty"]).lower() not in DIFFICULTIES:
+        problems.append(("warning", f"{where}.difficulty", f"unknown difficulty '{entry['difficulty']}'"))
+    if "plotting_instructions" in entry and not isinstance(entry["plotting_instructions"], dict):
+        problems.append(("error", f"{where}.plotting_instructions", "expected an object"))
+    if "matplotlib_code" in entry and not isinstance(entry["matplotlib_code"], str):
+        problems.append(("error", f"{where}.matplotlib_code", "expected a string"))
+    return problems
+
+
+def validate_dataset(source: str = DATASET_SOURCE) -> Dict[str, Any]:
+    """Check every entry in one streaming pass; duplicate ids are reported with both paths"""
+    problems, sections, seen_ids = [], Counter(), {}
+    entries = 0
+    try:
+        for path, value in iter_entries(source):
+            if not isinstance(path[-1], int):
+                continue
+            entries += 1
+            sections[format_path(path[:-1])] += 1
+            problems += validate_entry(path, value)
+            entry_id = value.get("id") or value.get("lesson_id") if isinstance(value, dict) else None
+            if entry_id:
+                if entry_id in seen_ids:
+                    problems.append(("error", format_path(path) + ".id",
+                                     f"duplicate id '{entry_id}' (first at {seen_ids[entry_id]})"))
+                else:
+                    seen_ids[entry_id] = format_path(path)
+    except DatasetFormatError as e:
+        problems.append(("error", "<document>", str(e)))
+
+    return {
+        "entries": entries,
+        "sections": dict(sections),
+        "errors": [{"path": p, "message": m} for severity, p, m in problems if severity == "error"],
+        "warnings": [{"path": p, "message": m} for severity, p, m in problems if severity == "warning"],
+    }
+
+
+def print_report(report: Dict[str, Any], limit: int = 50):
+    print(f"📊 {report['entries']} entries")
+    for section, count in report["sections"].items():
+        print(f"   {section}: {count}")
+    for label, icon in (("errors", "❌"), ("warnings", "⚠️")):
+        problems = report[label]
+        print(f"{icon} {len(problems)} {label}")
+        for problem in problems[:limit]:
+            print(f"   {problem['path']}: {problem['message']}")
+        if len(problems) > limit:
+            print(f"   ... {len(problems) - limit} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream, validate or shard trig_dataset.json")
+    sub = parser.add_subparsers(dest="command")
+    validate = sub.add_parser("validate", help="One-pass schema check")
+    validate.add_argument("source", nargs="?", default=DATASET_SOURCE)
+    validate.add_argument("--limit", type=int, default=50, help="Problems to print per severity")
+    shard = sub.add_parser("shard", help="Write NDJSON shards")
+    shard.add_argument("--source", default=DATASET_PATH)
+    shard.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "trig_dataset_shards"))
+    args = parser.parse_args()
+
+    if args.command == "validate":
+        report = validate_dataset(args.source)
+        print_report(report, args.limit)
+        sys.exit(1 if report["errors"] else 0)
+    elif args.command == "shard":
+        counts = write_shards(args.out, args.source)
+        print(f"✅ Wrote {sum(counts.values())} entries to {args.out}")
+        for name, count in counts.items():
+            print(f"   {name}.ndjson: {count}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# dedup.py
+"""
+Near-duplicate detection for dataset questions at train time.
+
+The same textbook question often appears in fundamentals, equations and
+exam_questions with only the wording around the maths changed ("Solve ..."
+vs "Solve the equation ..."), or with θ written as x. Each copy used to get
+its own embedding row, so the matrix was larger than the bank of distinct
+questions and the top results for a query were often the same question
+several times.
+
+Two questions are only compared if their maths skeleton is identical: the
+sequence of functions, numbers, operators, variables and grouping brackets
+left after the words are dropped. This is the blocking key, and also the
+numeric guard: "2 sin 2θ = 1" never merges with "sin 2θ = 1", nor
+"(1 + sinθ)/cosθ" with "(1 - sinθ)/cosθ" or "1 + sinθ/cosθ". Brackets around
+a single argument are dropped, so sin(30°) and sin 30° still match. Within a block, pairs are scored
+in tiles by MinHash estimated Jaccard over index_terms() and by embedding
+cosine similarity; either one above its threshold links the pair.
+
+Linked questions are merged with union-find. Each cluster keeps one
+canonical entry (the one with the most complete solution data); the others
+become aliases that keep their ids, text and category.
+
+    DEDUP_QUESTIONS=0 python model_trainer.py    # keep every row
+"""
+import os
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from lexical_index import index_terms, math_tokens
+
+DEDUP_QUESTIONS = os.getenv("DEDUP_QUESTIONS", "1") == "1"
+DEDUP_JACCARD = float(os.getenv("DEDUP_JACCARD", "0.8"))
+DEDUP_COSINE = float(os.getenv("DEDUP_COSINE", "0.95"))
+MINHASH_PERMUTATIONS = 64
+DEDUP_BLOCK_SIZE = 256
+
+_MINHASH_PRIME = 4294967291    # Largest prime below 2^32: a*x + b stays inside uint64
+_SKELETON_WORDS = {'sin', 'cos', 'tan', 'sec', 'cosec', 'cot', 'arcsin', 'arccos', 'arctan',
+                   'pi', 'deg', 'sqrt'}
+_OPEN, _CLOSE = {'(': ')', '[': ']'}, {')', ']'}
+_GROUPING = set('=+-*/^<>') | {'<=', '>='}
+
+
+def _drop_argument_brackets(tokens: List[str]) -> List[str]:
+    """Remove bracket pairs with no operator inside: sin(2x) -> sin 2x, but (1 + sin x)/cos x stays"""
+    keep = [True] * len(tokens)
+    stack = []    # (position of the opening bracket, contains an operator)
+    for position, token in enumerate(tokens):
+        if token in _OPEN:
+            stack.append([position, False])
+        elif token in _CLOSE:
+            if not stack:
+                keep[position] = False    # Unbalanced: brackets carry no structure here
+                continue
+            start, grouping = stack.pop()
+            if not grouping:
+                keep[start] = keep[position] = False
+            elif stack:
+                stack[-1][1] = True
+        elif token in _GROUPING and stack:
+            stack[-1][1] = True
+    for start, _ in stack:
+        keep[start] = False
+    return [token for token, kept in zip(tokens, keep) if kept]
+
+
+def math_skeleton(text: str) -> str:
+    """Functions, numbers, operators, variables and grouping brackets in order: the part of a question
+    that must match exactly"""
+    tokens = [token for token in math_tokens(text, keep_brackets=True)
+              if not token.isalpha() or len(token) == 1 or token in _SKELETON_WORDS]
+    return " ".join(_drop_argument_brackets(tokens))
+
+
+def minhash_signatures(texts: Sequence[str], permutations: int = MINHASH_PERMUTATIONS,
+                       seed: int = 0) -> np.ndarray:
+    """(len(texts), permutations) MinHash signatures of each text's index_terms() set"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MINHASH_PRIME, permutations, dtype=np.uint64)
+    b = rng.integers(0, _MINHASH_PRIME, permutations, dtype=np.uint64)
+    signatures = np.full((len(texts), permutations), _MINHASH_PRIME, dtype=np.uint64)
+    for row, text in enumerate(texts):
+        terms = set(index_terms(text))
+        if not terms:
+            continue
+        hashes = np.array([zlib.crc32(term.encode("utf-8")) for term in terms], dtype=np.uint64)
+        signatures[row] = ((a[:, None] * hashes[None, :] + b[:, None]) % _MINHASH_PRIME).min(axis=1)
+    return signatures
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, x: int, y: int):
+        root_x, root_y = self.find(x), self.find(y)
+        if root_x != root_y:
+            self.parent[max(root_x, root_y)] = min(root_x, root_y)
+
+
+def find_duplicate_pairs(questions: Sequence[str], embeddings=None, jaccard: float = DEDUP_JACCARD,
+                         cosine: float = DEDUP_COSINE, block_size: int = DEDUP_BLOCK_SIZE) -> List[tuple]:
+    """(i, j) with i < j for every linked pair; only questions with the same maths skeleton are compared"""
+    blocks = defaultdict(list)
+    for row, question in enumerate(questions):
+        skeleton = math_skeleton(question)
+        if skeleton:
+            blocks[skeleton].append(row)
+    blocks = [np.array(rows) for rows in blocks.values() if len(rows) > 1]
+    if not blocks:
+        return []
+
+    candidate_rows = np.unique(np.concatenate(blocks))
+    signatures = np.zeros((len(questions), MINHASH_PERMUTATIONS), dtype=np.uint64)
+    signatures[candidate_rows] = minhash_signatures([questions[row] for row in candidate_rows])
+    matrix = None
+    if embeddings is not None:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    pairs = []
+    for rows in blocks:
+        for start in range(0, len(rows), block_size):
+            left = rows[start:start + block_size]
+            for other in range(start, len(rows), block_size):
+                right = rows[other:other + block_size]
+                linked = (signatures[left][:, None, :] == signatures[right][None, :, :]).mean(axis=2) >= jaccard
+                if matrix is not None:
+                    linked |= matrix[left] @ matrix[right].T >= cosine
+                linked &= left[:, None] < right[None, :]
+                i, j = np.nonzero(linked)
+                pairs.extend(zip(left[i].tolist(), right[j].tolist()))
+    return pairs
+
+
+def _completeness(solution, alternative, final_answer, plotting) -> tuple:
+    return (bool(plotting), bool(final_answer), bool(alternative), len(solution or []))
+
+
+def dedup_questions(questions: Sequence[str], question_ids: Sequence[str], categories: Sequence[str],
+                    solutions: Sequence[Any], alternative_solutions: Sequence[Any], final_answers: Sequence[Any],
+                    plotting_data: Sequence[Any], embeddings=None) -> Dict[str, Any]:
+    """Which rows to keep, and the aliases folded into each kept row.
+
+    Returns keep (original rows, in order), aliases (new row -> [{id, question,
+    category}]), id_map (every question id -> new row) and clusters.
+    """
+    pairs = find_duplicate_pairs(questions, embeddings)
+    union_find = _UnionFind(len(questions))
+    for i, j in pairs:
+        union_find.union(i, j)
+
+    clusters = defaultdict(list)
+    for row in range(len(questions)):
+        clusters[union_find.find(row)].append(row)
+
+    canonical_of = {}
+    for members in clusters.values():
+        # Most complete entry wins; the earliest one breaks ties
+        canonical = max(members, key=lambda r: (_completeness(solutions[r], alternative_solutions[r],
+                                                               final_answers[r], plotting_data[r]), -r))
+        for row in members:
+            canonical_of[row] = canonical
+
+    keep = sorted(set(canonical_of.values()))
+    new_row = {row: position for position, row in enumerate(keep)}
+    aliases, id_map = {}, {}
+    for row in range(len(questions)):
+        target = new_row[canonical_of[row]]
+        if question_ids[row] not in (None, "", "unknown"):
+            id_map[question_ids[row]] = target
+        if canonical_of[row] != row:
+            aliases.setdefault(target, []).append({"id": question_ids[row], "question": questions[row],
+                                                   "category": categories[row]})
+    return {
+        "keep": keep,
+        "aliases": aliases,
+        "id_map": id_map,
+        "clusters": sum(1 for members in clusters.values() if len(members) > 1),
+        "pairs": len(pairs),
+    }
+
+
+def expand_aliases(questions: Sequence[str], question_ids: Sequence[str],
+                   aliases: Optional[Dict[int, List[Dict[str, Any]]]]) -> tuple:
+    """Question texts and ids including aliases, as they were before dedup"""
+    all_questions, all_ids = list(questions), list(question_ids)
+    for entries in (aliases or {}).values():
+        for alias in entries:
+            all_questions.append(alias["question"])
+            all_ids.append(alias["id"])
+    return all_questions, all_ids
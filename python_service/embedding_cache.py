@@ -0,0 +1,161 @@
+# embedding_cache.py
+"""
+Content-hash embedding cache for incremental training.
+
+model_trainer.py used to load all-MiniLM-L6-v2 twice (once for questions,
+once for lessons) and re-encode the whole dataset on every retrain. The cache
+keys each embedding by a hash of the model name and the exact text, and is
+kept in embedding_cache.pkl between runs, so a retrain only encodes text that
+is new or was edited. Entries that were not used in a run (deleted or edited
+items) are dropped when the cache is saved.
+
+LazyEncoder wraps the sentence-transformer so it is only constructed if
+something actually needs encoding. It can also reuse the model object
+unpickled from the previous artifact.
+"""
+import hashlib
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+
+EMBEDDING_CACHE_PATH = os.path.join(os.path.dirname(__file__), "embedding_cache.pkl")
+SEMANTIC_MODEL_NAME = os.getenv("SEMANTIC_MODEL_NAME", "all-MiniLM-L6-v2")
+
+
+def content_hash(text: str, model_name: str = SEMANTIC_MODEL_NAME) -> str:
+    return hashlib.sha256(f"{model_name}\n{text}".encode("utf-8")).hexdigest()
+
+
+class LazyEncoder:
+    """Sentence-transformer that is only loaded on first use, shared by every trainer in a run"""
+
+    def __init__(self, model_name: str = SEMANTIC_MODEL_NAME, model=None):
+        self.model_name = model_name
+        self._model = model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            print(f"   📥 Loading semantic model {self.model_name}...")
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def encode(self, texts: List[str], **kwargs):
+        return self.model.encode(texts, **kwargs)
+
+
+class EmbeddingCache:
+    """Embeddings keyed by content hash, persisted between training runs"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, model_name: str = SEMANTIC_MODEL_NAME):
+        self.path = path
+        self.model_name = model_name
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._used = set()
+        self.stats = {"hits": 0, "misses": 0, "encode_seconds": 0.0}
+        self.load()
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            data = joblib.load(self.path)
+        except Exception as e:
+            print(f"⚠️ Could not read embedding cache, starting empty: {e}")
+            return
+        if data.get("model_name") != self.model_name:
+            print(f"⚠️ Embedding cache was built with {data.get('model_name')}, starting empty")
+            return
+        self._vectors = dict(zip(data["keys"], data["vectors"]))
+        print(f"   🗃️ Embedding cache: {len(self._vectors)} entries")
+
+    def seed(self, texts: List[str], vectors) -> int:
+        """Adopt embeddings from a previous artifact for texts the cache does not know yet"""
+        added = 0
+        if vectors is None or len(vectors) != len(texts):
+            return added
+        for text, vector in zip(texts, vectors):
+            key = content_hash(text, self.model_name)
+            if key not in self._vectors:
+                self._vectors[key] = np.asarray(vector, dtype=np.float32)
+                added += 1
+        return added
+
+    def encode(self, texts: List[str], encoder) -> np.ndarray:
+        """Embeddings for texts in order; only texts missing from the cache reach encoder.encode()"""
+        keys = [content_hash(text, self.model_name) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._vectors and key not in missing:
+                missing[key] = text
+        self._used.update(keys)
+        self.stats["hits"] += len(keys) - len(missing)
+        self.stats["misses"] += len(missing)
+
+        if missing:
+            start = time.time()
+            vectors = encoder.encode(list(missing.values()))
+            self.stats["encode_seconds"] += time.time() - start
+            for key, vector in zip(missing, vectors):
+                self._vectors[key] = np.asarray(vector, dtype=np.float32)
+        print(f"   🗃️ {len(keys)} embeddings: {len(keys) - len(missing)} cached, {len(missing)} encoded")
+
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([self._vectors[key] for key in keys])
+
+    def save(self, prune: bool = True):
+        """Write the cache atomically; with prune, entries unused in this run are dropped"""
+        keys = [key for key in self._vectors if not prune or key in self._used]
+        removed = len(self._vectors) - len(keys)
+        data = {
+            "model_name": self.model_name,
+            "keys": keys,
+            "vectors": np.stack([self._vectors[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+        }
+        tmp_path = f"{self.path}.tmp"
+        joblib.dump(data, tmp_path)
+        os.replace(tmp_path, self.path)
+        self._vectors = {key: self._vectors[key] for key in keys}
+        print(f"💾 Embedding cache saved: {len(keys)} entries ({removed} stale removed)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._vectors), "encode_seconds": round(self.stats["encode_seconds"], 2)}
+
+
+def diff_questions(old_questions: List[str], old_ids: List[str],
+                   new_questions: List[str], new_ids: List[str]) -> Dict[str, List[str]]:
+    """Which questions were added, edited or removed since the previous artifact (matched by id, then text)"""
+    old_by_id = {qid: text for qid, text in zip(old_ids, old_questions) if qid and qid != "unknown"}
+    new_by_id = {qid: text for qid, text in zip(new_ids, new_questions) if qid and qid != "unknown"}
+    old_texts, new_texts = set(old_questions), set(new_questions)
+
+    added = [qid for qid in new_by_id if qid not in old_by_id]
+    changed = [qid for qid in new_by_id if qid in old_by_id and old_by_id[qid] != new_by_id[qid]]
+    removed = [qid for qid in old_by_id if qid not in new_by_id]
+    # Questions without ids can only be compared by text
+    added += [text for qid, text in zip(new_ids, new_questions) if qid in (None, "", "unknown") and text not in old_texts]
+    removed += [text for qid, text in zip(old_ids, old_questions) if qid in (None, "", "unknown") and text not in new_texts]
+    return {"added": added, "changed": changed, "removed": removed}
+
+
+def load_previous_artifact(path: str) -> Optional[Dict[str, Any]]:
+    """The artifact from the last training run, or None on a first run"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return joblib.load(path)
+    except Exception as e:
+        print(f"⚠️ Could not load previous artifact {path}: {e}")
+        return None
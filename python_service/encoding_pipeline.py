@@ -0,0 +1,141 @@
+# encoding_pipeline.py
+"""
+Encode stage for model_trainer.py.
+
+Texts are sorted by length and cut into batches of similar length, so short
+questions are not padded out to the longest lesson paragraph in their batch.
+Results are put back in the original order. For large rebuilds the batches
+can be spread over a multi-process pool (one worker per CPU core by default)
+with sentence-transformers' multi-process encoding. Every run reports its
+throughput in sentences per second.
+
+    ENCODE_BATCH_SIZE=64 ENCODE_PROCESSES=4 python model_trainer.py
+    python encoding_pipeline.py --benchmark --count 5000 --batch-sizes 16 32 64 128 --processes 0 4
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from dataset_loader import iter_items
+from embedding_cache import LazyEncoder
+
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "64"))
+ENCODE_PROCESSES = int(os.getenv("ENCODE_PROCESSES", "0"))    # 0 or 1: encode in this process; -1: all cores
+ENCODE_POOL_MIN_TEXTS = int(os.getenv("ENCODE_POOL_MIN_TEXTS", "5000"))    # A pool costs seconds to start
+
+
+class EncodingPipeline:
+    """Length-bucketed, optionally multi-process encoding around one shared encoder"""
+
+    def __init__(self, encoder: Optional[LazyEncoder] = None, batch_size: int = ENCODE_BATCH_SIZE,
+                 processes: int = ENCODE_PROCESSES, pool_min_texts: int = ENCODE_POOL_MIN_TEXTS):
+        self.encoder = encoder or LazyEncoder()
+        self.batch_size = max(1, batch_size)
+        self.processes = (os.cpu_count() or 1) if processes < 0 else processes
+        self.pool_min_texts = pool_min_texts
+        self.stats = {"runs": 0, "sentences": 0, "seconds": 0.0}
+
+    @property
+    def model(self):
+        return self.encoder.model
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embeddings in the order of texts"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        start = time.perf_counter()
+        order = np.argsort([len(text) for text in texts], kind='stable')
+        ordered = [texts[i] for i in order]
+
+        if self.processes > 1 and len(texts) >= self.pool_min_texts:
+            mode = f"{self.processes} processes"
+            embeddings = self._encode_pool(ordered)
+        else:
+            mode = "1 process"
+            embeddings = np.concatenate([
+                np.asarray(self.model.encode(ordered[i:i + self.batch_size], batch_size=self.batch_size,
+                                             show_progress_bar=False, convert_to_numpy=True), dtype=np.float32)
+                for i in range(0, len(ordered), self.batch_size)
+            ])
+
+        result = np.empty_like(embeddings)
+        result[order] = embeddings    # Undo the length sort
+        elapsed = time.perf_counter() - start
+
+        self.stats["runs"] += 1
+        self.stats["sentences"] += len(texts)
+        self.stats["seconds"] += elapsed
+        print(f"   ⚡ Encoded {len(texts)} texts in {elapsed:.2f}s "
+              f"({len(texts) / max(elapsed, 1e-9):.0f} sentences/s, batch {self.batch_size}, {mode})")
+        return result
+
+    def _encode_pool(self, ordered: List[str]) -> np.ndarray:
+        model = self.model
+        pool = model.start_multi_process_pool(target_devices=["cpu"] * self.processes)
+        try:
+            # Chunks of whole batches keep each worker's batches length-homogeneous
+            chunk_size = max(self.batch_size, len(ordered) // (self.processes * 4) // self.batch_size * self.batch_size)
+            return np.asarray(model.encode_multi_process(ordered, pool, batch_size=self.batch_size,
+                                                         chunk_size=chunk_size), dtype=np.float32)
+        finally:
+            model.stop_multi_process_pool(pool)
+
+    def get_stats(self) -> Dict[str, Any]:
+        seconds = self.stats["seconds"]
+        return {**self.stats, "seconds": round(seconds, 2),
+                "sentences_per_second": round(self.stats["sentences"] / seconds, 1) if seconds else 0.0}
+
+
+def _benchmark_texts(count: int) -> List[str]:
+    """Dataset questions and lesson text, repeated with small edits up to count"""
+    base, lessons = [], []
+    for path, item in iter_items(validate=False):
+        if path[0] == "lessons":
+            if item.get("theory_explanation"):
+                lessons.append(str(item["theory_explanation"]))
+        elif "question" in item:
+            base.append(item["question"])
+    base += lessons
+    return [f"{base[i % len(base)]} ({i // len(base)})" if i >= len(base) else base[i] for i in range(count)]
+
+
+def benchmark(count: int, batch_sizes: List[int], processes: List[int]):
+    texts = _benchmark_texts(count)
+    encoder = LazyEncoder()
+    encoder.model    # Load outside the timings
+    print(f"🚀 Encoding benchmark: {len(texts)} texts, mean length {np.mean([len(t) for t in texts]):.0f} chars")
+
+    start = time.perf_counter()
+    encoder.encode(texts)
+    baseline = len(texts) / (time.perf_counter() - start)
+    print(f"   default encode(): {baseline:.0f} sentences/s")
+
+    for process_count in processes:
+        for batch_size in batch_sizes:
+            pipeline = EncodingPipeline(encoder, batch_size, process_count, pool_min_texts=0)
+            pipeline.encode(texts)
+            rate = pipeline.get_stats()["sentences_per_second"]
+            print(f"   processes={process_count:<2} batch={batch_size:<4} {rate:8.0f} sentences/s  "
+                  f"({rate / baseline:.2f}x default)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Training encode stage benchmark")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--processes", type=int, nargs="+", default=[0, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.count, args.batch_sizes, args.processes)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# gunicorn.conf.py
+"""
+Pre-fork production server settings.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+    GUNICORN_THREADS=8 gunicorn -c gunicorn.conf.py wsgi:application
+
+One worker by default; scale with threads. Two pieces of state still live in
+process memory: app.conversations (the /solve follow-up contexts) and
+MultiTopicManager.students, which each process writes back to
+students_progress.json as a whole. With several workers, a follow-up can
+land on a worker that never saw the conversation, and the workers overwrite
+each other's progress updates. Raise WEB_CONCURRENCY above 1 only once that
+state has moved out of the process (SQLite, Redis, or a locked file store).
+
+The master imports wsgi.py (preload_app), so the model is loaded once. Just
+before each fork, gc.freeze() moves every object alive at that point into the
+permanent generation. The workers' garbage collector then never touches
+those objects' headers, so their pages stay shared copy-on-write.
+
+Each worker runs GUNICORN_THREADS request threads; TrigSolver.solve is
+stateless and safe to share between them. Model hot reload happens per
+worker. With several workers (see above), set MODEL_WATCH_INTERVAL so every worker
+follows model_versions/CURRENT, because POST /admin/reload-model only
+reaches the one worker that handles it. A reloaded model is private to each
+worker; restart gunicorn (kill -HUP) to share the new version's pages again.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '7000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))    # See the docstring before raising this
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))    # AI lesson generation can take a while
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+
+def pre_fork(server, worker):
+    # Startup objects (the model, indexes, lesson data) become permanent: no collection copies their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Threads do not survive fork, so each worker starts its own CURRENT watcher
+    from app import model_registry
+    model_registry.start_watcher()
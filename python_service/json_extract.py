@@ -0,0 +1,174 @@
+# json_extract.py
+"""
+Incremental, tolerant JSON extraction for LLM completions.
+
+LLM replies are often wrapped in ```json fences, followed by commentary, or
+cut off by max_tokens half-way through an array. Instead of slicing between
+the first "{" and the last "}" and hoping, the extractor scans the text once
+(optionally chunk by chunk as it streams in), remembers the last position
+where the document could be cleanly closed, and repairs truncated output by
+closing the open containers there. Every complete element of steps,
+worked_examples, practice_questions etc. survives; a half-written element
+inside an array is dropped rather than returned incomplete. The same scan
+notes trailing commas before a closing bracket, so they can be removed
+without touching ",}" or ",]" inside string values.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+_OPENERS = {'{': '}', '[': ']'}
+_CLOSERS = {'}', ']'}
+_WHITESPACE = ' \t\r\n'
+
+
+class IncrementalJSONExtractor:
+    """Feed text as it arrives and ask for the best parse of what has been seen so far"""
+
+    def __init__(self, expect: Optional[str] = None):
+        # expect='{' or '[' skips any other kind of bracket that appears before the document
+        self.expect = expect
+        self.buffer = ""
+        self.root_start = None
+        self.root_end = None
+        self._pos = 0
+        self._stack: List[str] = []
+        self._object_phase: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._cut: Optional[Tuple[int, Tuple[str, ...]]] = None
+        self._last_comma: Optional[int] = None    # Position of a ',' with only whitespace after it so far
+        self._trailing_commas: List[int] = []
+
+    @property
+    def complete(self) -> bool:
+        """True once the root value has been closed"""
+        return self.root_end is not None
+
+    def feed(self, chunk: str) -> "IncrementalJSONExtractor":
+        self.buffer += chunk
+        self._scan()
+        return self
+
+    def _record_cut(self, position: int):
+        # Never cut inside an object that is an array element: such elements must be complete
+        stack = self._stack
+        for i in range(1, len(stack)):
+            if stack[i] == '{' and stack[i - 1] == '[':
+                return
+        self._cut = (position, tuple(stack))
+
+    def _scan(self):
+        buffer = self.buffer
+        i = self._pos
+        length = len(buffer)
+
+        if self.root_start is None:
+            starts = [self.expect] if self.expect else list(_OPENERS)
+            found = [buffer.find(opener, i) for opener in starts]
+            found = [index for index in found if index != -1]
+            if not found:
+                self._pos = length
+                return
+            i = min(found)
+            self.root_start = i
+
+        while i < length and self.root_end is None:
+            char = buffer[i]
+
+            if char not in _WHITESPACE and not (self._in_string or char == ',' or char in _CLOSERS):
+                self._last_comma = None
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._stack and (self._stack[-1] == '[' or self._object_phase[-1] == 'value'):
+                        self._record_cut(i + 1)
+            elif char == '"':
+                self._in_string = True
+            elif char in _OPENERS:
+                self._stack.append(char)
+                self._object_phase.append('key' if char == '{' else 'value')
+                self._record_cut(i + 1)
+            elif char in _CLOSERS:
+                if self._last_comma is not None:
+                    self._trailing_commas.append(self._last_comma)
+                    self._last_comma = None
+                if self._stack:
+                    self._stack.pop()
+                    self._object_phase.pop()
+                if not self._stack:
+                    self.root_end = i + 1
+                else:
+                    self._record_cut(i + 1)
+            elif char == ',' and self._stack:
+                self._last_comma = i
+                self._record_cut(i)
+                if self._stack[-1] == '{':
+                    self._object_phase[-1] = 'key'
+            elif char == ':' and self._stack and self._stack[-1] == '{':
+                self._object_phase[-1] = 'value'
+            i += 1
+
+        self._pos = i
+
+    def _candidate_texts(self, repair: bool = False):
+        if self.root_start is None:
+            return
+        if self.complete:
+            yield self._slice(self.root_end, repair)
+            return
+        if self._cut is not None:
+            position, stack = self._cut
+            closers = ''.join(_OPENERS[opener] for opener in reversed(stack))
+            yield self._slice(position, repair).rstrip().rstrip(',') + closers
+
+    def _slice(self, end: int, repair: bool) -> str:
+        """The document up to end, without the trailing commas the scan found when repairing"""
+        if not repair:
+            return self.buffer[self.root_start:end]
+        parts, start = [], self.root_start
+        for comma in self._trailing_commas:
+            if comma >= end:
+                break
+            parts.append(self.buffer[start:comma])
+            start = comma + 1
+        parts.append(self.buffer[start:end])
+        return ''.join(parts)
+
+    def snapshot(self) -> Any:
+        """Best-effort parse of everything fed so far, or None if nothing usable yet"""
+        attempts = [False, True] if self._trailing_commas else [False]
+        for repair in attempts:
+            for text in self._candidate_texts(repair):
+                try:
+                    return json.loads(text)
+                except json.JSONDecodeError:
+                    continue
+        return None
+
+    def trailing_text(self) -> str:
+        """Whatever followed the root value (commentary, log lines...)"""
+        return self.buffer[self.root_end:] if self.complete else ""
+
+
+def extract_json(text: str, expect: Optional[str] = None) -> Tuple[Any, bool]:
+    """Extract the JSON document from an LLM reply.
+
+    Returns (value, complete); value is None when nothing could be recovered and
+    complete is False when the value was repaired from truncated output.
+    """
+    offset = 0
+    while offset < len(text):
+        extractor = IncrementalJSONExtractor(expect).feed(text[offset:])
+        if extractor.root_start is None:
+            break
+        value = extractor.snapshot()
+        if value is not None:
+            return value, extractor.complete
+        # A stray bracket in leading commentary; try from the next one
+        offset += extractor.root_start + 1
+    return None, False
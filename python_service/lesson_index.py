@@ -0,0 +1,217 @@
+# lesson_index.py
+"""
+Runtime index over the dataset lessons in lesson_generator.pkl.
+
+model_trainer.LessonGenerator embeds lesson topics, concept explanations,
+worked examples and practice exercises. This index maps a (topic_id,
+section_index) to the best-matching dataset lesson by embedding the section's
+syllabus focus, and assembles the same content dict the LLM returns, so a
+lesson section can be rendered in milliseconds without a network call.
+
+The dataset has only a few lessons, so each one serves at most one section
+of a topic. All of a topic's focus areas are matched at once: the best
+(lesson, section) pairs are taken first, each lesson and section used once.
+Within the lesson, only items close to the section's own focus are shown.
+Sections left without a lesson fall through to the lesson store or the LLM.
+"""
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from namibia_syllabus_context import TOPIC_FOCUS_AREAS, get_topic_specific_prompt
+
+LESSON_MODEL_PATH = os.path.join(os.path.dirname(__file__), "lesson_generator.pkl")
+LESSON_INDEX_MIN_SIMILARITY = float(os.getenv("LESSON_INDEX_MIN_SIMILARITY", "0.55"))
+# Items of the chosen lesson must also be about the section, not just the lesson as a whole
+LESSON_ITEM_MIN_SIMILARITY = float(os.getenv("LESSON_ITEM_MIN_SIMILARITY", "0.4"))
+
+_TOPIC_NAMES = {
+    "circular_measure": "Circular measure, radians, arc length and sector area",
+    "trigonometric_graphs": "Trigonometric graphs and exact values",
+    "trigonometric_identities": "Trigonometric identities and proofs",
+    "trigonometric_equations": "Solving trigonometric equations",
+    "advanced_trigonometry": "Compound angle, double angle and R-form trigonometry",
+}
+
+_CONTENT_TYPES = ('theory', 'formula', 'identity')
+MAX_CONTENT_POINTS = 6
+MAX_EXAMPLES = 3
+MAX_PRACTICE = 3
+
+
+class DatasetLessonIndex:
+    """Maps lesson sections to dataset lesson content via the trained lesson embeddings"""
+
+    def __init__(self, path: str = LESSON_MODEL_PATH, encoder=None,
+                 min_similarity: float = LESSON_INDEX_MIN_SIMILARITY,
+                 min_item_similarity: float = LESSON_ITEM_MIN_SIMILARITY):
+        self.path = path
+        self.encoder = encoder
+        self.min_similarity = min_similarity
+        self.min_item_similarity = min_item_similarity
+        self.model_data = None
+        self._items: List[Dict[str, Any]] = []
+        self._matrix = None
+        self._lesson_rows: Dict[str, np.ndarray] = {}
+        self._sections: Dict[tuple, Optional[Dict[str, Any]]] = {}
+        self._assignments: Dict[str, Dict[int, tuple]] = {}    # topic -> section -> (lesson, score, item similarities)
+        self._lock = threading.Lock()
+        self.load()
+
+    @property
+    def enabled(self) -> bool:
+        return self._matrix is not None and self.encoder is not None
+
+    def load(self):
+        """Load lesson_generator.pkl and line its embedding rows up with their items"""
+        try:
+            if not os.path.exists(self.path):
+                print(f"⚠️ No lesson model at {self.path}, dataset lessons disabled")
+                return
+            self.model_data = joblib.load(self.path)
+        except Exception as e:
+            print(f"⚠️ Could not load lesson model: {e}")
+            return
+
+        data = self.model_data
+        if self.encoder is None:
+            self.encoder = data.get('semantic_model')
+
+        # Rows follow LessonGenerator.create_lesson_embeddings: topics, concepts, examples, exercises
+        items = [{'kind': 'topic', 'lesson_id': meta['lesson_id'], 'index': i}
+                 for i, meta in enumerate(data.get('lesson_metadata', []))]
+        items += [{'kind': 'concept', 'lesson_id': c['lesson_id'], 'index': i}
+                  for i, c in enumerate(data.get('concept_explanations', []))]
+        items += [{'kind': 'example', 'lesson_id': e['lesson_id'], 'index': i}
+                  for i, e in enumerate(data.get('worked_examples', []))]
+        items += [{'kind': 'exercise', 'lesson_id': e['lesson_id'], 'index': i}
+                  for i, e in enumerate(data.get('practice_exercises', []))]
+
+        embeddings = data.get('lesson_embeddings')
+        if embeddings is None or len(embeddings) != len(items):
+            print("⚠️ Lesson embeddings do not match lesson items, retrain with model_trainer.py")
+            return
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        self._items = items
+        self._matrix = matrix
+        lesson_ids = np.array([item['lesson_id'] for item in items])
+        self._lesson_rows = {lesson_id: np.flatnonzero(lesson_ids == lesson_id)
+                             for lesson_id in dict.fromkeys(lesson_ids)}
+        print(f"📚 Dataset lesson index: {len(self._lesson_rows)} lessons, {len(items)} items")
+
+    def set_encoder(self, encoder):
+        """Use a reloaded model's encoder; sections matched with the old one are matched again"""
+        with self._lock:
+            if encoder is self.encoder:
+                return
+            self.encoder = encoder
+            self._sections.clear()
+            self._assignments.clear()
+
+    def section_query(self, topic_id: str, section_index: int) -> str:
+        focus = get_topic_specific_prompt(topic_id, section_index).replace("Focus Area: ", "")
+        return f"{_TOPIC_NAMES.get(topic_id, topic_id.replace('_', ' '))}: {focus}"
+
+    def warm(self, sections):
+        """Resolve (topic_id, section_index) pairs ahead of the first request"""
+        for topic_id, section_index in sections:
+            self.get_section(topic_id, section_index)
+
+    def get_section(self, topic_id: str, section_index: int) -> Optional[Dict[str, Any]]:
+        """Lesson content for the section assembled from the dataset, or None if nothing matches well"""
+        if not self.enabled:
+            return None
+        key = (topic_id, int(section_index))
+        with self._lock:
+            if key in self._sections:
+                return self._sections[key]
+
+        try:
+            content = self._assemble(topic_id, section_index)
+        except Exception as e:
+            print(f"⚠️ Could not match dataset lesson for {topic_id}, section {section_index}: {e}")
+            return None    # Not memoised, the next request retries
+        with self._lock:
+            self._sections[key] = content
+        return content
+
+    def _assign_topic(self, topic_id: str) -> Dict[int, tuple]:
+        """Give each of the topic's sections its own lesson, best-matching pairs first"""
+        with self._lock:
+            if topic_id in self._assignments:
+                return self._assignments[topic_id]
+
+        section_count = len(TOPIC_FOCUS_AREAS.get(topic_id, [None]))
+        queries = np.asarray(self.encoder.encode([self.section_query(topic_id, section)
+                                                  for section in range(section_count)]), dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        similarities = self._matrix @ queries.T    # (items, sections)
+
+        # A lesson scores by the mean of its three best-matching items for that section
+        lesson_ids = list(self._lesson_rows)
+        scores = np.array([np.sort(similarities[rows], axis=0)[-3:].mean(axis=0)
+                           for rows in self._lesson_rows.values()]).reshape(len(lesson_ids), section_count)
+
+        assignment, used_lessons = {}, set()
+        for flat in np.argsort(-scores, axis=None):
+            lesson, section = divmod(int(flat), section_count)
+            if scores[lesson, section] < self.min_similarity:
+                break
+            if lesson in used_lessons or section in assignment:
+                continue
+            used_lessons.add(lesson)
+            assignment[section] = (str(lesson_ids[lesson]), float(scores[lesson, section]), similarities[:, section])
+
+        with self._lock:
+            self._assignments[topic_id] = assignment
+        return assignment
+
+    def _assemble(self, topic_id: str, section_index: int) -> Optional[Dict[str, Any]]:
+        # Sections past the topic's focus areas repeat an earlier focus; they get no second copy of its lesson
+        assigned = self._assign_topic(topic_id).get(section_index)
+        if assigned is None:
+            return None
+        best_lesson, best_score, similarities = assigned
+
+        rows = self._lesson_rows[best_lesson]
+        rows = rows[similarities[rows] >= self.min_item_similarity]
+        ranked = rows[np.argsort(-similarities[rows])]
+        ranked_items = [self._items[row] for row in ranked]
+        data = self.model_data
+        meta = next(m for m in data['lesson_metadata'] if m['lesson_id'] == best_lesson)
+
+        content_points = [data['concept_explanations'][item['index']]['content'] for item in ranked_items
+                          if item['kind'] == 'concept'
+                          and data['concept_explanations'][item['index']]['type'] in _CONTENT_TYPES]
+        examples = [data['worked_examples'][item['index']] for item in ranked_items if item['kind'] == 'example']
+        exercises = [data['practice_exercises'][item['index']] for item in ranked_items if item['kind'] == 'exercise']
+        if not content_points or not (examples or exercises):
+            return None    # The lesson is only loosely about this section
+
+        return {
+            'title': meta['title'],
+            'content': content_points[:MAX_CONTENT_POINTS],
+            'worked_examples': [{
+                'problem': example['question'],
+                'solution': "\n".join(example['solution']) if isinstance(example['solution'], list) else example['solution'],
+                'explanation': example.get('explanation', '')
+            } for example in examples[:MAX_EXAMPLES]],
+            'applications': [],
+            'misconceptions': [],
+            'practice_questions': [{
+                'question': exercise['question'],
+                'hint': exercise['solution'][0] if exercise.get('solution') else '',
+                'answer': exercise.get('final_answer', '')
+            } for exercise in exercises[:MAX_PRACTICE]],
+            'syllabus_alignment': {
+                'covered_objectives': meta.get('learning_objectives', []),
+                'assessment_preparation': meta.get('syllabus_ref', '')
+            },
+            'dataset_lesson_id': best_lesson,
+            'match_score': round(best_score, 3)
+        }
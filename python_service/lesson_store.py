@@ -0,0 +1,136 @@
+# lesson_store.py
+"""
+Versioned store of pre-generated lesson sections.
+
+Written by pregenerate_lessons.py and read by AILessonGenerator before it
+calls the LLM. Each entry remembers the hash of the prompt that produced it,
+so a changed prompt (syllabus text, model, temperature...) makes the entry
+stale instead of silently serving old content.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+LESSON_STORE_PATH = os.getenv(
+    "LESSON_STORE_PATH", os.path.join(os.path.dirname(__file__), "lesson_store.json")
+)
+STORE_SCHEMA_VERSION = 1
+
+
+def lesson_key(topic_id: str, section_index: int, student_level: str) -> str:
+    return f"{topic_id}:{int(section_index)}:{student_level}"
+
+
+class LessonContentStore:
+    """JSON-file backed map of (topic, section, level) -> generated lesson content"""
+
+    def __init__(self, path: str = LESSON_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        empty = {"schema_version": STORE_SCHEMA_VERSION, "version": 0, "updated_at": None, "entries": {}}
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("schema_version") == STORE_SCHEMA_VERSION:
+                    return data
+                print(f"⚠️ Lesson store {self.path} has schema {data.get('schema_version')}, ignoring it")
+        except Exception as e:
+            print(f"⚠️ Could not load lesson store: {e}")
+        return empty
+
+    @property
+    def version(self) -> int:
+        return self.data["version"]
+
+    def __len__(self):
+        return len(self.data["entries"])
+
+    def begin_run(self) -> int:
+        """Start a new generation run; entries written from now on carry the new version"""
+        with self._lock:
+            self.data["version"] += 1
+            return self.data["version"]
+
+    def get_entry(self, topic_id: str, section_index: int, student_level: str) -> Optional[Dict[str, Any]]:
+        return self.data["entries"].get(lesson_key(topic_id, section_index, student_level))
+
+    def get(self, topic_id: str, section_index: int, student_level: str,
+            prompt_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Stored lesson content, or None if missing or generated from a different prompt"""
+        entry = self.get_entry(topic_id, section_index, student_level)
+        if not entry:
+            return None
+        if prompt_hash is not None and entry.get("prompt_hash") != prompt_hash:
+            return None
+        return entry["content"]
+
+    def get_any(self, topic_id: str, section_index: int, preferred_level: str) -> Optional[Dict[str, Any]]:
+        """Any stored content for the section, stale or for another level; used in degraded mode"""
+        content = self.get(topic_id, section_index, preferred_level)
+        if content:
+            return content
+        for entry in self.data["entries"].values():
+            if entry.get("topic_id") == topic_id and entry.get("section_index") == int(section_index):
+                return entry["content"]
+        return None
+
+    def put(self, topic_id: str, section_index: int, student_level: str,
+            prompt_hash: str, content: Dict[str, Any], model: str):
+        with self._lock:
+            self.data["entries"][lesson_key(topic_id, section_index, student_level)] = {
+                "topic_id": topic_id,
+                "section_index": int(section_index),
+                "student_level": student_level,
+                "prompt_hash": prompt_hash,
+                "model": model,
+                "store_version": self.data["version"],
+                "generated_at": datetime.now().isoformat(),
+                "content": content
+            }
+
+    def save(self):
+        """Write atomically so a crashed run never leaves a half-written store"""
+        with self._lock:
+            self.data["updated_at"] = datetime.now().isoformat()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+def validate_lesson_content(content: Any) -> list:
+    """Problems that make generated lesson content unfit to serve; empty list means valid"""
+    if not isinstance(content, dict):
+        return ["content is not a JSON object"]
+
+    problems = []
+    if content.get("fallback"):
+        problems.append("fallback placeholder content")
+    if content.get("partial"):
+        problems.append("response was truncated")
+    if not isinstance(content.get("title"), str) or not content["title"].strip():
+        problems.append("missing title")
+
+    points = content.get("content")
+    if not isinstance(points, list) or len([p for p in points if isinstance(p, str) and p.strip()]) < 2:
+        problems.append("fewer than 2 content points")
+
+    examples = content.get("worked_examples")
+    if not isinstance(examples, list) or not examples:
+        problems.append("no worked examples")
+    elif not all(isinstance(e, dict) and e.get("problem") and e.get("solution") for e in examples):
+        problems.append("worked example without problem/solution")
+
+    questions = content.get("practice_questions")
+    if not isinstance(questions, list) or not questions:
+        problems.append("no practice questions")
+    elif not all(isinstance(q, dict) and q.get("question") and q.get("answer") for q in questions):
+        problems.append("practice question without question/answer")
+
+    return problems
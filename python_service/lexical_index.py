@@ -0,0 +1,168 @@
+# lexical_index.py
+"""
+Inverted index over normalised maths tokens in the dataset questions.
+
+The embedding match in TrigSolver.ai_find_best_match encodes every query and
+still misses exact-token matches: MiniLM sees "tan²x - sin²x" and
+"tan²x + sin²x" as nearly the same sentence. This index tokenises questions
+into functions with their powers (sin^2), numbers, variables, operators and
+words, plus bigrams of neighbouring tokens, and scores them with BM25.
+
+It is built by model_trainer.py and stored in true_ai_tutor.pkl. At query
+time an exact or near-exact textbook question is answered from the index
+alone, without running the encoder; otherwise the BM25 score is fused with
+the semantic similarity.
+"""
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+LEXICAL_WEIGHT = float(os.getenv("LEXICAL_WEIGHT", "0.35"))
+LEXICAL_SHORTCUT_COVERAGE = float(os.getenv("LEXICAL_SHORTCUT_COVERAGE", "0.95"))
+
+_REPLACEMENTS = [
+    ('²', '^2'), ('³', '^3'), ('⁻¹', '^-1'), ('−', '-'), ('–', '-'), ('×', '*'), ('·', '*'), ('÷', '/'),
+    ('≡', '='), ('≤', ' <= '), ('≥', ' >= '), ('√', ' sqrt '), ('π', ' pi '), ('°', ' deg '),
+    ('θ', 'x'), ('φ', 'x'), ('α', 'x'), ('β', 'x'), ('csc', 'cosec'),
+]
+_TOKEN = re.compile(r'(?:arc)?(?:sin|cosec|cos|tan|sec|cot)(?:\^-?\d+)?(?![a-wyz])'
+                    r'|\d+(?:\.\d+)?'
+                    r'|[a-z]+'
+                    r'|<=|>=|[=+\-*/^<>]')    # Brackets are dropped: sin(30°) and sin 30° match
+_TOKEN_WITH_BRACKETS = re.compile(_TOKEN.pattern + r'|[()\[\]]')
+_STOPWORDS = {
+    'a', 'an', 'the', 'of', 'and', 'to', 'in', 'for', 'that', 'is', 'are', 'on', 'by', 'with',
+    'your', 'you', 'this', 'its', 'it', 'be', 'as', 'at', 'from', 'which', 'all', 'each', 'given',
+    'what', 'how', 'please', 'can', 'me', 'now', 'try', 'using', 'use', 'show', 'working',
+}
+
+
+def math_tokens(text: str, keep_brackets: bool = False) -> List[str]:
+    """Normalised unigram tokens: 'Prove that tan²x - sin²x' -> ['prove', 'tan^2', 'x', '-', 'sin^2', 'x']
+
+    keep_brackets also returns '(', ')', '[' and ']' as tokens.
+    """
+    text = str(text).lower()
+    for old, new in _REPLACEMENTS:
+        text = text.replace(old, new)
+    tokens = []
+    for token in (_TOKEN_WITH_BRACKETS if keep_brackets else _TOKEN).findall(text):
+        if token[0].isdigit():
+            token = format(float(token), 'g')    # 30.0 and 30 are the same number
+        elif token in _STOPWORDS:
+            continue
+        tokens.append(token)
+    return tokens
+
+
+def index_terms(text: str) -> List[str]:
+    """Unigrams plus bigrams of neighbouring tokens, so 'tan^2 x -' differs from 'tan^2 x +'"""
+    tokens = math_tokens(text)
+    return tokens + [f"{a}|{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+class LexicalIndex:
+    """BM25 inverted index with exact-signature lookup"""
+
+    def __init__(self, postings: Dict[str, Tuple[np.ndarray, np.ndarray]], doc_lengths: np.ndarray,
+                 signatures: Dict[str, int]):
+        self.postings = postings
+        self.doc_lengths = doc_lengths.astype(np.float32)
+        self.signatures = signatures
+        self.num_docs = len(doc_lengths)
+        self.avg_length = float(self.doc_lengths.mean()) if self.num_docs else 1.0
+        # Robertson-Sparck Jones idf, floored so very common terms still count a little
+        self.idf = {term: max(math.log((self.num_docs - len(ids) + 0.5) / (len(ids) + 0.5) + 1.0), 0.01)
+                    for term, (ids, _) in postings.items()}
+        self.max_idf = max(self.idf.values()) if self.idf else 1.0
+        # idf mass of each document's distinct terms, for the document-side coverage
+        self.doc_mass = np.zeros(self.num_docs, dtype=np.float32)
+        for term, (ids, _) in postings.items():
+            self.doc_mass[ids] += self.idf[term]
+
+    @classmethod
+    def build(cls, questions: List[str]) -> "LexicalIndex":
+        postings = defaultdict(lambda: ([], []))
+        doc_lengths, signatures = [], {}
+        for doc_id, question in enumerate(questions):
+            terms = index_terms(question)
+            doc_lengths.append(len(terms))
+            signatures.setdefault(" ".join(math_tokens(question)), doc_id)
+            for term, count in Counter(terms).items():
+                postings[term][0].append(doc_id)
+                postings[term][1].append(count)
+
+        arrays = {term: (np.array(ids, dtype=np.int32), np.array(counts, dtype=np.float32))
+                  for term, (ids, counts) in postings.items()}
+        index = cls(arrays, np.array(doc_lengths), signatures)
+        print(f"   ✅ Lexical index: {index.num_docs} questions, {len(arrays)} terms")
+        return index
+
+    def add_aliases(self, aliases: Dict[int, List[Dict[str, Any]]]) -> int:
+        """Exact-match signatures for questions folded into a canonical row by dedup"""
+        added = 0
+        for row, entries in aliases.items():
+            for alias in entries:
+                signature = " ".join(math_tokens(alias["question"]))
+                if signature and signature not in self.signatures:
+                    self.signatures[signature] = int(row)
+                    added += 1
+        return added
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain structure for the joblib artifact"""
+        return {'postings': self.postings, 'doc_lengths': self.doc_lengths, 'signatures': self.signatures}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LexicalIndex":
+        return cls(data['postings'], np.asarray(data['doc_lengths']), data['signatures'])
+
+    def exact_match(self, query: str) -> Optional[int]:
+        """Document whose token sequence equals the query's (spacing, case and notation ignored)"""
+        tokens = math_tokens(query)
+        return self.signatures.get(" ".join(tokens)) if tokens else None
+
+    def score(self, query: str) -> Dict[str, np.ndarray]:
+        """BM25 scores normalised to [0, 1) plus idf-weighted coverage of the query and of each document"""
+        query_terms = Counter(index_terms(query))
+        bm25 = np.zeros(self.num_docs, dtype=np.float32)
+        overlap = np.zeros(self.num_docs, dtype=np.float32)
+        query_mass = 0.0
+        for term in query_terms:
+            idf = self.idf.get(term)
+            query_mass += idf if idf is not None else self.max_idf    # Unknown terms count against coverage
+            if idf is None:
+                continue
+            ids, tf = self.postings[term]
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_lengths[ids] / self.avg_length)
+            bm25[ids] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+            overlap[ids] += idf
+
+        # BM25 of a term is bounded by idf * (k1 + 1), which makes the score comparable across queries
+        upper = max(query_mass * (BM25_K1 + 1.0), 1e-9)
+        return {
+            'bm25': bm25 / upper,
+            'query_coverage': overlap / max(query_mass, 1e-9),
+            'doc_coverage': overlap / np.maximum(self.doc_mass, 1e-9),
+        }
+
+    def near_exact(self, query: str, min_coverage: float = LEXICAL_SHORTCUT_COVERAGE) -> Optional[Tuple[int, float]]:
+        """(doc_id, coverage) when one question shares almost all its terms with the query both ways"""
+        scores = self.score(query)
+        coverage = np.minimum(scores['query_coverage'], scores['doc_coverage'])
+        best = int(np.argmax(coverage)) if self.num_docs else -1
+        if best < 0 or coverage[best] < min_coverage:
+            return None
+        return best, float(coverage[best])
+
+
+def fuse_scores(semantic: np.ndarray, lexical: np.ndarray, weight: float = LEXICAL_WEIGHT) -> np.ndarray:
+    """Lexical evidence raises the semantic similarity but never lowers it, so learned thresholds still apply"""
+    semantic = np.asarray(semantic, dtype=np.float32)
+    return semantic + weight * lexical * (1.0 - np.clip(semantic, 0.0, 1.0))
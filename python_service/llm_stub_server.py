@@ -0,0 +1,276 @@
+# llm_stub_server.py
+"""
+Offline OpenAI-compatible stand-in for the Groq API.
+
+Lets us load-test /lessons/start-topic, /lessons/section and /lessons/ask
+without burning Groq quota. Point the AI service at it with:
+
+    python llm_stub_server.py --port 8008 --latency-ms 900 --rate-limit-rate 0.05
+    AI_BASE_URL=http://127.0.0.1:8008/v1 GROQ_API_KEY=stub python app.py
+
+The stub answers for any model id, so every tier in model_router.py is served
+by it too (set MODEL_TIER_FAST / _STANDARD / _ADVANCED to tell them apart in
+/stub/stats).
+
+Latency is drawn from a log-normal distribution around --latency-ms, plus
+the time needed to "generate" the completion at --tokens-per-second.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import Flask, jsonify, request
+
+from token_accounting import estimate_tokens
+
+app = Flask(__name__)
+
+STUB_CONFIG = {
+    "latency_ms": float(os.getenv("STUB_LATENCY_MS", "800")),
+    "latency_sigma": float(os.getenv("STUB_LATENCY_SIGMA", "0.4")),
+    "tokens_per_second": float(os.getenv("STUB_TOKENS_PER_SECOND", "400")),
+    "error_rate": float(os.getenv("STUB_ERROR_RATE", "0")),
+    "rate_limit_rate": float(os.getenv("STUB_RATE_LIMIT_RATE", "0")),
+    "retry_after_seconds": int(os.getenv("STUB_RETRY_AFTER_SECONDS", "2"))
+}
+
+_rng = random.Random()
+_rng_lock = threading.Lock()
+_counters = {"requests": 0, "rate_limited": 0, "errors": 0, "completion_tokens": 0, "models": {}}
+_counters_lock = threading.Lock()
+
+
+def _count(key, amount=1):
+    with _counters_lock:
+        _counters[key] += amount
+
+
+def _count_model(model):
+    with _counters_lock:
+        _counters["models"][model] = _counters["models"].get(model, 0) + 1
+
+
+def _sample_latency_seconds():
+    with _rng_lock:
+        factor = _rng.lognormvariate(0.0, STUB_CONFIG["latency_sigma"])
+    return STUB_CONFIG["latency_ms"] / 1000.0 * factor
+
+
+def _roll(rate):
+    if rate <= 0:
+        return False
+    with _rng_lock:
+        return _rng.random() < rate
+
+
+def _detect_topic(prompt):
+    match = re.search(r'TOPIC:\s*([A-Za-z ]+)', prompt)
+    return match.group(1).strip() if match else "Trigonometry"
+
+
+def _lesson_response(prompt):
+    topic = _detect_topic(prompt)
+    section_match = re.search(r'SECTION:\s*(\d+)', prompt)
+    section = section_match.group(1) if section_match else "1"
+    return {
+        "title": f"{topic}: Section {section}",
+        "content": [
+            f"Key idea of {topic.lower()} as required by NSSCAS 8227",
+            "Worked reasoning with every step shown, answers to 3 significant figures",
+            "Examination focus: structured questions with method marks"
+        ],
+        "worked_examples": [
+            {
+                "problem": "A circular kraal in Namibia has radius 12 m. Find the arc length subtended by 1.5 radians.",
+                "solution": "s = rθ = 12 × 1.5 = 18 m",
+                "explanation": "Arc length formula with θ in radians"
+            },
+            {
+                "problem": "Solve 2sin x = 1 for 0° ≤ x ≤ 360°.",
+                "solution": "sin x = 1/2, so x = 30° or x = 150°",
+                "explanation": "Sine is positive in the first and second quadrants"
+            }
+        ],
+        "applications": [
+            "Designing centre-pivot irrigation fields in the Hardap region",
+            "Modelling daylight hours in Windhoek across the year"
+        ],
+        "practice_questions": [
+            {
+                "question": "Convert 150° to radians.",
+                "hint": "Multiply by π/180",
+                "answer": "5π/6"
+            },
+            {
+                "question": "Find the period of y = 3cos(2x).",
+                "hint": "Period = 360°/b",
+                "answer": "180°"
+            }
+        ],
+        "syllabus_alignment": {
+            "covered_objectives": [f"{topic} specific objectives"],
+            "assessment_preparation": "Mirrors structured Paper 1 questions"
+        }
+    }
+
+
+def _qa_response(prompt):
+    question_match = re.search(r'STUDENT QUESTION:\s*"(.*?)"', prompt, re.DOTALL)
+    question = question_match.group(1) if question_match else "the question"
+    return {
+        "explanation": f"Here is how to approach: {question}",
+        "steps": [
+            "Step 1: Identify what the question gives and what it asks for",
+            "Step 2: Choose the relevant formula or identity from the syllabus",
+            "Step 3: Substitute and simplify, showing all working",
+            "Step 4: State the final answer to 3 significant figures"
+        ],
+        "worked_example": {
+            "problem": "Convert 3π/4 radians to degrees.",
+            "solution": ["Step 1: Multiply by 180/π", "Step 2: 3π/4 × 180/π = 135°"]
+        },
+        "key_concepts": ["radian measure", "exact values"],
+        "examination_tips": ["Show every step for method marks", "Give angles to 1 decimal place"]
+    }
+
+
+def _assessment_response(prompt):
+    count_match = re.search(r'Generate (\d+)', prompt)
+    count = min(int(count_match.group(1)), 20) if count_match else 5
+    difficulty_match = re.search(r'Generate \d+ (\w+) difficulty', prompt)
+    difficulty = difficulty_match.group(1) if difficulty_match else "medium"
+    return [
+        {
+            "question_id": f"q{i + 1}",
+            "question": f"Solve sin x = 0.{i + 1} for 0° ≤ x ≤ 360°, giving answers to 1 decimal place.",
+            "options": [],
+            "correct_answer": "Use x = sin⁻¹(k) and x = 180° − sin⁻¹(k)",
+            "explanation": "Sine is positive in quadrants I and II",
+            "concepts": ["trigonometric equations"],
+            "difficulty": difficulty,
+            "marks": 4
+        }
+        for i in range(count)
+    ]
+
+
+def _completion_for(messages):
+    prompt = messages[-1].get("content", "") if messages else ""
+    if "lesson content in this exact JSON format" in prompt:
+        return json.dumps(_lesson_response(prompt), ensure_ascii=False)
+    if "STUDENT QUESTION" in prompt:
+        return json.dumps(_qa_response(prompt), ensure_ascii=False)
+    if "Format as JSON array" in prompt:
+        return json.dumps(_assessment_response(prompt), ensure_ascii=False)
+    return json.dumps({"status": "connected", "message": "API test successful"})
+
+
+def _error(status, message, error_type, headers=None):
+    response = jsonify({"error": {"message": message, "type": error_type}})
+    response.status_code = status
+    for key, value in (headers or {}).items():
+        response.headers[key] = value
+    return response
+
+
+@app.route('/v1/models', methods=['GET'])
+@app.route('/openai/v1/models', methods=['GET'])
+def list_models():
+    return jsonify({"object": "list", "data": [{"id": "stub-model", "object": "model", "owned_by": "stub"}]})
+
+
+@app.route('/v1/chat/completions', methods=['POST'])
+@app.route('/openai/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    _count("requests")
+    data = request.get_json(force=True, silent=True) or {}
+
+    if _roll(STUB_CONFIG["rate_limit_rate"]):
+        _count("rate_limited")
+        return _error(429, "Rate limit reached (stub)", "rate_limit_exceeded",
+                      {"Retry-After": str(STUB_CONFIG["retry_after_seconds"])})
+
+    _count_model(data.get("model", "stub-model"))
+    messages = data.get("messages", [])
+    completion = _completion_for(messages)
+    completion_tokens = estimate_tokens(completion)
+
+    # Honour max_tokens the way the real API does: cut the text off mid-way
+    max_tokens = data.get("max_tokens")
+    finish_reason = "stop"
+    if max_tokens and completion_tokens > max_tokens:
+        completion = completion[:int(max_tokens * 4)]
+        completion_tokens = max_tokens
+        finish_reason = "length"
+
+    time.sleep(_sample_latency_seconds() + completion_tokens / max(STUB_CONFIG["tokens_per_second"], 1.0))
+
+    if _roll(STUB_CONFIG["error_rate"]):
+        _count("errors")
+        return _error(503, "Upstream model unavailable (stub)", "server_error")
+
+    _count("completion_tokens", completion_tokens)
+    prompt_tokens = sum(estimate_tokens(message.get("content", "")) for message in messages)
+    return jsonify({
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": data.get("model", "stub-model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": completion},
+            "finish_reason": finish_reason
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    })
+
+
+@app.route('/stub/stats', methods=['GET'])
+def stub_stats():
+    with _counters_lock:
+        counters = dict(_counters, models=dict(_counters["models"]))
+    return jsonify({"config": STUB_CONFIG, "counters": counters})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible LLM stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("STUB_PORT", "8008")))
+    parser.add_argument("--latency-ms", type=float, default=STUB_CONFIG["latency_ms"],
+                        help="median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=STUB_CONFIG["latency_sigma"],
+                        help="log-normal spread of the latency (0 = fixed)")
+    parser.add_argument("--tokens-per-second", type=float, default=STUB_CONFIG["tokens_per_second"])
+    parser.add_argument("--error-rate", type=float, default=STUB_CONFIG["error_rate"],
+                        help="fraction of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=STUB_CONFIG["rate_limit_rate"],
+                        help="fraction of requests answered with 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    STUB_CONFIG.update({
+        "latency_ms": args.latency_ms,
+        "latency_sigma": args.latency_sigma,
+        "tokens_per_second": args.tokens_per_second,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate
+    })
+    if args.seed is not None:
+        _rng.seed(args.seed)
+
+    print(f"🧪 LLM stub listening on http://{args.host}:{args.port}/v1")
+    print(f"   Config: {STUB_CONFIG}")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
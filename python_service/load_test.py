@@ -0,0 +1,148 @@
+# load_test.py
+"""
+Concurrent load generator for the AI lesson endpoints.
+
+Run the app against the offline stub (see llm_stub_server.py), then:
+
+    python load_test.py --base-url http://127.0.0.1:7000 --concurrency 30 --requests 300
+
+Reports p50/p95/p99 latency and throughput per endpoint.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from unified_backend import TOPICS
+
+SAMPLE_QUESTIONS = [
+    "How do I convert 150 degrees to radians?",
+    "150° in radians?",
+    "What is the period of y = 3sin(2x)?",
+    "Find the exact value of cos(45°)",
+    "Prove that sin²θ + cos²θ = 1",
+    "Solve sin x = 0.5 for 0 ≤ x ≤ 360",
+    "Express 3sinθ + 4cosθ in the form Rsin(θ + α)",
+    "Why is the arc length rθ only when θ is in radians?"
+]
+
+ENDPOINTS = {
+    "start-topic": "/lessons/start-topic",
+    "section": "/lessons/section",
+    "ask": "/lessons/ask"
+}
+
+_thread_state = threading.local()
+
+
+def _session():
+    if not hasattr(_thread_state, "session"):
+        _thread_state.session = requests.Session()
+    return _thread_state.session
+
+
+def build_payload(endpoint, rng, students):
+    topic = rng.choice(TOPICS)
+    payload = {"student_id": rng.choice(students), "topic_id": topic["id"]}
+    if endpoint == "section":
+        payload["section_index"] = rng.randrange(topic.get("total_sections", 4))
+    elif endpoint == "ask":
+        payload["question"] = rng.choice(SAMPLE_QUESTIONS)
+    return payload
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(math.ceil(pct / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[rank]
+
+
+def run_endpoint(base_url, endpoint, total_requests, concurrency, timeout, seed, students):
+    rng = random.Random(seed)
+    payloads = [build_payload(endpoint, rng, students) for _ in range(total_requests)]
+    url = base_url.rstrip("/") + ENDPOINTS[endpoint]
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+
+    def fire(payload):
+        started = time.perf_counter()
+        try:
+            response = _session().post(url, json=payload, timeout=timeout)
+            status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with lock:
+            if status == 200:
+                latencies.append(elapsed)
+            else:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    wall_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fire, payloads))
+    wall_time = time.perf_counter() - wall_started
+
+    latencies.sort()
+    return {
+        "endpoint": ENDPOINTS[endpoint],
+        "requests": total_requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / wall_time, 2) if wall_time > 0 else 0.0,
+        "wall_time_s": round(wall_time, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the AI lesson endpoints")
+    parser.add_argument("--base-url", default="http://127.0.0.1:7000")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help=f"comma-separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--students", type=int, default=30, help="distinct student ids to spread load over")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    args = parser.parse_args()
+
+    students = [f"loadtest_student_{i:03d}" for i in range(args.students)]
+    selected = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+
+    print(f"🚦 Load testing {args.base_url} with concurrency {args.concurrency}")
+    report = []
+    for name in selected:
+        if name not in ENDPOINTS:
+            print(f"⚠️ Unknown endpoint '{name}', skipping")
+            continue
+        print(f"   ▶ {ENDPOINTS[name]} ({args.requests} requests)...")
+        report.append(run_endpoint(args.base_url, name, args.requests, args.concurrency,
+                                   args.timeout, args.seed, students))
+
+    print(f"\n{'endpoint':<24}{'ok':>6}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for row in report:
+        error_count = sum(row["errors"].values())
+        print(f"{row['endpoint']:<24}{row['succeeded']:>6}{error_count:>6}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['throughput_rps']:>9}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
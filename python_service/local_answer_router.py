@@ -0,0 +1,147 @@
+# local_answer_router.py
+"""
+Local-first routing for /lessons/ask.
+
+Many student questions are answered exactly by the template engine or by a
+question in the 281-question dataset. The router tries those local paths of
+TrigSolver first and only lets the question through to the LLM when the
+local confidence is below the configured threshold.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+MIN_TEMPLATE_CONFIDENCE = float(os.getenv("LOCAL_ANSWER_MIN_CONFIDENCE", "0.8"))
+MIN_DATASET_SIMILARITY = float(os.getenv("LOCAL_DATASET_MIN_SIMILARITY", "0.8"))
+# While the LLM is unavailable a slightly weaker local match beats no answer at all
+DEGRADED_CONFIDENCE_SCALE = float(os.getenv("LOCAL_ANSWER_DEGRADED_SCALE", "0.75"))
+
+# Templates that succeed without actually solving anything
+_GENERIC_TEMPLATE_METHODS = {'traditional_fallback'}
+
+
+class LocalAnswerRouter:
+    """Answers from TrigSolver templates, then the dataset, before falling back to the LLM"""
+
+    def __init__(self, solver=None, min_template_confidence: float = MIN_TEMPLATE_CONFIDENCE,
+                 min_dataset_similarity: float = MIN_DATASET_SIMILARITY):
+        self.solver = solver
+        self.min_template_confidence = min_template_confidence
+        self.min_dataset_similarity = min_dataset_similarity
+        self._lock = threading.Lock()
+        # The dataset path encodes the question; the answer cache reuses that vector on a miss
+        self._last_embedding = threading.local()
+        self.stats = {
+            "questions": 0,
+            "local_template_answers": 0,
+            "local_dataset_answers": 0,
+            "llm_answers": 0,
+            "local_latency_total": 0.0,
+            "llm_latency_total": 0.0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.solver is not None and self.solver.model_data is not None
+
+    def try_local_answer(self, question: str, min_confidence_scale: float = 1.0) -> Optional[Dict[str, Any]]:
+        """Return a template-style result if a local path is confident enough, otherwise None
+
+        min_confidence_scale < 1 relaxes both thresholds (degraded mode).
+        """
+        solver = self.solver    # One model version for the whole question, even if a reload swaps it meanwhile
+        self._last_embedding.question = None
+        if solver is None or solver.model_data is None:
+            return None
+
+        started = time.perf_counter()
+        result = self._try_template(solver, question, self.min_template_confidence * min_confidence_scale)
+        if result is None:
+            result = self._try_dataset(solver, question, self.min_dataset_similarity * min_confidence_scale)
+
+        if result is not None:
+            result['latency'] = time.perf_counter() - started
+            with self._lock:
+                self.stats["local_latency_total"] += result['latency']
+                self.stats[f"{result['source']}_answers"] += 1
+                self.stats["questions"] += 1
+        return result
+
+    def _try_template(self, solver, question: str, threshold: float) -> Optional[Dict[str, Any]]:
+        try:
+            template_result = solver.template_manager.solve_with_template(question)
+        except Exception as e:
+            print(f"⚠️ Local template path failed: {e}")
+            return None
+
+        if (not template_result or not template_result.get('success')
+                or template_result.get('method') in _GENERIC_TEMPLATE_METHODS
+                or template_result.get('confidence', 0) < threshold):
+            return None
+
+        return {
+            'success': True,
+            'source': 'local_template',
+            'method': template_result.get('method', 'template'),
+            'confidence': float(template_result['confidence']),
+            'solution_steps': template_result.get('solution_steps', []),
+            'final_answer': template_result.get('final_answer', ''),
+            'graph_image': template_result.get('graph_image') if template_result.get('has_graph') else None
+        }
+
+    def question_embedding(self, question: str):
+        """The embedding computed for `question` by this thread's last try_local_answer, or None"""
+        if getattr(self._last_embedding, 'question', None) != question:
+            return None
+        return self._last_embedding.vector
+
+    def _try_dataset(self, solver, question: str, threshold: float) -> Optional[Dict[str, Any]]:
+        matches, embedding = solver.ai_find_best_match(question, return_embedding=True)
+        if embedding is not None:
+            self._last_embedding.question = question
+            self._last_embedding.vector = embedding
+        if not matches:
+            return None
+
+        best_idx, similarity, method = matches[0]
+        if similarity < threshold:
+            return None
+
+        solution_steps, solution_type, final_answer = solver.get_solution_from_dataset(best_idx, question)
+        if not final_answer:
+            final_answer = solver.extract_final_answer(solution_steps)
+
+        return {
+            'success': True,
+            'source': 'local_dataset',
+            'method': 'dataset_match',
+            'confidence': float(similarity),
+            'solution_steps': [str(step) for step in solution_steps],
+            'final_answer': str(final_answer),
+            'matched_question': str(solver.model_data['questions'][best_idx]),
+            'graph_image': None
+        }
+
+    def record_llm_answer(self, latency: float):
+        """Record a question that had to go to the LLM"""
+        with self._lock:
+            self.stats["llm_answers"] += 1
+            self.stats["llm_latency_total"] += latency
+            self.stats["questions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+
+        local_answers = stats["local_template_answers"] + stats["local_dataset_answers"]
+        avg_local = stats["local_latency_total"] / local_answers if local_answers else 0.0
+        avg_llm = stats["llm_latency_total"] / stats["llm_answers"] if stats["llm_answers"] else 0.0
+
+        stats["enabled"] = self.enabled
+        stats["local_answer_ratio"] = round(local_answers / stats["questions"], 3) if stats["questions"] else 0.0
+        stats["avg_local_latency_ms"] = round(avg_local * 1000, 1)
+        stats["avg_llm_latency_ms"] = round(avg_llm * 1000, 1)
+        # Each local answer saved roughly one average LLM round trip
+        stats["estimated_latency_saved_s"] = round(max(avg_llm - avg_local, 0.0) * local_answers, 2)
+        return stats
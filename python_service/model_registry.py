@@ -0,0 +1,236 @@
+# model_registry.py
+"""
+Versioned model artifacts with hot reload.
+
+model_trainer.py publishes every trained artifact to its own directory under
+model_versions/ and then points model_versions/CURRENT at it:
+
+    model_versions/
+        20261018-141502-417/true_ai_tutor.pkl
+        20261018-163011-052/true_ai_tutor.pkl
+        CURRENT                -> "20261018-163011-052"
+
+The running service holds a ModelRegistry. A reload (POST /admin/reload-model,
+or the CURRENT watcher when MODEL_WATCH_INTERVAL is set) loads the new
+version on a background thread and warms it with a few sample queries. Only
+then does it swap the registry's solver reference. The swap is one attribute
+assignment, so a request that already fetched the old solver finishes on the
+old version, and the next request gets the new one. Conversation context lives
+outside the solver (TrigSolver.solve takes and returns it), so it survives the swap.
+
+Without a CURRENT pointer the registry serves the legacy true_ai_tutor.pkl.
+"""
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import joblib
+
+MODEL_ARTIFACT_DIR = os.getenv("MODEL_ARTIFACT_DIR", os.path.join(os.path.dirname(__file__), "model_versions"))
+LEGACY_MODEL_PATH = os.path.join(os.path.dirname(__file__), "true_ai_tutor.pkl")
+ARTIFACT_FILENAME = "true_ai_tutor.pkl"
+CURRENT_POINTER = "CURRENT"
+MODEL_KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "3"))
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))    # Seconds between CURRENT checks; 0 disables
+
+# Why reload() did or did not start a load
+RELOAD_STARTED = "started"
+RELOAD_NOT_FOUND = "not_found"
+RELOAD_ALREADY_RUNNING = "already_running"
+
+WARMUP_QUERIES = (
+    "Solve sin x = 0.5 for 0° ≤ x ≤ 360°",
+    "Prove that tan x + cot x = sec x cosec x",
+    "Sketch the graph of y = 2cos x for 0 ≤ x ≤ 2π",
+)
+
+
+def current_version(artifact_dir: str = MODEL_ARTIFACT_DIR) -> Optional[str]:
+    """Version named by the CURRENT pointer, or None if nothing has been published"""
+    try:
+        with open(os.path.join(artifact_dir, CURRENT_POINTER), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def artifact_path(version: str, artifact_dir: str = MODEL_ARTIFACT_DIR) -> str:
+    return os.path.join(artifact_dir, version, ARTIFACT_FILENAME)
+
+
+def list_versions(artifact_dir: str = MODEL_ARTIFACT_DIR) -> List[str]:
+    """Published versions, oldest first (names sort by creation time)"""
+    if not os.path.isdir(artifact_dir):
+        return []
+    return sorted(name for name in os.listdir(artifact_dir)
+                  if os.path.isfile(artifact_path(name, artifact_dir)))
+
+
+def _write_atomic(path: str, text: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def publish_artifact(source_path: str, artifact_dir: str = MODEL_ARTIFACT_DIR,
+                     keep: int = MODEL_KEEP_VERSIONS) -> str:
+    """Copy a trained artifact into a new version directory and point CURRENT at it"""
+    version = datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]    # Millisecond names sort by publish time
+    while os.path.exists(os.path.join(artifact_dir, version)):
+        time.sleep(0.001)
+        version = datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+    version_dir = os.path.join(artifact_dir, version)
+    os.makedirs(version_dir)
+
+    target = artifact_path(version, artifact_dir)
+    shutil.copy2(source_path, f"{target}.tmp")
+    os.replace(f"{target}.tmp", target)
+    _write_atomic(os.path.join(artifact_dir, CURRENT_POINTER), version)
+
+    # Old versions beyond `keep` are removed; the one just published is always kept
+    for old in list_versions(artifact_dir)[:-max(keep, 1)]:
+        if old != version:
+            shutil.rmtree(os.path.join(artifact_dir, old), ignore_errors=True)
+    return version
+
+
+class ModelRegistry:
+    """The solver currently serving requests, replaced atomically by background reloads"""
+
+    def __init__(self, artifact_dir: str = MODEL_ARTIFACT_DIR, legacy_path: str = LEGACY_MODEL_PATH):
+        self.artifact_dir = artifact_dir
+        self.legacy_path = legacy_path
+        self._solver = None
+        self._listeners: List[Callable] = []
+        self._reload_lock = threading.Lock()    # One reload at a time
+        self._watcher = None
+        self.status = {
+            "version": None,
+            "path": None,
+            "loaded_at": None,
+            "load_seconds": None,
+            "reloading": False,
+            "reloads": 0,
+            "last_error": None,
+        }
+
+    def solver(self):
+        """The serving solver; fetch it once per request and use that reference throughout"""
+        return self._solver
+
+    def on_swap(self, callback: Callable):
+        """callback(solver) runs after every swap, for services that hold the solver themselves"""
+        self._listeners.append(callback)
+
+    def resolve(self, version: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """(version, path) to load: the requested version, CURRENT, or the legacy artifact"""
+        version = version or current_version(self.artifact_dir)
+        if version:
+            path = artifact_path(version, self.artifact_dir)
+            return (version, path) if os.path.exists(path) else (None, None)
+        if os.path.exists(self.legacy_path):
+            return "legacy", self.legacy_path
+        return None, None
+
+    def load_initial(self) -> bool:
+        """Synchronous first load at startup"""
+        with self._reload_lock:
+            return self._load_and_swap(*self.resolve())
+
+    def reload(self, version: Optional[str] = None, wait: bool = False) -> Dict[str, Any]:
+        """Load a version (default: CURRENT) in the background and swap it in when warm.
+        `reason` is one of RELOAD_STARTED, RELOAD_NOT_FOUND or RELOAD_ALREADY_RUNNING"""
+        target, path = self.resolve(version)
+        if path is None:
+            return {"started": False, "reason": RELOAD_NOT_FOUND,
+                    "error": f"Model version not found: {version or CURRENT_POINTER}"}
+        if not self._reload_lock.acquire(blocking=False):
+            return {"started": False, "reason": RELOAD_ALREADY_RUNNING, "error": "A reload is already running"}
+
+        # The version and path resolved above are the ones loaded: "legacy" is not a directory to resolve again
+        def run():
+            try:
+                return self._load_and_swap(target, path)
+            finally:
+                self._reload_lock.release()
+
+        if wait:
+            loaded = run()
+            return {"started": True, "reason": RELOAD_STARTED, "completed": True, "loaded": loaded,
+                    "version": target, "status": self.get_status()}
+        threading.Thread(target=run, name="model-reload", daemon=True).start()
+        return {"started": True, "reason": RELOAD_STARTED, "completed": False, "version": target}
+
+    def _load_and_swap(self, version: Optional[str], path: Optional[str]) -> bool:
+        if path is None:
+            self.status["last_error"] = "No model artifact found"
+            print("❌ No model artifact found")
+            return False
+
+        from trig_solver import TrigSolver    # Imported here so the trainer can publish without matplotlib
+
+        self.status["reloading"] = True
+        started = time.perf_counter()
+        try:
+            print(f"🔄 Loading model version {version} from {path}...")
+            solver = TrigSolver(model_data=joblib.load(path))
+            if solver.model_data is None:
+                raise ValueError("artifact could not be loaded")
+            self._warm(solver)
+        except Exception as e:
+            self.status["last_error"] = f"{version}: {e}"
+            print(f"❌ Model version {version} not loaded, still serving {self.status['version']}: {e}")
+            return False
+        finally:
+            self.status["reloading"] = False
+
+        seconds = time.perf_counter() - started
+        self._solver = solver    # The swap: requests already holding the old solver are unaffected
+        self.status.update({
+            "version": version,
+            "path": path,
+            "loaded_at": datetime.now().isoformat(),
+            "load_seconds": round(seconds, 2),
+            "reloads": self.status["reloads"] + (1 if self.status["version"] else 0),
+            "last_error": None,
+        })
+        for callback in self._listeners:
+            try:
+                callback(solver)
+            except Exception as e:
+                print(f"⚠️ Model swap listener failed: {e}")
+        print(f"✅ Serving model version {version} (loaded and warmed in {seconds:.2f}s)")
+        return True
+
+    def _warm(self, solver):
+        """Run sample queries so the first real request does not pay for lazy initialisation"""
+        for query in WARMUP_QUERIES:
+            solver.ai_find_best_match(query)
+
+    def start_watcher(self, interval: float = MODEL_WATCH_INTERVAL):
+        """Reload whenever CURRENT changes; checked every `interval` seconds"""
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        def watch():
+            attempted = self.status["version"]
+            while True:
+                time.sleep(interval)
+                version = current_version(self.artifact_dir)
+                # A version that failed to load is not retried until CURRENT changes again
+                if version and version not in (self.status["version"], attempted) and not self.status["reloading"]:
+                    print(f"👀 CURRENT now points at {version}")
+                    attempted = version
+                    self.reload(version)
+
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+        print(f"👀 Watching {os.path.join(self.artifact_dir, CURRENT_POINTER)} every {interval:g}s")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {**self.status, "current_pointer": current_version(self.artifact_dir),
+                "watching": self._watcher is not None}
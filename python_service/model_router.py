@@ -0,0 +1,175 @@
+# model_router.py
+"""
+Tiered model routing for LLM calls.
+
+A one-line "what is a radian?" does not need the same model or a 2000-token
+budget as a multi-part R-form exam question. The router classifies each
+request cheaply (endpoint, topic, keywords, length and the solver's intent
+analyzer) and picks a tier: model, max_tokens and temperature.
+
+Every tier is configurable through the environment, e.g.
+
+    MODEL_TIER_FAST=llama-3.1-8b-instant MODEL_TIER_FAST_MAX_TOKENS=600
+    MODEL_TIER_ADVANCED=llama-3.3-70b-versatile MODEL_TIER_ADVANCED_TEMPERATURE=0.2
+
+so the offline stub (llm_stub_server.py) can stand in for all of them.
+"""
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+# Model and budget every call used before routing; savings and upgrades are measured against them
+BASELINE_MODEL = "llama-3.1-8b-instant"
+BASELINE_MAX_TOKENS = 2000
+
+_TIER_DEFAULTS = {
+    "fast": {"model": "llama-3.1-8b-instant", "max_tokens": 700, "temperature": 0.2},
+    "standard": {"model": "llama-3.1-8b-instant", "max_tokens": 1500, "temperature": 0.3},
+    "advanced": {"model": "llama-3.3-70b-versatile", "max_tokens": 2000, "temperature": 0.3},
+}
+
+# Lessons and assessments have no student question to classify. They are the
+# highest-volume calls, so they stay on the baseline model; set these to
+# "advanced" to pay for the larger model deliberately
+_ENDPOINT_TIERS = {
+    "lesson": os.getenv("MODEL_TIER_FOR_LESSONS", "standard"),
+    "assessment": os.getenv("MODEL_TIER_FOR_ASSESSMENTS", "standard"),
+}
+
+_COMPLEX_PATTERNS = [
+    r'r\s*(sin|cos)', r'in the form', r'prove', r'show that', r'hence', r'general solution',
+    r'compound angle', r'double angle', r'(^|\s)\(\s*[a-d]\s*\)', r'sin\s*\(\s*[a-z]\s*[+-]',
+    r'cos\s*\(\s*[a-z]\s*[+-]', r'maximum|minimum', r'\bderive\b'
+]
+_SIMPLE_PATTERNS = [
+    r'^what is\b', r'^what are\b', r'^define\b', r'\bmeaning of\b', r'\bconvert\b',
+    r'\bexact value\b', r'\bin radians\b', r'\bin degrees\b', r'\bformula for\b'
+]
+_COMPLEX_RE = re.compile('|'.join(_COMPLEX_PATTERNS), re.IGNORECASE)
+_SIMPLE_RE = re.compile('|'.join(_SIMPLE_PATTERNS), re.IGNORECASE)
+
+# Topics whose questions are rarely one-liners
+_DEMANDING_TOPICS = {"trigonometric_identities", "advanced_trigonometry"}
+
+SHORT_QUESTION_WORDS = int(os.getenv("MODEL_ROUTER_SHORT_WORDS", "14"))
+LONG_QUESTION_WORDS = int(os.getenv("MODEL_ROUTER_LONG_WORDS", "45"))
+
+
+def load_tiers() -> Dict[str, Dict[str, Any]]:
+    """Tier settings from the environment, falling back to the defaults above"""
+    tiers = {}
+    for name, defaults in _TIER_DEFAULTS.items():
+        prefix = f"MODEL_TIER_{name.upper()}"
+        tiers[name] = {
+            "name": name,
+            "model": os.getenv(prefix, defaults["model"]),
+            "max_tokens": int(os.getenv(f"{prefix}_MAX_TOKENS", defaults["max_tokens"])),
+            "temperature": float(os.getenv(f"{prefix}_TEMPERATURE", defaults["temperature"])),
+        }
+    return tiers
+
+
+class ModelRouter:
+    """Pick a model tier per request and keep per-tier latency/token counters"""
+
+    def __init__(self, tiers: Optional[Dict[str, Dict[str, Any]]] = None,
+                 intent_analyzer: Optional[Callable[[str], Dict[str, Any]]] = None):
+        self.tiers = tiers or load_tiers()
+        self.intent_analyzer = intent_analyzer
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def set_intent_analyzer(self, intent_analyzer: Optional[Callable[[str], Dict[str, Any]]]):
+        """Use the local solver's question intent analysis as an extra signal"""
+        self.intent_analyzer = intent_analyzer
+
+    def classify(self, endpoint: str, question: str = "", topic_id: Optional[str] = None) -> Dict[str, Any]:
+        """Return {'tier': name, 'reasons': [...]} for a request"""
+        if endpoint in _ENDPOINT_TIERS:
+            return {"tier": _ENDPOINT_TIERS[endpoint], "reasons": [f"endpoint:{endpoint}"]}
+
+        text = (question or "").strip()
+        words = len(text.split())
+        reasons: List[str] = []
+        score = 0
+
+        if _COMPLEX_RE.search(text):
+            score += 2
+            reasons.append("complex_keywords")
+        if words >= LONG_QUESTION_WORDS:
+            score += 2
+            reasons.append("long_question")
+        if topic_id in _DEMANDING_TOPICS:
+            score += 1
+            reasons.append(f"topic:{topic_id}")
+
+        if self.intent_analyzer is not None:
+            try:
+                intent = self.intent_analyzer(text) or {}
+            except Exception as e:
+                print(f"⚠️ Intent analysis failed during routing: {e}")
+                intent = {}
+            if intent.get("type") == "proof":
+                score += 2
+                reasons.append("intent:proof")
+            elif intent.get("type") == "graph":
+                score += 1
+                reasons.append("intent:graph")
+            if len(intent.get("functions", [])) >= 2:
+                score += 1
+                reasons.append("intent:several_functions")
+
+        if score >= 2:
+            tier = "advanced"
+        elif score == 0 and words <= SHORT_QUESTION_WORDS and _SIMPLE_RE.search(text):
+            tier = "fast"
+            reasons.append("short_simple_question")
+        else:
+            tier = "standard"
+
+        return {"tier": tier, "reasons": reasons}
+
+    def route(self, endpoint: str, question: str = "", topic_id: Optional[str] = None) -> Dict[str, Any]:
+        """Tier settings (name, model, max_tokens, temperature) to use for a request"""
+        tier_name = self.classify(endpoint, question, topic_id)["tier"]
+        return self.tiers.get(tier_name, self.tiers["standard"])
+
+    def record(self, tier: Dict[str, Any], latency: float, prompt_tokens: int,
+               completion_tokens: int, truncated: bool = False):
+        """Record one completed call made on a tier"""
+        with self._lock:
+            stats = self._stats.setdefault(tier["name"], {
+                "model": tier["model"],
+                "max_tokens": tier["max_tokens"],
+                "calls": 0,
+                "truncated_calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "max_tokens_saved": 0,
+                "upgraded_calls": 0,    # Calls on a different (larger) model than BASELINE_MODEL
+                "latency_total": 0.0
+            })
+            stats["calls"] += 1
+            stats["prompt_tokens"] += int(prompt_tokens)
+            stats["completion_tokens"] += int(completion_tokens)
+            stats["max_tokens_saved"] += max(BASELINE_MAX_TOKENS - tier["max_tokens"], 0)
+            stats["upgraded_calls"] += int(tier["model"] != BASELINE_MODEL)
+            stats["latency_total"] += latency
+            if truncated:
+                stats["truncated_calls"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tiers = {name: dict(stats) for name, stats in self._stats.items()}
+
+        for stats in tiers.values():
+            stats["avg_latency_ms"] = round(stats.pop("latency_total") / stats["calls"] * 1000, 1)
+            stats["avg_completion_tokens"] = round(stats["completion_tokens"] / stats["calls"], 1)
+
+        return {
+            "tiers": tiers,
+            "configured": self.tiers,
+            "total_max_tokens_saved": sum(s["max_tokens_saved"] for s in tiers.values()),
+            "total_upgraded_calls": sum(s["upgraded_calls"] for s in tiers.values())
+        }
@@ -1,20 +1,36 @@
-import json
 import joblib
 import os
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
 import re
+import time
+from lexical_index import LexicalIndex
+from ann_index import IVFIndex, ANN_MIN_QUESTIONS
+from embedding_cache import EmbeddingCache, LazyEncoder, diff_questions, load_previous_artifact
+from encoding_pipeline import EncodingPipeline
+from dataset_loader import DATASET_SOURCE, DatasetFormatError, iter_items
+from dedup import DEDUP_QUESTIONS, dedup_questions, expand_aliases
+from model_registry import publish_artifact
+from columnar_store import COLUMNS, ColumnarStore
 
-DATASET_PATH = os.path.join(os.path.dirname(__file__), "trig_dataset.json")
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "true_ai_tutor.pkl")
 LESSON_MODEL_PATH = os.path.join(os.path.dirname(__file__), "lesson_generator.pkl")
 
+# Similarity threshold learning
+THRESHOLD_PERCENTILE = 80
+THRESHOLD_SAMPLE_PER_CATEGORY = int(os.getenv("THRESHOLD_SAMPLE_PER_CATEGORY", "2000"))
+THRESHOLD_PARTNERS = int(os.getenv("THRESHOLD_PARTNERS", "64"))
+THRESHOLD_BLOCK_SIZE = 256
+THRESHOLD_MIN_CATEGORY_SIZE = 5
+
 class LessonGenerator:
     """Dedicated model for lesson generation and teaching"""
     
-    def __init__(self):
+    def __init__(self, encoding_pipeline=None, embedding_cache=None):
         self.dataset = None
+        # Shared with TrueAITutor so the model loads once
+        self.encoding_pipeline = encoding_pipeline or EncodingPipeline()
+        self.encoder = self.encoding_pipeline.encoder
+        self.embedding_cache = embedding_cache or EmbeddingCache()
         self.semantic_model = None
         self.lesson_embeddings = None
         self.lesson_topics = []
@@ -25,14 +41,16 @@ class LessonGenerator:
         self.lesson_metadata = []
         
     def load_dataset(self):
-        """Load the trigonometric dataset"""
+        """Load the lessons section of the dataset (streamed and validated)"""
         try:
-            with open(DATASET_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data
+            lessons = [lesson for _, lesson in iter_items(DATASET_SOURCE, sections=("lessons",))]
         except FileNotFoundError:
             print("❌ trig_dataset.json not found")
             return {}
+        except DatasetFormatError as e:
+            print(f"❌ trig_dataset.json is malformed: {e}")
+            return {}
+        return {"lessons": lessons} if lessons else {}
     
     def extract_lessons_from_dataset(self):
         """Extract lessons data from the main dataset"""
@@ -216,7 +234,7 @@ class LessonGenerator:
         
         # Create embeddings
         if all_content:
-            self.lesson_embeddings = self.semantic_model.encode(all_content)
+            self.lesson_embeddings = self.embedding_cache.encode(all_content, self.encoding_pipeline)
             print(f"   ✅ Created embeddings for {len(all_content)} lesson items")
         else:
             print("   ⚠️  No content available for embeddings")
@@ -244,11 +262,9 @@ class LessonGenerator:
         print(f"   📝 Found {len(self.worked_examples)} worked examples")
         print(f"   🏋️ Found {len(self.practice_exercises)} practice exercises")
         
-        # Load semantic model
-        self.semantic_model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # Create embeddings
+        # Create embeddings (only new or edited lesson text is encoded)
         self.create_lesson_embeddings()
+        self.semantic_model = self.encoder.model
         
         # Save lesson model
         model_data = {
@@ -275,7 +291,6 @@ class LessonGenerator:
 
 class TrueAITutor:
     def __init__(self):
-        self.dataset = self.load_dataset()
         self.semantic_model = None
         self.vectorizer = None
         self.question_embeddings = None
@@ -289,17 +304,18 @@ class TrueAITutor:
         
         # AI Learning Components
         self.similarity_threshold = 0.0
+        self.category_thresholds = {}
         self.question_patterns = {}
-    
-    def load_dataset(self):
-        """Load the trigonometric dataset"""
-        try:
-            with open(DATASET_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data
-        except FileNotFoundError:
-            print("❌ trig_dataset.json not found")
-            return {}
+        self.lexical_index = None
+        self.ann_index = None
+        self.question_aliases = {}
+        self.question_id_map = {}
+        
+        # Incremental training: embeddings keyed by content hash, model loaded only if needed
+        self.previous_artifact = None
+        self.encoder = LazyEncoder()
+        self.encoding_pipeline = EncodingPipeline(self.encoder)
+        self.embedding_cache = EmbeddingCache()
     
     def extract_training_data(self):
         """Extract questions, solutions, AND graph data - FIXED VERSION"""
@@ -313,79 +329,131 @@ class TrueAITutor:
         
         print("   🔍 Extracting questions and graph data...")
         
-        for category_name, items in self.dataset.items():
-            if category_name != "metadata" and category_name != "lessons" and isinstance(items, list):
-                print(f"      Processing category: {category_name} ({len(items)} items)")
+        # Entries are streamed one at a time from the top-level question lists
+        current_category = None
+        for path, item in iter_items(DATASET_SOURCE):
+            if len(path) == 2 and path[0] not in ("metadata", "lessons"):
+                category_name = path[0]
+                if category_name != current_category:
+                    print(f"      Processing category: {category_name}")
+                    current_category = category_name
                 
-                for item in items:
-                    if isinstance(item, dict) and "question" in item:
-                        questions.append(item["question"])
-                        categories.append(category_name)
-                        question_ids.append(item.get("id", "unknown"))
-                        
-                        # Extract final_answer if available
-                        final_answer = item.get("final_answer", "")
-                        final_answers.append(final_answer)
-                        
-                        # Main solution
-                        if "step_by_step_solution" in item:
-                            main_sol = item["step_by_step_solution"]
-                        elif "solution" in item:
-                            main_sol = [item["solution"]] if isinstance(item["solution"], str) else item["solution"]
-                        else:
-                            main_sol = ["Solution not available"]
-                        solutions.append(main_sol)
-                        
-                        # Alternative solution
-                        alt_sol = []
-                        for field in ["alternative_solution", "alternative_method", "method_2"]:
-                            if field in item:
-                                if isinstance(item[field], str):
-                                    alt_sol = [item[field]]
-                                else:
-                                    alt_sol = item[field]
-                                break
-                        alternative_solutions.append(alt_sol)
-                        
-                        # Extract plotting data
-                        plot_info = {}
-                        
-                        if "plotting_instructions" in item and item["plotting_instructions"]:
-                            plot_info = item["plotting_instructions"]
-                            print(f"        📈 Found plotting_instructions for: {item.get('id', 'unknown')}")
-                        
-                        if "matplotlib_code" in item and item["matplotlib_code"]:
-                            plot_info["matplotlib_code"] = item["matplotlib_code"]
-                            print(f"        📊 Found matplotlib_code for: {item.get('id', 'unknown')}")
-                        
-                        question_lower = item["question"].lower()
-                        if any(keyword in question_lower for keyword in ['sketch', 'graph', 'plot', 'draw']):
-                            if not plot_info:
-                                plot_info = {"needs_graph": True, "question_type": "graph"}
-                        
-                        plotting_data.append(plot_info)
-        
+                if isinstance(item, dict) and "question" in item:
+                    questions.append(item["question"])
+                    categories.append(category_name)
+                    question_ids.append(item.get("id", "unknown"))
+                    
+                    # Extract final_answer if available
+                    final_answer = item.get("final_answer", "")
+                    final_answers.append(final_answer)
+                    
+                    # Main solution
+                    if "step_by_step_solution" in item:
+                        main_sol = item["step_by_step_solution"]
+                    elif "solution" in item:
+                        main_sol = [item["solution"]] if isinstance(item["solution"], str) else item["solution"]
+                    else:
+                        main_sol = ["Solution not available"]
+                    solutions.append(main_sol)
+                    
+                    # Alternative solution
+                    alt_sol = []
+                    for field in ["alternative_solution", "alternative_method", "method_2"]:
+                        if field in item:
+                            if isinstance(item[field], str):
+                                alt_sol = [item[field]]
+                            else:
+                                alt_sol = item[field]
+                            break
+                    alternative_solutions.append(alt_sol)
+                    
+                    # Extract plotting data
+                    plot_info = {}
+                    
+                    if "plotting_instructions" in item and item["plotting_instructions"]:
+                        plot_info = item["plotting_instructions"]
+                        print(f"        📈 Found plotting_instructions for: {item.get('id', 'unknown')}")
+                    
+                    if "matplotlib_code" in item and item["matplotlib_code"]:
+                        plot_info["matplotlib_code"] = item["matplotlib_code"]
+                        print(f"        📊 Found matplotlib_code for: {item.get('id', 'unknown')}")
+                    
+                    question_lower = item["question"].lower()
+                    if any(keyword in question_lower for keyword in ['sketch', 'graph', 'plot', 'draw']):
+                        if not plot_info:
+                            plot_info = {"needs_graph": True, "question_type": "graph"}
+                    
+                    plotting_data.append(plot_info)
+    
         return questions, solutions, alternative_solutions, final_answers, categories, question_ids, plotting_data
     
+    def _dedup_questions(self):
+        """Fold near-duplicate questions into canonical rows, keeping their ids as aliases"""
+        print("   🧬 Finding near-duplicate questions...")
+        start = time.time()
+        result = dedup_questions(self.questions, self.question_ids, self.categories, self.solutions,
+                                 self.alternative_solutions, self.final_answers, self.plotting_data,
+                                 self.question_embeddings)
+        keep = result['keep']
+        removed = len(self.questions) - len(keep)
+        
+        self.questions = [self.questions[i] for i in keep]
+        self.solutions = [self.solutions[i] for i in keep]
+        self.alternative_solutions = [self.alternative_solutions[i] for i in keep]
+        self.final_answers = [self.final_answers[i] for i in keep]
+        self.categories = [self.categories[i] for i in keep]
+        self.question_ids = [self.question_ids[i] for i in keep]
+        self.plotting_data = [self.plotting_data[i] for i in keep]
+        self.question_embeddings = self.question_embeddings[keep]
+        self.question_aliases = result['aliases']
+        self.question_id_map = result['id_map']
+        
+        print(f"   ✅ Dedup: {removed} duplicates folded into {result['clusters']} canonical questions, "
+              f"{len(self.questions)} rows remain ({time.time() - start:.2f}s)")
+        for row, aliases in list(self.question_aliases.items())[:5]:
+            print(f"      {self.question_ids[row]} <- {', '.join(str(alias['id']) for alias in aliases)}")
+    
     def _learn_semantic_relationships(self):
-        """AI learns how questions relate to each other semantically"""
+        """AI learns how questions relate to each other semantically, per category"""
         print("   🔍 Learning semantic relationships...")
+        start = time.time()
         
-        sample_similarities = []
-        for i in range(min(100, len(self.questions))):
-            for j in range(i+1, min(i+20, len(self.questions))):
-                sim = cosine_similarity(
-                    [self.question_embeddings[i]], 
-                    [self.question_embeddings[j]]
-                )[0][0]
-                sample_similarities.append(sim)
-        
-        if sample_similarities:
-            self.similarity_threshold = np.percentile(sample_similarities, 80)
+        embeddings = np.asarray(self.question_embeddings, dtype=np.float32)
+        embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        categories = np.asarray(self.categories)
+        rng = np.random.default_rng(0)
+        
+        category_similarities = {}
+        for category in dict.fromkeys(self.categories):
+            rows = np.flatnonzero(categories == category)
+            if len(rows) < THRESHOLD_MIN_CATEGORY_SIZE:
+                continue
+            # Stratified sample: up to THRESHOLD_SAMPLE_PER_CATEGORY questions, each against a fixed number of partners
+            sample = rng.choice(rows, min(len(rows), THRESHOLD_SAMPLE_PER_CATEGORY), replace=False)
+            partners = rng.choice(rows, (len(sample), min(len(rows) - 1, THRESHOLD_PARTNERS)))
+            similarities = []
+            for block in range(0, len(sample), THRESHOLD_BLOCK_SIZE):
+                block_rows = sample[block:block + THRESHOLD_BLOCK_SIZE]
+                block_partners = partners[block:block + THRESHOLD_BLOCK_SIZE]
+                # Row-wise dot products of each sampled question with its own partners
+                sims = np.einsum('bd,bpd->bp', embeddings[block_rows], embeddings[block_partners])
+                similarities.append(sims[block_partners != block_rows[:, None]])
+            category_similarities[category] = np.concatenate(similarities)
+        
+        if category_similarities:
+            all_similarities = np.concatenate(list(category_similarities.values()))
+            self.similarity_threshold = float(np.percentile(all_similarities, THRESHOLD_PERCENTILE))
         else:
             self.similarity_threshold = 0.7
         
-        print(f"   ✅ Learned optimal similarity threshold: {self.similarity_threshold:.3f}")
+        # Categories too small to sample use the global threshold
+        self.category_thresholds = {category: float(np.percentile(sims, THRESHOLD_PERCENTILE))
+                                    for category, sims in category_similarities.items() if len(sims)}
+        
+        print(f"   ✅ Learned optimal similarity threshold: {self.similarity_threshold:.3f} "
+              f"({time.time() - start:.2f}s)")
+        for category, threshold in self.category_thresholds.items():
+            print(f"      {category}: {threshold:.3f}")
     
     def _ai_analyze_question_intent(self, question):
         """AI analyzes what the question is asking for, including graphs"""
@@ -423,22 +491,40 @@ class TrueAITutor:
         
         return intent
     
+    def _previous_patterns_by_question(self):
+        """Question text -> patterns from the previous artifact, so unchanged questions are not re-analysed"""
+        previous = self.previous_artifact
+        if not previous or 'question_patterns' not in previous:
+            return {}
+        by_index = {}
+        for pattern, indices in previous['question_patterns'].items():
+            for i in indices:
+                by_index.setdefault(i, []).append(pattern)
+        return {question: by_index.get(i, []) for i, question in enumerate(previous.get('questions', []))}
+    
     def _learn_question_categories(self):
         """AI learns patterns in question types - FIXED VERSION"""
         print("   🔍 Learning question patterns...")
         
+        previous_patterns = self._previous_patterns_by_question()
+        self.question_patterns = {}
         pattern_counts = {}
+        reused = 0
         for i, question in enumerate(self.questions):
-            intent = self._ai_analyze_question_intent(question)
+            if question in previous_patterns:
+                patterns = previous_patterns[question]
+                reused += 1
+            else:
+                patterns = self._ai_analyze_question_intent(question)['patterns']
             
-            for pattern in intent['patterns']:
+            for pattern in patterns:
                 if pattern not in self.question_patterns:
                     self.question_patterns[pattern] = []
                     pattern_counts[pattern] = 0
                 self.question_patterns[pattern].append(i)
                 pattern_counts[pattern] += 1
         
-        print(f"   ✅ Learned {len(self.question_patterns)} question patterns")
+        print(f"   ✅ Learned {len(self.question_patterns)} question patterns ({reused} questions reused)")
         top_patterns = sorted(pattern_counts.items(), key=lambda x: x[1], reverse=True)[:5]
         for pattern, count in top_patterns:
             print(f"      {pattern}: {count} questions")
@@ -447,15 +533,38 @@ class TrueAITutor:
         """AI learns to understand questions including graph-related ones"""
         print("🧠 AI LEARNING: Understanding question patterns...")
         
-        print("   📥 Loading semantic model...")
-        self.semantic_model = SentenceTransformer('all-MiniLM-L6-v2')
+        previous = self.previous_artifact
+        if previous:
+            # Compare against the previous dataset as a whole, including questions dedup folded away
+            previous_questions, previous_ids = expand_aliases(previous.get('questions', []),
+                                                              ColumnarStore.from_model_data(previous).column('question_ids'),
+                                                              previous.get('question_aliases'))
+            changes = diff_questions(previous_questions, previous_ids, self.questions, self.question_ids)
+            print(f"   🔀 Since last training: {len(changes['added'])} added, {len(changes['changed'])} edited, "
+                  f"{len(changes['removed'])} removed")
+            seeded = self.embedding_cache.seed(previous.get('questions', []), previous.get('question_embeddings'))
+            if seeded:
+                print(f"   🗃️ Seeded {seeded} embeddings from the previous artifact")
         
         print("   🔄 Creating question embeddings...")
-        self.question_embeddings = self.semantic_model.encode(self.questions)
+        self.question_embeddings = self.embedding_cache.encode(self.questions, self.encoding_pipeline)
+        self.semantic_model = self.encoder.model
+        
+        if DEDUP_QUESTIONS:
+            self._dedup_questions()
         
         self._learn_semantic_relationships()
         self._learn_question_categories()
         
+        print("   🔤 Building lexical index...")
+        self.lexical_index = LexicalIndex.build(self.questions)
+        self.lexical_index.add_aliases(self.question_aliases)
+        
+        if len(self.questions) >= ANN_MIN_QUESTIONS:
+            print(f"   🧭 Building IVF index for {len(self.questions)} questions...")
+            self.ann_index = IVFIndex().train(self.question_embeddings)
+            print(f"   ✅ IVF index: {self.ann_index.nlist} cells, nprobe {self.ann_index.nprobe}")
+        
         print("✅ AI Understanding Training Complete!")
     
     def train(self):
@@ -476,30 +585,54 @@ class TrueAITutor:
         graph_questions = sum(1 for p in self.plotting_data if p and (p.get('matplotlib_code') or p.get('function_type')))
         print(f"📈 Found {graph_questions} questions with graph data")
         
+        start = time.time()
+        self.previous_artifact = load_previous_artifact(MODEL_PATH)
+        if self.previous_artifact and self.previous_artifact.get('semantic_model') is not None:
+            # Reuse the model object from the last run instead of constructing a new one
+            self.encoder = LazyEncoder(model=self.previous_artifact['semantic_model'])
+            self.encoding_pipeline = EncodingPipeline(self.encoder)
+        
         self.train_ai_understanding()
         
         print("\n" + "="*60)
         print("📚 TRAINING LESSON GENERATOR")
-        lesson_generator = LessonGenerator()
+        lesson_generator = LessonGenerator(self.encoding_pipeline, self.embedding_cache)
         lesson_trained = lesson_generator.train()
+        self.embedding_cache.save()
+        self.previous_artifact = None
+        
+        # Answer data is stored columnar: one UTF-8 blob plus offsets, interned categories, a plotting side table
+        store = ColumnarStore.build(self.solutions, self.alternative_solutions, self.final_answers,
+                                    self.categories, self.question_ids, self.plotting_data)
+        report = store.memory_report({name: getattr(self, name) for name in COLUMNS})
+        print(f"📦 Answer data: {report['lists_total_bytes'] / 1024:.0f} KiB as lists -> "
+              f"{report['columnar_bytes'] / 1024:.0f} KiB columnar ({report['ratio']}x smaller)")
         
         model_data = {
             'questions': self.questions,
-            'solutions': self.solutions,
-            'alternative_solutions': self.alternative_solutions,
-            'final_answers': self.final_answers,
-            'categories': self.categories,
-            'question_ids': self.question_ids,
-            'plotting_data': self.plotting_data,
+            'columnar_store': store.to_dict(),
             'semantic_model': self.semantic_model,
             'question_embeddings': self.question_embeddings,
             'similarity_threshold': self.similarity_threshold,
+            'category_thresholds': self.category_thresholds,
             'question_patterns': self.question_patterns,
+            'question_aliases': self.question_aliases,
+            'question_id_map': self.question_id_map,
+            'lexical_index': self.lexical_index.to_dict(),
+            'ann_index': self.ann_index.to_dict() if self.ann_index is not None else None,
             'has_lesson_model': lesson_trained
         }
         
         joblib.dump(model_data, MODEL_PATH)
         print(f"💾 True AI Tutor saved at {MODEL_PATH}")
+        version = publish_artifact(MODEL_PATH)
+        print(f"🏷️ Published model version {version} (running services pick it up on reload)")
+        cache_stats = self.embedding_cache.get_stats()
+        print(f"⏱️ Training took {time.time() - start:.1f}s: {cache_stats['misses']} items encoded "
+              f"in {cache_stats['encode_seconds']}s, {cache_stats['hits']} from cache")
+        encode_stats = self.encoding_pipeline.get_stats()
+        if encode_stats['sentences']:
+            print(f"⚡ Encoding throughput: {encode_stats['sentences_per_second']} sentences/s")
         print("🎉 AI can now understand questions AND generate graphs!")
         print(f"📊 Graph-ready questions: {graph_questions}")
         print(f"📝 Questions with final_answer: {sum(1 for fa in self.final_answers if fa)}")
@@ -4,6 +4,13 @@ Namibia AS Mathematics Syllabus Context Integration
 Based on NSSCAS Mathematics Syllabus Code: 8227
 Official Syllabus for Implementation in 2021
 """
+import os
+from functools import lru_cache
+
+from token_accounting import compact_prompt, estimate_tokens
+from question_generator import ParametricQuestionGenerator
+
+_question_generator = ParametricQuestionGenerator()
 
 NAMIBIA_AS_MATHEMATICS_SYLLABUS = {
     "syllabus_code": "8227",
@@ -127,80 +134,111 @@ NAMIBIA_AS_MATHEMATICS_SYLLABUS = {
     }
 }
 
-def get_syllabus_context(topic_id):
-    """Get Namibia-specific syllabus context for curriculum alignment"""
-    
-    topic_info = NAMIBIA_AS_MATHEMATICS_SYLLABUS["trigonometry_topics"].get(topic_id, {})
+# Upper bound on the syllabus block embedded in every lesson, Q&A and assessment prompt
+SYLLABUS_CONTEXT_TOKEN_BUDGET = int(os.getenv("SYLLABUS_CONTEXT_TOKEN_BUDGET", "300"))
+
+def _build_context_sections(topic_id):
+    """Syllabus context split into sections, most important first"""
+    syllabus = NAMIBIA_AS_MATHEMATICS_SYLLABUS
+    topic_info = syllabus["trigonometry_topics"].get(topic_id, {})
     
-    syllabus_context = f"""
-    NAMIBIA NSSCAS MATHEMATICS SYLLABUS CONTEXT
-    Syllabus Code: 8227 - Advanced Subsidiary Level
-    Examination Board: Namibia Ministry of Education, Arts and Culture
+    sections = [
+        f"""NAMIBIA NSSCAS MATHEMATICS SYLLABUS CONTEXT
+        Syllabus Code: 8227 - Advanced Subsidiary Level
+        Examination Board: Namibia Ministry of Education, Arts and Culture"""
+    ]
     
-    CURRICULUM ALIGNMENT REQUIREMENTS:
-    - Content must align with NSSCAS Mathematics syllabus specific objectives
-    - Assessment style: Structured questions with step-by-step reasoning
-    - Accuracy standards: 3 significant figures, degrees to 1 decimal place
-    - Calculator: Non-programmable scientific calculator permitted
+    if topic_info:
+        sections.append(f"""TOPIC: {topic_id.replace('_', ' ').title()}
+        GENERAL OBJECTIVE: {topic_info.get('general_objective', '')}
+        SPECIFIC LEARNING OBJECTIVES:
+        {chr(10).join(['• ' + obj.strip() for obj in topic_info.get('specific_objectives', [])])}""")
     
-    """
+    sections.append("""CURRICULUM ALIGNMENT REQUIREMENTS:
+        - Content must align with NSSCAS Mathematics syllabus specific objectives
+        - Assessment style: Structured questions with step-by-step reasoning
+        - Accuracy standards: 3 significant figures, degrees to 1 decimal place
+        - Calculator: Non-programmable scientific calculator permitted""")
     
     if topic_info:
-        syllabus_context += f"""
-    TOPIC: {topic_id.replace('_', ' ').title()}
-    GENERAL OBJECTIVE: {topic_info.get('general_objective', '')}
+        sections.append(f"""ASSESSMENT REQUIREMENTS:
+        {chr(10).join(['• ' + req for req in topic_info.get('assessment_requirements', [])])}""")
+        
+        sections.append(f"""GRADE EXPECTATIONS:
+        A Grade: {syllabus['grade_descriptors']['grade_a']}
+        C Grade: {syllabus['grade_descriptors']['grade_c']}
+        E Grade: {syllabus['grade_descriptors']['grade_e']}""")
     
-    SPECIFIC LEARNING OBJECTIVES:
-    {chr(10).join(['• ' + obj for obj in topic_info.get('specific_objectives', [])])}
+    return [compact_prompt(section) for section in sections]
+
+# Built once at import; prompts only pick and join the sections that fit the budget
+_SYLLABUS_CONTEXT_SECTIONS = {
+    topic_id: _build_context_sections(topic_id)
+    for topic_id in list(NAMIBIA_AS_MATHEMATICS_SYLLABUS["trigonometry_topics"]) + [""]
+}
+
+@lru_cache(maxsize=64)
+def _assemble_syllabus_context(topic_id, token_budget):
+    sections = _SYLLABUS_CONTEXT_SECTIONS.get(topic_id, _SYLLABUS_CONTEXT_SECTIONS[""])
+    if token_budget is None:
+        return "\n".join(sections)
     
-    ASSESSMENT REQUIREMENTS:
-    {chr(10).join(['• ' + req for req in topic_info.get('assessment_requirements', [])])}
+    # Lower-priority sections are dropped first; the header always stays
+    kept = [sections[0]]
+    used = estimate_tokens(sections[0])
+    for section in sections[1:]:
+        cost = estimate_tokens(section) + 1
+        if used + cost > token_budget:
+            continue
+        kept.append(section)
+        used += cost
+    return "\n".join(kept)
+
+def get_syllabus_context(topic_id, token_budget=SYLLABUS_CONTEXT_TOKEN_BUDGET):
+    """Get Namibia-specific syllabus context for curriculum alignment.
     
-    GRADE EXPECTATIONS:
-    A Grade: {NAMIBIA_AS_MATHEMATICS_SYLLABUS['grade_descriptors']['grade_a']}
-    C Grade: {NAMIBIA_AS_MATHEMATICS_SYLLABUS['grade_descriptors']['grade_c']}
-    E Grade: {NAMIBIA_AS_MATHEMATICS_SYLLABUS['grade_descriptors']['grade_e']}
+    Pass token_budget=None for the full, untrimmed context.
     """
-    
-    return syllabus_context
+    return _assemble_syllabus_context(topic_id, token_budget)
+
+# Focus area of each lesson section; sections past the end cycle back to the start
+TOPIC_FOCUS_AREAS = {
+    "circular_measure": [
+        "Focus on radian definition and conversion between radians and degrees",
+        "Apply arc length and sector area formulae to practical problems",
+        "Solve problems involving segment area and combined figures", 
+        "Contextual applications in Namibian agriculture and construction"
+    ],
+    "trigonometric_graphs": [
+        "Graph sketching of sine, cosine, tangent functions using both degrees and radians",
+        "Determining amplitude, period and transformations of trigonometric graphs",
+        "Using exact values for 30°, 45°, 60° and related angles",
+        "Inverse trigonometric functions and their graphs"
+    ],
+    "trigonometric_identities": [
+        "Proving basic trigonometric identities step by step",
+        "Using identities to simplify trigonometric expressions", 
+        "Applying Pythagorean identities and ratio identities",
+        "Identity proofs with logical reasoning and steps"
+    ],
+    "trigonometric_equations": [
+        "Solving basic trigonometric equations within specified intervals",
+        "Finding general solutions and specific solutions in given ranges",
+        "Equations reducible to quadratic form in trigonometry",
+        "Application problems involving trigonometric equations"
+    ],
+    "advanced_trigonometry": [
+        "Secant, cosecant, cotangent functions and their graphs",
+        "Compound angle formulae and their applications",
+        "Double angle formulae and identity proofs",
+        "R-form expressions: a sinθ ± b cosθ and their applications"
+    ]
+}
 
 def get_topic_specific_prompt(topic_id, section_index):
     """Get topic-specific prompts based on Namibia syllabus"""
     
-    topic_prompts = {
-        "circular_measure": [
-            "Focus on radian definition and conversion between radians and degrees",
-            "Apply arc length and sector area formulae to practical problems",
-            "Solve problems involving segment area and combined figures", 
-            "Contextual applications in Namibian agriculture and construction"
-        ],
-        "trigonometric_graphs": [
-            "Graph sketching of sine, cosine, tangent functions using both degrees and radians",
-            "Determining amplitude, period and transformations of trigonometric graphs",
-            "Using exact values for 30°, 45°, 60° and related angles",
-            "Inverse trigonometric functions and their graphs"
-        ],
-        "trigonometric_identities": [
-            "Proving basic trigonometric identities step by step",
-            "Using identities to simplify trigonometric expressions", 
-            "Applying Pythagorean identities and ratio identities",
-            "Identity proofs with logical reasoning and steps"
-        ],
-        "trigonometric_equations": [
-            "Solving basic trigonometric equations within specified intervals",
-            "Finding general solutions and specific solutions in given ranges",
-            "Equations reducible to quadratic form in trigonometry",
-            "Application problems involving trigonometric equations"
-        ],
-        "advanced_trigonometry": [
-            "Secant, cosecant, cotangent functions and their graphs",
-            "Compound angle formulae and their applications",
-            "Double angle formulae and identity proofs",
-            "R-form expressions: a sinθ ± b cosθ and their applications"
-        ]
-    }
-    
-    prompts = topic_prompts.get(topic_id, ["Apply mathematical concepts to solve problems"])
+    prompts = TOPIC_FOCUS_AREAS.get(topic_id, ["Apply mathematical concepts to solve problems"])
     current_prompt = prompts[section_index % len(prompts)]
     
     return f"Focus Area: {current_prompt}"
@@ -236,6 +274,12 @@ def generate_namibia_style_question(topic_id, difficulty="medium"):
         ]
     }
     
+    # Prefer a fresh verified variant where a parametric template covers the topic
+    if _question_generator.supports(topic_id):
+        variants = _question_generator.generate(topic_id, 1, difficulty=difficulty if difficulty in ("easy", "medium", "hard") else None)
+        if variants:
+            return variants[0]["question"]
+    
     questions = question_templates.get(topic_id, [])
     if questions:
         return questions[difficulty == "hard" if len(questions) > 1 else 0]
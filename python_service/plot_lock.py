@@ -0,0 +1,22 @@
+# plot_lock.py
+"""
+Serialises matplotlib drawing across request threads.
+
+pyplot keeps a single global "current figure", so two threads drawing at once
+end up plotting into each other's figure. Every function that draws with
+pyplot (TrigSolver, the template engine and trig_graphs) runs under this lock.
+Everything else in a solve runs concurrently.
+"""
+import functools
+import threading
+
+PLOT_LOCK = threading.RLock()    # Re-entrant: graph helpers call each other
+
+
+def serialised_plotting(func):
+    """Run func while holding PLOT_LOCK"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with PLOT_LOCK:
+            return func(*args, **kwargs)
+    return wrapper
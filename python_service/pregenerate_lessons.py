@@ -0,0 +1,149 @@
+# pregenerate_lessons.py
+"""
+Offline batch generation of lesson sections.
+
+Lesson content only depends on (topic, section, student level) and the
+syllabus prompt, so it is generated once ahead of time instead of on every
+/lessons/start-topic or /lessons/section request:
+
+    python pregenerate_lessons.py --workers 4 --rpm 25
+    python pregenerate_lessons.py --topics trigonometric_equations --levels beginner --force
+
+Runs are resumable: a section whose stored prompt hash matches the current
+prompt is skipped, so re-running after a crash or a rate limit only fills the
+gaps. Only content that passes validate_lesson_content() is written.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ai_service import AIService
+from lesson_store import LESSON_STORE_PATH, LessonContentStore, validate_lesson_content
+from unified_backend import TOPICS
+
+STUDENT_LEVELS = ["beginner", "intermediate", "advanced"]
+
+
+class RequestRateLimiter:
+    """Token bucket shared by all workers, also honouring Retry-After from the API"""
+
+    def __init__(self, requests_per_minute: float, ai_service: AIService):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self.ai_service = ai_service
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot, self.ai_service.rate_limited_until)
+            self._next_slot = slot + self.interval
+        delay = slot - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def build_work_list(topic_ids, levels):
+    """Every (topic, section, level) combination to generate"""
+    work = []
+    for topic in TOPICS:
+        if topic_ids and topic["id"] not in topic_ids:
+            continue
+        for section_index in range(topic.get("total_sections", 4)):
+            for level in levels:
+                work.append((topic["id"], section_index, level))
+    return work
+
+
+def generate_one(ai_service, limiter, topic_id, section_index, level, retries):
+    """Generate one section, retrying with exponential backoff until it validates"""
+    problems = []
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(min(2 ** attempt, 30))
+        limiter.wait()
+        content = ai_service.generate_lesson_content(topic_id, section_index, level)
+        problems = validate_lesson_content(content)
+        if not problems:
+            return content, []
+        print(f"   ⚠️ {topic_id}[{section_index}] {level} attempt {attempt + 1}: {', '.join(problems)}")
+    return None, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate lesson sections into the lesson store")
+    parser.add_argument("--topics", default="", help="comma-separated topic ids (default: all)")
+    parser.add_argument("--levels", default=",".join(STUDENT_LEVELS))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=25.0, help="maximum API requests per minute")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--force", action="store_true", help="regenerate sections that are already current")
+    parser.add_argument("--dry-run", action="store_true", help="only list what would be generated")
+    parser.add_argument("--store", default=LESSON_STORE_PATH)
+    args = parser.parse_args()
+
+    topic_ids = {t.strip() for t in args.topics.split(",") if t.strip()}
+    levels = [level.strip() for level in args.levels.split(",") if level.strip()]
+
+    ai_service = AIService()
+    store = LessonContentStore(args.store)
+
+    pending = []
+    for topic_id, section_index, level in build_work_list(topic_ids, levels):
+        prompt_hash = ai_service.lesson_prompt_hash(topic_id, section_index, level)
+        entry = store.get_entry(topic_id, section_index, level)
+        if entry and entry.get("prompt_hash") == prompt_hash and not args.force:
+            continue
+        pending.append((topic_id, section_index, level, prompt_hash))
+
+    print(f"📚 {len(pending)} lesson sections to generate ({len(store)} already stored in {args.store})")
+    if args.dry_run:
+        for topic_id, section_index, level, _ in pending:
+            print(f"   • {topic_id} section {section_index} ({level})")
+        return
+    if not pending:
+        return
+    if not ai_service.api_key:
+        print("❌ GROQ_API_KEY is not set, nothing can be generated")
+        return
+
+    lesson_model = ai_service.model_router.route("lesson")["model"]
+    run_version = store.begin_run()
+    limiter = RequestRateLimiter(args.rpm, ai_service)
+    generated, failed = 0, []
+    started = time.time()
+
+    with ThreadPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+        futures = {
+            pool.submit(generate_one, ai_service, limiter, topic_id, section_index, level, args.retries):
+                (topic_id, section_index, level, prompt_hash)
+            for topic_id, section_index, level, prompt_hash in pending
+        }
+        for future in as_completed(futures):
+            topic_id, section_index, level, prompt_hash = futures[future]
+            try:
+                content, problems = future.result()
+            except Exception as e:
+                content, problems = None, [str(e)]
+
+            if content is None:
+                failed.append((topic_id, section_index, level, problems))
+                print(f"❌ {topic_id} section {section_index} ({level}) failed")
+                continue
+
+            # Save after every section so an interrupted run keeps its progress
+            store.put(topic_id, section_index, level, prompt_hash, content, lesson_model)
+            store.save()
+            generated += 1
+            print(f"✅ {topic_id} section {section_index} ({level}) [{generated}/{len(pending)}]")
+
+    print(f"\n📦 Store version {run_version}: {generated} generated, {len(failed)} failed "
+          f"in {time.time() - started:.1f}s")
+    for topic_id, section_index, level, problems in failed:
+        print(f"   • {topic_id} section {section_index} ({level}): {', '.join(problems)}")
+    print(f"   Token usage: {ai_service.get_token_usage()['endpoints'].get('lesson', {})}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+# question_generator.py
+"""
+Parametric question generator.
+
+Each syllabus template samples its parameters with NumPy, computes the exact
+answer and the working, and verifies every variant numerically before it is
+returned, so worksheets and assessments can be filled with fresh questions
+without a Groq call. Parameters are sampled and answers computed as whole
+arrays, which keeps batch generation in the thousands of variants per second.
+
+    python question_generator.py --count 5000 --benchmark
+"""
+import argparse
+import hashlib
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from answer_checker import check_answer
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+_CIRCLE_CONTEXTS = [
+    "A centre-pivot irrigation field near Hardap Dam",
+    "A circular kraal on a farm near Gobabis",
+    "A circular water reservoir in Windhoek",
+    "A traffic circle in Swakopmund",
+    "A circular solar panel installation in Keetmanshoop",
+]
+
+# Right-hand sides with exact reference angles, then ones that need a calculator
+_EXACT_K = [(0.5, "1/2"), (-0.5, "-1/2"), (math.sqrt(2) / 2, "√2/2"), (-math.sqrt(2) / 2, "-√2/2"),
+            (math.sqrt(3) / 2, "√3/2"), (-math.sqrt(3) / 2, "-√3/2")]
+_DECIMAL_K = [0.2, 0.3, 0.4, 0.6, 0.7, 0.8, 0.9, -0.2, -0.3, -0.4, -0.6, -0.7, -0.8]
+
+
+def _sig3(value: float) -> str:
+    """Round to 3 significant figures, the NSSCAS accuracy rule"""
+    return f"{float(f'{value:.3g}'):g}"
+
+
+def _surd(n: int) -> str:
+    """√n in simplest form, e.g. 45 -> 3√5"""
+    root = math.isqrt(n)
+    if root * root == n:
+        return str(root)
+    outside = 1
+    for factor in range(int(math.isqrt(n)), 1, -1):
+        if n % (factor * factor) == 0:
+            outside = factor
+            break
+    inside = n // (outside * outside)
+    return f"{outside}√{inside}" if outside > 1 else f"√{inside}"
+
+
+def _variant_id(template: str, params: Tuple) -> str:
+    digest = hashlib.sha1(repr((template, params)).encode()).hexdigest()[:10]
+    return f"PG_{template}_{digest}"
+
+
+def _item(template: str, topic_id: str, params: Tuple, question: str, answer: str,
+          steps: List[str], difficulty: str, concepts: List[str], marks: int) -> Dict[str, Any]:
+    """Question in the same shape as the assessment bank items"""
+    return {
+        "question_id": _variant_id(template, params),
+        "question": question,
+        "options": [],
+        "correct_answer": answer,
+        "solution_steps": steps,
+        "explanation": "Generated from a verified parametric template",
+        "topic_id": topic_id,
+        "difficulty": difficulty,
+        "concepts": concepts,
+        "marks": marks,
+        "source": "parametric",
+        "template": template,
+        "verified": True,
+    }
+
+
+# ---------- Templates: each returns (items, verified mask) for n sampled variants ----------
+
+def _arc_sector(rng: np.random.Generator, n: int, difficulty: str):
+    radius = rng.integers(3, 61, n)
+    radians = rng.integers(2, 31, n) / 10.0    # one decimal place
+    # Harder variants give the angle in degrees, adding a conversion step
+    in_degrees = rng.random(n) < {"easy": 0.0, "medium": 0.5, "hard": 0.8}[difficulty]
+    degrees = np.where(in_degrees, rng.integers(15, 346, n), 0)
+    theta = np.where(in_degrees, degrees * np.pi / 180.0, radians)
+
+    arc = radius * theta
+    area = 0.5 * radius ** 2 * theta
+    # Reference values by another route, from the angle as the question states it:
+    # the sector's share of the circumference and of the whole circle's area
+    share = np.where(in_degrees, degrees / 360.0, radians / (2 * np.pi))
+    reference_arc = 2 * np.pi * radius * share
+    reference_area = np.pi * radius ** 2 * share
+    verified = np.zeros(n, dtype=bool)
+    contexts = rng.integers(0, len(_CIRCLE_CONTEXTS), n)
+
+    items = []
+    for i in range(n):
+        r, t = int(radius[i]), float(theta[i])
+        if in_degrees[i]:
+            angle_text = f"{int(degrees[i])}°"
+            steps = [f"Step 1: Convert to radians: θ = {int(degrees[i])} × π/180 = {_sig3(t)} rad"]
+        else:
+            angle_text = f"{t:g} radians"
+            steps = [f"Step 1: θ = {t:g} rad is already in radians"]
+        steps += [
+            f"Step 2: Arc length s = rθ = {r} × {_sig3(t)} = {_sig3(arc[i])} m",
+            f"Step 3: Sector area A = ½r²θ = ½ × {r}² × {_sig3(t)} = {_sig3(area[i])} m²",
+        ]
+        question = (f"{_CIRCLE_CONTEXTS[contexts[i]]} has radius {r} m. A sector subtends an angle of "
+                    f"{angle_text} at the centre. Find the arc length and the area of the sector, "
+                    f"giving your answers to 3 significant figures.")
+        answer = f"s = {_sig3(arc[i])} m, A = {_sig3(area[i])} m²"
+        # The rounded answer a student would see must still mark correct against the reference
+        verified[i] = check_answer(answer, f"s = {float(reference_arc[i])!r} m, A = {float(reference_area[i])!r} m²")["correct"] is True
+        items.append(_item("arc_sector", "circular_measure", (r, round(t, 6), bool(in_degrees[i]), int(contexts[i])),
+                           question, answer, steps,
+                           difficulty, ["arc_length", "sector_area", "radian_measure"],
+                           4 if in_degrees[i] else 3))
+    return items, verified
+
+
+def _amplitude_period(rng: np.random.Generator, n: int, difficulty: str):
+    amplitude = rng.integers(1, 6, n) * np.where(rng.random(n) < (0.0 if difficulty == "easy" else 0.3), -1, 1)
+    b_choices = np.array([1, 2, 3, 4] if difficulty == "easy" else [1, 2, 3, 4, 0.5], dtype=float)
+    b = b_choices[rng.integers(0, len(b_choices), n)]
+    c = np.zeros(n, dtype=int) if difficulty == "easy" else rng.integers(-3, 4, n)
+    use_cos = rng.random(n) < 0.5
+
+    period = 360.0 / b
+    maximum = c + np.abs(amplitude)
+    minimum = c - np.abs(amplitude)
+
+    # Verify on a dense grid: extremes match and the function repeats after one period
+    grid = np.linspace(0.0, 1.0, 2001)[None, :] * period[:, None]
+    def f(x):
+        angle = np.radians(b[:, None] * x)
+        return amplitude[:, None] * np.where(use_cos[:, None], np.cos(angle), np.sin(angle)) + c[:, None]
+    values = f(grid)
+    verified = (np.isclose(values.max(axis=1), maximum, atol=1e-6)
+                & np.isclose(values.min(axis=1), minimum, atol=1e-6)
+                & np.all(np.isclose(f(grid + period[:, None]), values, atol=1e-9), axis=1))
+
+    items = []
+    for i in range(n):
+        func = "cos" if use_cos[i] else "sin"
+        a_text = "-" if amplitude[i] == -1 else ("" if amplitude[i] == 1 else str(int(amplitude[i])))
+        b_text = "" if b[i] == 1 else ("0.5" if b[i] == 0.5 else str(int(b[i])))
+        c_text = "" if c[i] == 0 else f" {'+' if c[i] > 0 else '-'} {abs(int(c[i]))}"
+        expression = f"y = {a_text}{func}({b_text}x){c_text}"
+        steps = [
+            f"Step 1: Compare with y = a{func}(bx) + c: a = {int(amplitude[i])}, b = {b[i]:g}, c = {int(c[i])}",
+            f"Step 2: Amplitude = |a| = {abs(int(amplitude[i]))}",
+            f"Step 3: Period = 360°/b = 360°/{b[i]:g} = {period[i]:g}°",
+            f"Step 4: Maximum = c + |a| = {int(maximum[i])}, minimum = c - |a| = {int(minimum[i])}",
+        ]
+        answer = (f"Amplitude {abs(int(amplitude[i]))}, period {period[i]:g}°, "
+                  f"maximum {int(maximum[i])}, minimum {int(minimum[i])}")
+        items.append(_item("amplitude_period", "trigonometric_graphs",
+                           (int(amplitude[i]), float(b[i]), int(c[i]), func),
+                           f"For {expression}, state the amplitude and the period, and find the maximum "
+                           f"and minimum values of y.", answer, steps, difficulty,
+                           ["amplitude", "period", "graph_transformations"], 4))
+    return items, verified
+
+
+def _sin_nx_equals_k(rng: np.random.Generator, n: int, difficulty: str):
+    multiples = {"easy": [1], "medium": [1, 2], "hard": [2, 3]}[difficulty]
+    nx = np.array(multiples)[rng.integers(0, len(multiples), n)]
+    exact = rng.random(n) < (0.8 if difficulty == "easy" else 0.5)
+    exact_index = rng.integers(0, len(_EXACT_K), n)
+    decimal_index = rng.integers(0, len(_DECIMAL_K), n)
+    k = np.where(exact, np.array([value for value, _ in _EXACT_K])[exact_index],
+                 np.array(_DECIMAL_K)[decimal_index])
+    use_cos = rng.random(n) < (0.0 if difficulty == "easy" else 0.4)
+
+    reference = np.degrees(np.where(use_cos, np.arccos(k), np.arcsin(k)))
+
+    items, verified = [], np.zeros(n, dtype=bool)
+    for i in range(n):
+        m = int(nx[i])
+        if use_cos[i]:
+            base = [reference[i], 360.0 - reference[i]]
+        else:
+            base = [reference[i], 180.0 - reference[i]]
+        # All solutions of the multiple angle in [0°, 360m°], then divide by m
+        angles = sorted({round((value + 360.0 * turn) % (360.0 * m), 9)
+                         for value in base for turn in range(-1, m + 1)})
+        solutions = [angle / m for angle in angles if 0.0 <= angle / m <= 360.0]
+
+        residual = (np.cos if use_cos[i] else np.sin)(np.radians(m * np.array(solutions))) - k[i]
+        # |k| < 1 gives exactly two solutions per cycle, and there are m cycles in 0° to 360°
+        verified[i] = len(solutions) == 2 * m and bool(np.all(np.abs(residual) < 1e-9))
+
+        func = "cos" if use_cos[i] else "sin"
+        k_text = _EXACT_K[exact_index[i]][1] if exact[i] else f"{k[i]:g}"
+        arg = "x" if m == 1 else f"{m}x"
+        rounded = ", ".join(f"{value:.1f}°" for value in solutions)
+        principal = f"{reference[i]:.1f}°"
+        subtrahend = principal if reference[i] >= 0 else f"({principal})"    # 180° - (-11.5°), not 180° - -11.5°
+        steps = [
+            f"Step 1: Let u = {arg}; since 0° ≤ x ≤ 360°, 0° ≤ u ≤ {360 * m}°",
+            f"Step 2: {func} u = {k_text} gives a principal value u = {func}⁻¹({k_text}) = {principal}",
+            f"Step 3: {'cos is symmetric: u = 360° - ' + subtrahend if use_cos[i] else 'Second solution: u = 180° - ' + subtrahend}"
+            f", then add multiples of 360° up to {360 * m}°",
+            f"Step 4: u = {', '.join(f'{angle:.1f}°' for angle in angles if angle / m <= 360.0)}",
+            f"Step 5: x = u/{m}: x = {rounded}" if m > 1 else f"Step 5: x = {rounded}",
+        ]
+        items.append(_item("trig_equation", "trigonometric_equations",
+                           (func, m, round(float(k[i]), 6)),
+                           f"Solve {func} {arg} = {k_text} for 0° ≤ x ≤ 360°, giving your answers to 1 decimal place.",
+                           f"x = {rounded}", steps, difficulty,
+                           ["trigonometric_equations", "multiple_angles" if m > 1 else "principal_values"],
+                           3 + m))
+    return items, verified
+
+
+def _r_form(rng: np.random.Generator, n: int, difficulty: str):
+    a = rng.integers(1, 13, n)
+    b = rng.integers(1, 13, n)
+    if difficulty == "easy":
+        # Pythagorean triples give a whole-number R
+        triples = np.array([(3, 4), (4, 3), (5, 12), (12, 5), (6, 8), (8, 6), (8, 15), (15, 8)])
+        chosen = triples[rng.integers(0, len(triples), n)]
+        a, b = chosen[:, 0], chosen[:, 1]
+    use_cos = rng.random(n) < (0.0 if difficulty == "easy" else 0.5)
+
+    r_squared = a ** 2 + b ** 2
+    r = np.sqrt(r_squared)
+    # a sinθ + b cosθ = R sin(θ + α);  a cosθ + b sinθ = R cos(θ - α)
+    alpha = np.degrees(np.arctan2(b, a))
+
+    theta = np.radians(np.linspace(0.0, 360.0, 73))[None, :]
+    alpha_rad = np.radians(alpha)[:, None]
+    lhs = np.where(use_cos[:, None],
+                   a[:, None] * np.cos(theta) + b[:, None] * np.sin(theta),
+                   a[:, None] * np.sin(theta) + b[:, None] * np.cos(theta))
+    rhs = np.where(use_cos[:, None], r[:, None] * np.cos(theta - alpha_rad), r[:, None] * np.sin(theta + alpha_rad))
+    verified = np.all(np.abs(lhs - rhs) < 1e-9, axis=1) & (alpha > 0) & (alpha < 90)
+
+    items = []
+    for i in range(n):
+        ai, bi = int(a[i]), int(b[i])
+        r_text = _surd(int(r_squared[i]))
+        if use_cos[i]:
+            expression = f"{ai}cosθ + {bi}sinθ"
+            form = "Rcos(θ - α)"
+            expand = "Rcos(θ - α) = Rcosθcosα + Rsinθsinα"
+            result = f"{r_text}cos(θ - {alpha[i]:.2f}°)"
+        else:
+            expression = f"{ai}sinθ + {bi}cosθ"
+            form = "Rsin(θ + α)"
+            expand = "Rsin(θ + α) = Rsinθcosα + Rcosθsinα"
+            result = f"{r_text}sin(θ + {alpha[i]:.2f}°)"
+        steps = [
+            f"Step 1: Expand: {expand}",
+            f"Step 2: Compare coefficients: Rcosα = {ai}, Rsinα = {bi}",
+            f"Step 3: R = √({ai}² + {bi}²) = √{int(r_squared[i])} = {r_text}",
+            f"Step 4: tanα = {bi}/{ai}, so α = {alpha[i]:.2f}°",
+            f"Step 5: {expression} = {result}",
+            f"Step 6: Maximum value = R = {r_text}, minimum value = -{r_text}",
+        ]
+        items.append(_item("r_form", "advanced_trigonometry", (ai, bi, bool(use_cos[i])),
+                           f"Express {expression} in the form {form}, where R > 0 and 0° < α < 90°. "
+                           f"Give α to 2 decimal places and hence state the maximum value of {expression}.",
+                           f"{result}; maximum {r_text}", steps, difficulty,
+                           ["r_form", "compound_angle_formulae"], 6))
+    return items, verified
+
+
+TEMPLATES: Dict[str, Tuple[str, Callable]] = {
+    "arc_sector": ("circular_measure", _arc_sector),
+    "amplitude_period": ("trigonometric_graphs", _amplitude_period),
+    "trig_equation": ("trigonometric_equations", _sin_nx_equals_k),
+    "r_form": ("advanced_trigonometry", _r_form),
+}
+
+
+class ParametricQuestionGenerator:
+    """Samples verified question variants from the syllabus templates"""
+
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = np.random.default_rng(seed)
+        self.stats = {"generated": 0, "rejected": 0}
+        self._lock = threading.Lock()    # NumPy generators are not thread-safe
+
+    def templates_for(self, topic_id: Optional[str]) -> List[str]:
+        return [name for name, (template_topic, _) in TEMPLATES.items()
+                if topic_id is None or template_topic == topic_id]
+
+    def supports(self, topic_id: str) -> bool:
+        return bool(self.templates_for(topic_id))
+
+    def generate(self, topic_id: Optional[str] = None, count: int = 10, template: Optional[str] = None,
+                 difficulty: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Up to count verified, distinct variants for a topic (or one named template)
+
+        Raises ValueError for an unknown difficulty or template, or a template from another topic.
+        """
+        if difficulty is not None and difficulty not in DIFFICULTIES:
+            raise ValueError(f"Unknown difficulty '{difficulty}', expected one of {', '.join(DIFFICULTIES)}")
+        if template:
+            if template not in TEMPLATES:
+                raise ValueError(f"Unknown template '{template}', expected one of {', '.join(sorted(TEMPLATES))}")
+            if topic_id is not None and TEMPLATES[template][0] != topic_id:
+                raise ValueError(f"Template '{template}' belongs to {TEMPLATES[template][0]}, not {topic_id}")
+        names = [template] if template else self.templates_for(topic_id)
+        names = [name for name in names if name in TEMPLATES]
+        if not names or count <= 0:
+            return []
+
+        with self._lock:
+            return self._generate(names, count, difficulty)
+
+    def _generate(self, names: List[str], count: int, difficulty: Optional[str]) -> List[Dict[str, Any]]:
+        results: Dict[str, Dict[str, Any]] = {}
+        for _ in range(5):    # Small templates can repeat parameters; a few rounds fill the batch
+            needed = count - len(results)
+            if needed <= 0:
+                break
+            per_template = int(math.ceil(needed / len(names))) + 1
+            for name in names:
+                level = difficulty or DIFFICULTIES[int(self.rng.integers(0, len(DIFFICULTIES)))]
+                items, verified = TEMPLATES[name][1](self.rng, per_template, level)
+                self.stats["rejected"] += int((~verified).sum())
+                for item, ok in zip(items, verified):
+                    if ok and item["question_id"] not in results:
+                        results[item["question_id"]] = item
+
+        ordered = list(results.values())
+        self.rng.shuffle(ordered)
+        ordered = ordered[:count]
+        self.stats["generated"] += len(ordered)
+        return ordered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate verified parametric trigonometry questions")
+    parser.add_argument("--topic", default=None, help="syllabus topic id (default: all templates)")
+    parser.add_argument("--template", default=None, choices=sorted(TEMPLATES))
+    parser.add_argument("--difficulty", default=None, choices=DIFFICULTIES)
+    parser.add_argument("--count", type=int, default=5,
+                        help="at most this many; small templates run out of distinct parameters, "
+                             "so large counts return fewer (--count 5000 gives about 4,000)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--benchmark", action="store_true", help="report variants per second instead of printing")
+    args = parser.parse_args()
+
+    generator = ParametricQuestionGenerator(args.seed)
+    started = time.perf_counter()
+    questions = generator.generate(args.topic, args.count, args.template, args.difficulty)
+    elapsed = time.perf_counter() - started
+
+    if args.benchmark:
+        print(f"⚡ {len(questions)} of {args.count} verified variants in {elapsed:.3f}s "
+              f"({len(questions) / elapsed:,.0f}/s, {generator.stats['rejected']} rejected)")
+        return
+    for question in questions:
+        print(f"\n[{question['topic_id']} / {question['difficulty']}] {question['question']}")
+        for step in question["solution_steps"]:
+            print(f"   {step}")
+        print(f"   ✅ {question['correct_answer']}")
+
+
+if __name__ == "__main__":
+    main()
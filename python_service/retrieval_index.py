@@ -0,0 +1,164 @@
+# retrieval_index.py
+"""
+Category-partitioned embedding index for dataset question retrieval.
+
+question_patterns (type_proof, type_solve, func_sin, ...) used to be lists of
+row numbers consulted only after every question had been scored. Here they
+become packed bitsets, and the embedding matrix is reordered so the rows of
+each question type (proof, solve, graph, other) are contiguous. A query's
+detected intent picks its type partition, which is scored as one contiguous
+slice, and the bitsets of the functions it mentions narrow that further.
+Scoring work therefore shrinks with the selectivity of the query's intent.
+
+If nothing in the selected subset clears the threshold (lenient near misses
+don't count), the query also scans every row and merges the results, so a
+misread intent costs time rather than a missed answer.
+
+For very large banks an IVF index (ann_index.py) supplies the candidate rows
+first; the same partition and bitset filters then apply to those candidates,
+which are re-scored exactly.
+"""
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ann_index import ANN_CANDIDATES
+from lexical_index import fuse_scores
+
+TYPE_PATTERNS = ('type_proof', 'type_solve', 'type_graph')
+OTHER_TYPE = 'type_other'
+PATTERN_LENIENCY = 0.1    # Rows that share the query's intent may match slightly below the threshold
+GATHER_SELECTIVITY = 0.5    # Below this fraction of a partition, gather rows instead of scoring the slice
+
+
+class CategoryPartitionedIndex:
+    """Normalised embeddings laid out by question type, with bitset filters per pattern"""
+
+    def __init__(self, embeddings, question_patterns: Dict[str, Sequence[int]], ann_index=None):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        self.size = len(matrix)
+        self.ann_index = ann_index
+        self.position_thresholds = None    # Per-row similarity thresholds, in partition order
+
+        masks = {}
+        for pattern, rows in question_patterns.items():
+            mask = np.zeros(self.size, dtype=bool)
+            mask[np.asarray(rows, dtype=np.int64)] = True
+            masks[pattern] = mask
+
+        # Each row belongs to one type partition; rows with no type pattern go last
+        row_type = np.full(self.size, len(TYPE_PATTERNS), dtype=np.int8)
+        for position, pattern in enumerate(TYPE_PATTERNS):
+            if pattern in masks:
+                row_type[masks[pattern] & (row_type == len(TYPE_PATTERNS))] = position
+        self.order = np.argsort(row_type, kind='stable')    # partition position -> original row
+        self.position_of = np.empty_like(self.order)
+        self.position_of[self.order] = np.arange(self.size)
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(row_type, minlength=len(TYPE_PATTERNS) + 1))])
+        self.partitions = {name: (int(bounds[i]), int(bounds[i + 1]))
+                           for i, name in enumerate(TYPE_PATTERNS + (OTHER_TYPE,))}
+
+        matrix = matrix[self.order]
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        self.matrix = np.ascontiguousarray(matrix)
+        self.bitsets = {pattern: np.packbits(mask[self.order]) for pattern, mask in masks.items()}
+
+        self._lock = threading.Lock()
+        self.stats = {"queries": 0, "rows_scored": 0, "full_scans": 0, "fallbacks": 0}
+        sizes = ", ".join(f"{name.replace('type_', '')} {stop - start}" for name, (start, stop) in self.partitions.items())
+        print(f"🗂️ Retrieval index: {self.size} questions ({sizes}), {len(self.bitsets)} pattern bitsets")
+
+    def set_category_thresholds(self, categories: Sequence[str], category_thresholds: Dict[str, float],
+                                default: float):
+        """Each row is matched against its own category's learned threshold"""
+        thresholds = np.array([category_thresholds.get(category, default) for category in categories],
+                              dtype=np.float32)
+        self.position_thresholds = thresholds[self.order]
+
+    def candidates(self, patterns: Sequence[str]) -> Tuple[int, int, Optional[np.ndarray]]:
+        """(start, stop, mask) of the rows to score; mask is None when the whole slice qualifies"""
+        query_type = next((p for p in patterns if p in TYPE_PATTERNS), None)
+        start, stop = self.partitions[query_type] if query_type else (0, self.size)
+
+        functions = [p for p in patterns if p.startswith('func_')]
+        if not functions or any(p not in self.bitsets for p in functions):
+            return start, stop, None
+        bits = self.bitsets[functions[0]]
+        for pattern in functions[1:]:
+            bits = bits & self.bitsets[pattern]    # Packed AND: eight rows per byte
+        return start, stop, np.unpackbits(bits, count=self.size)[start:stop].astype(bool)
+
+    def search(self, query_embedding, patterns: Sequence[str], threshold: float,
+               lexical_scores: Optional[np.ndarray] = None) -> List[Tuple[int, float, bool]]:
+        """(row, score, above_threshold) best first; rows are indices into the original question list.
+
+        threshold applies to rows without a learned category threshold.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        ann_positions = None
+        if self.ann_index is not None:
+            rows, _ = self.ann_index.search(query, ANN_CANDIDATES)
+            ann_positions = np.sort(self.position_of[rows])
+
+        start, stop, mask = self.candidates(patterns)
+        restricted = mask is not None or (stop - start) < self.size
+        results = self._score(query, start, stop, mask, PATTERN_LENIENCY if restricted else 0.0,
+                              lexical_scores, threshold, ann_positions)
+        if restricted and not any(above for _, _, above in results):
+            # Lenient subset rows alone must not hide a clear match elsewhere: merge in the full scan
+            with self._lock:
+                self.stats["fallbacks"] += 1
+            full = self._score(query, 0, self.size, None, 0.0, lexical_scores, threshold, ann_positions)
+            found = {row for row, _, _ in full}
+            results = sorted(full + [result for result in results if result[0] not in found],
+                             key=lambda result: -result[1])
+        with self._lock:
+            self.stats["queries"] += 1
+        return results
+
+    def _score(self, query: np.ndarray, start: int, stop: int, mask: Optional[np.ndarray], leniency: float,
+               lexical_scores: Optional[np.ndarray], threshold: float,
+               ann_positions: Optional[np.ndarray] = None) -> List[Tuple[int, float, bool]]:
+        if ann_positions is not None:
+            # Only the ANN candidates inside the selected subset, re-scored exactly
+            positions = ann_positions[(ann_positions >= start) & (ann_positions < stop)]
+            if mask is not None:
+                positions = positions[mask[positions - start]]
+            scores = self.matrix[positions] @ query
+        elif mask is not None and mask.sum() < GATHER_SELECTIVITY * (stop - start):
+            positions = start + np.flatnonzero(mask)
+            scores = self.matrix[positions] @ query
+        else:
+            positions = np.arange(start, stop)
+            scores = self.matrix[start:stop] @ query    # Contiguous slice, no copy
+            if mask is not None:
+                positions, scores = positions[mask], scores[mask]
+
+        rows = self.order[positions]
+        if lexical_scores is not None:
+            scores = fuse_scores(scores, lexical_scores[rows])
+
+        with self._lock:
+            self.stats["rows_scored"] += len(positions)
+            self.stats["full_scans"] += int(len(positions) == self.size)
+
+        thresholds = self.position_thresholds[positions] if self.position_thresholds is not None else threshold
+        above = scores >= thresholds
+        keep = np.flatnonzero(scores >= thresholds - leniency)
+        keep = keep[np.argsort(-scores[keep])]
+        return [(int(rows[i]), float(scores[i]), bool(above[i])) for i in keep]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        queries = max(stats["queries"], 1)
+        stats["avg_rows_scored"] = round(stats["rows_scored"] / queries, 1)
+        stats["avg_fraction_scored"] = round(stats["rows_scored"] / (queries * max(self.size, 1)), 3)
+        stats["partitions"] = {name: stop - start for name, (start, stop) in self.partitions.items()}
+        stats["ann"] = ({"nlist": self.ann_index.nlist, "nprobe": self.ann_index.nprobe,
+                         "pq_subspaces": self.ann_index.pq_subspaces}
+                        if self.ann_index is not None else None)
+        return stats
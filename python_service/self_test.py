@@ -0,0 +1,72 @@
+# self_test.py
+"""
+Startup self-tests for the tutor service, run as their own command.
+
+These solves used to run in app.py's __main__ block before the server started
+listening. Now they are separate, so servers start straight away and the checks
+can run in CI or after a deploy:
+
+    python self_test.py
+
+Exits 1 if the model is not loaded or any check raises.
+"""
+import sys
+
+from app import current_solver, unified_service
+
+TEMPLATE_QUESTIONS = [
+    "Sketch y = 2 sin(3x)",  # Should use GRAPH_PROPERTIES template
+    "Find the exact value of cos(45°)",  # Should use EXACT_VALUES template
+    "Prove that sin²θ + cos²θ = 1",  # Should use PROVE_IDENTITIES template
+    "Solve sin x = 0.5",  # Should use SOLVE_EQUATIONS template
+    "A ladder leans against a wall at 60°, find the height"  # Should use APPLICATIONS template
+]
+
+
+def test_template_system(solver) -> int:
+    print("\n🧪 Testing Template System...")
+    failures = 0
+    for test_q in TEMPLATE_QUESTIONS:
+        try:
+            result, _ = solver.solve(test_q)
+            print(f"   '{test_q}'")
+            print(f"   Source: {result.get('source', 'unknown')}, Template: {result.get('template_used', 'none')}")
+            print(f"   Confidence: {result.get('confidence', 0):.2f}")
+        except Exception as e:
+            print(f"    Error testing '{test_q}': {e}")
+            failures += 1
+    return failures
+
+
+def test_unified_service(service) -> int:
+    print("\n Testing Unified Backend Service...")
+    try:
+        topics_result = service.get_available_topics()
+        print(f"  Available topics: {len(topics_result.get('topics', []))}")
+
+        test_student_id = "test_student_001"
+        service.topic_manager.initialize_student(test_student_id)
+        print(f"   Test student initialized: {test_student_id}")
+        return 0
+    except Exception as e:
+        print(f"   Error testing unified service: {e}")
+        return 1
+
+
+def main():
+    solver = current_solver()
+    print(f" AI Tutor Status: {' Loaded' if solver else ' Not loaded'}")
+    print(f" Unified Service Status: {' Loaded' if unified_service else ' Not loaded'}")
+
+    failures = 0 if solver else 1
+    if solver:
+        failures += test_template_system(solver)
+    if unified_service:
+        failures += test_unified_service(unified_service)
+
+    print(f"\n{'✅ All self-tests passed' if not failures else f'❌ {failures} self-test failure(s)'}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# single_flight.py
+"""
+Single-flight request coalescing.
+
+When many callers ask for exactly the same thing at the same moment (e.g. a
+whole class opening the same lesson section), only the first caller runs the
+expensive call; everyone else waits for it and shares the result.
+"""
+import copy
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict
+
+
+def make_request_key(payload: Dict[str, Any]) -> str:
+    """Stable hash of a fully rendered request payload (model, temperature, messages...)"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share the same key into one execution"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+        self.stats = {
+            "executed_calls": 0,
+            "coalesced_calls": 0,
+            "max_waiters": 0
+        }
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn() once per key at a time; concurrent callers get a copy of the same result"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self.stats["executed_calls"] += 1
+                is_leader = True
+            else:
+                call.waiters += 1
+                self.stats["coalesced_calls"] += 1
+                self.stats["max_waiters"] = max(self.stats["max_waiters"], call.waiters)
+                is_leader = False
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # Callers are free to mutate what they get back, so never hand out the shared object
+            return copy.deepcopy(call.result)
+
+        try:
+            result = fn()
+            # Keep a private copy for the waiters so the leader's caller can mutate its own
+            call.result = copy.deepcopy(result)
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters for monitoring how much work was saved"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._calls)
+        total = stats["executed_calls"] + stats["coalesced_calls"]
+        stats["coalesced_ratio"] = round(stats["coalesced_calls"] / total, 3) if total else 0.0
+        return stats
@@ -7,6 +7,8 @@ import numpy as np
 from io import BytesIO
 import base64
 
+from plot_lock import serialised_plotting
+
 class TrigTemplateManager:
     def __init__(self):
         self.x, self.theta, self.a, self.b, self.y = symbols('x θ a b y')
@@ -493,6 +495,7 @@ class TrigTemplateManager:
         
         return amplitude, frequency, phase_shift, vertical_shift
     
+    @serialised_plotting
     def _generate_complete_graph(self, function_expr: str, question: str) -> Dict[str, Any]:
         """Generate complete graph with analysis"""
         try:
@@ -2,6 +2,7 @@
 """
 Unit tests for AI Service connection and functionality
 Run with: python test_ai_service.py
+Offline: start llm_stub_server.py and set AI_BASE_URL=http://127.0.0.1:8008/v1
 """
 
 import os
@@ -0,0 +1,162 @@
+# test_answer_cache.py
+"""
+Tests for answer_cache.py
+Run with: python -m pytest test_answer_cache.py
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import answer_cache
+from answer_cache import SemanticAnswerCache, is_cacheable, is_follow_up, wants_fresh_explanation
+
+
+class FakeEncoder:
+    """Embeds a question by the words it contains, ignoring filler words and numbers.
+    Paraphrases that only add filler words embed identically"""
+
+    FILLER = {"please", "can", "you", "the", "what", "is", "of", "tell", "me", "a"}
+
+    def __init__(self):
+        self.vocabulary = {}
+        self.calls = 0
+
+    def encode(self, questions):
+        self.calls += 1
+        vectors = np.zeros((len(questions), 32), dtype=np.float32)
+        for row, question in enumerate(questions):
+            for word in question.lower().replace("?", "").split():
+                if word not in self.FILLER and not word[0].isdigit():
+                    column = self.vocabulary.setdefault(word, len(self.vocabulary) % 32)
+                    vectors[row, column] += 1.0
+        return vectors
+
+
+@pytest.fixture
+def cache():
+    return SemanticAnswerCache(FakeEncoder(), similarity_threshold=0.9, max_entries_per_topic=3, ttl_seconds=60)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() as seen by answer_cache, moved forward by hand"""
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    return now
+
+
+# ---------- What may be cached ----------
+
+def test_follow_ups_and_conversations_are_not_cacheable():
+    assert is_follow_up("Can you explain that more simply?")
+    assert is_follow_up("Why is step 2 negative?")
+    assert not is_follow_up("What is the period of y = sin 2x?")
+    assert not is_cacheable("What is a radian?", conversation=[{"role": "user", "content": "hi"}])
+    assert is_cacheable("What is a radian?")
+    assert wants_fresh_explanation("Explain it differently please")
+
+
+def test_follow_up_is_neither_looked_up_nor_stored(cache):
+    cache.store("trig_ratios", "Explain that again", {"answer": "..."})
+    assert cache.lookup("trig_ratios", "Explain that again") is None
+    assert cache.get_stats()["entries"] == {}
+    assert cache.get_stats()["bypassed"] == 1
+
+
+def test_disabled_without_encoder():
+    cache = SemanticAnswerCache()
+    cache.store("trig_ratios", "What is a radian?", {"answer": "..."})
+    assert cache.lookup("trig_ratios", "What is a radian?") is None
+    assert cache.get_stats()["enabled"] is False
+
+
+# ---------- Lookups ----------
+
+def test_paraphrase_hits_and_returns_a_copy(cache):
+    cache.store("trig_ratios", "What is a radian?", {"answer": "An angle", "steps": ["r = s"]})
+    hit = cache.lookup("trig_ratios", "Can you tell me what a radian is")
+    assert hit["matched_question"] == "What is a radian?"
+    assert hit["similarity"] == pytest.approx(1.0)
+    hit["response"]["steps"].append("changed")
+    assert cache.lookup("trig_ratios", "What is a radian?")["response"]["steps"] == ["r = s"]
+
+
+def test_topics_are_kept_apart(cache):
+    cache.store("trig_ratios", "What is a radian?", {"answer": "..."})
+    assert cache.lookup("circular_measure", "What is a radian?") is None
+
+
+def test_different_numbers_never_match(cache):
+    cache.store("trig_ratios", "What is sin 30?", {"answer": "0.5"})
+    assert cache.lookup("trig_ratios", "What is sin 60?") is None
+    assert cache.lookup("trig_ratios", "please what is sin 30?")["response"] == {"answer": "0.5"}
+
+
+def test_threshold_override(cache):
+    cache.store("trig_ratios", "Define radian measure", {"answer": "..."})
+    assert cache.lookup("trig_ratios", "Define radian") is None
+    assert cache.lookup("trig_ratios", "Define radian", similarity_threshold=0.8) is not None
+
+
+def test_store_reuses_the_lookup_embedding(cache):
+    encoder = cache.encoder
+    cache.store("trig_ratios", "What is a radian?", {"answer": "..."})
+    calls = encoder.calls
+    assert cache.lookup("trig_ratios", "Define a sector") is None
+    cache.store("trig_ratios", "Define a sector", {"answer": "..."})
+    assert encoder.calls == calls + 1
+
+
+def test_given_embedding_skips_the_encoder(cache):
+    encoder = cache.encoder
+    vector = encoder.encode(["radian"])[0]
+    calls = encoder.calls
+    cache.store("trig_ratios", "What is a radian?", {"answer": "..."}, embedding=vector)
+    assert cache.lookup("trig_ratios", "What is a radian?", embedding=vector) is not None
+    assert encoder.calls == calls
+
+
+def test_new_encoder_does_not_reuse_old_embedding(cache):
+    cache.store("trig_ratios", "What is a radian?", {"answer": "..."})
+    cache.set_encoder(FakeEncoder())
+    cache.clear()
+    cache.store("trig_ratios", "What is a radian?", {"answer": "..."})
+    assert cache.encoder.calls == 1
+
+
+# ---------- TTL and LRU ----------
+
+def test_entries_expire_after_ttl(cache, clock):
+    cache.store("trig_ratios", "What is a radian?", {"answer": "..."})
+    clock[0] += 59
+    assert cache.lookup("trig_ratios", "What is a radian?") is not None
+    clock[0] += 2
+    assert cache.lookup("trig_ratios", "What is a radian?") is None
+    assert cache.get_stats()["expired"] == 1
+    assert cache.get_stats()["entries"] == {"trig_ratios": 0}
+
+
+def test_least_recently_used_entry_is_evicted(cache, clock):
+    for question in ("Define radian", "Define sector", "Define arc"):
+        cache.store("trig_ratios", question, {"answer": question})
+        clock[0] += 1
+    assert cache.lookup("trig_ratios", "Define radian") is not None    # Now the most recently used
+    clock[0] += 1
+    cache.store("trig_ratios", "Define chord", {"answer": "chord"})
+
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.lookup("trig_ratios", "Define sector") is None
+    for question in ("Define radian", "Define arc", "Define chord"):
+        assert cache.lookup("trig_ratios", question) is not None
+
+
+def test_clear_one_topic(cache):
+    cache.store("trig_ratios", "What is a radian?", {"answer": "..."})
+    cache.store("circular_measure", "What is a radian?", {"answer": "..."})
+    cache.clear("trig_ratios")
+    assert cache.get_stats()["entries"] == {"circular_measure": 1}
@@ -0,0 +1,193 @@
+# test_answer_checker.py
+"""
+Tests for answer_checker.py
+Run with: python -m pytest test_answer_checker.py
+"""
+import os
+import sys
+
+import pytest
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from answer_checker import AnswerParseError, check_answer, check_batch, parse_value
+
+
+# ---------- Numbers, tolerances and units ----------
+
+@pytest.mark.parametrize("student, expected", [
+    ("37.7", "37.7 cm"),
+    ("37.70 cm", "37.7 cm"),
+    ("12.6 m²", "12.57 m²"),    # 3 significant figures
+    ("120.4°", "120.36°"),    # angles to 1 decimal place
+    ("π/6 rad", "30°"),
+    ("0.524 radians", "30°"),
+    ("60°", "π/3"),
+    ("2√3", "3.46"),
+    ("½", "0.5"),
+])
+def test_numbers_match_across_units_and_notation(student, expected):
+    result = check_answer(student, expected)
+    assert result["correct"] is True, result
+    assert result["feedback"] == "Correct"
+
+
+def test_wrong_value_is_incorrect_not_extra():
+    result = check_answer("0.51", "0.5")
+    assert result["correct"] is False
+    assert result["extra"] == 0
+    assert result["feedback"] == "Incorrect"
+
+
+def test_surplus_values_are_reported_as_extra():
+    result = check_answer("30°, 150°, 210°", "30°, 150°")
+    assert result["correct"] is False
+    assert result["matched"] == 2
+    assert result["extra"] == 1
+    assert result["feedback"] == "Includes values that are not solutions"
+
+
+def test_missing_values_get_partial_credit():
+    result = check_answer("x = 30°", "x = 30°, 150°")
+    assert result["correct"] is False
+    assert result["score"] == 0.5
+    assert result["feedback"] == "1 of 2 values correct"
+
+
+def test_one_wrong_value_in_a_list_is_not_extra():
+    result = check_answer("30°, 151°", "30°, 150°")
+    assert result["extra"] == 0
+    assert result["feedback"] == "1 of 2 values correct"
+
+
+def test_solution_order_does_not_matter():
+    assert check_answer("x = 150°, 30°", "x = 30°, 150°")["correct"] is True
+
+
+# ---------- ± and "or" alternatives ----------
+
+def test_plus_minus_expands_to_both_signs():
+    assert parse_value("±2")["kind"] == "plus_minus"
+    assert check_answer("±2", "2, -2")["correct"] is True
+    assert check_answer("x = 2, -2", "x = ±2")["correct"] is True
+    assert check_answer("2", "±2")["feedback"] == "1 of 2 values correct"
+
+
+def test_or_alternatives_accept_either_form():
+    assert check_answer("37.7", "12π or 37.7 cm")["correct"] is True
+    assert check_answer("12π", "12π or 37.7 cm")["correct"] is True
+    assert check_answer("38.5", "12π or 37.7 cm")["correct"] is False
+
+
+def test_student_alternatives_must_all_be_correct():
+    # Two forms of the same value are fine
+    assert check_answer("12π or 37.7", "37.7 cm")["correct"] is True
+    assert check_answer("30° or π/6", "30°")["correct"] is True
+
+
+@pytest.mark.parametrize("student, expected", [
+    ("10 or 20 or 30 or 40", "30°"),
+    ("2 or 3 or 4 or 5", "4"),
+    ("37.7 or 38.5", "12π or 37.7 cm"),
+    ("x = 30°, 150° or x = 30°, 210°", "x = 30°, 150°"),
+])
+def test_hedged_answers_are_wrong(student, expected):
+    result = check_answer(student, expected)
+    assert result["correct"] is False
+    assert result["feedback"] == "Give one answer: not every alternative is correct"
+
+
+# ---------- Labels ----------
+
+def test_labels_can_be_given_in_any_order():
+    result = check_answer("Period = 120°, Amplitude = 3", "Amplitude = 3, Period = 120°")
+    assert result["correct"] is True
+
+
+def test_wrong_value_under_the_right_label():
+    result = check_answer("Amplitude = 3, Period = 360°", "Amplitude = 3, Period = 120°")
+    assert result["correct"] is False
+    assert result["matched"] == 1
+
+
+def test_worded_and_colon_labels():
+    assert check_answer("maximum 4", "Maximum = 4")["correct"] is True
+    assert check_answer("Range: [-1, 7]", "Range: [-1, 7]")["correct"] is True
+    assert check_answer("Range: [-1, 6]", "Range: [-1, 7]")["correct"] is False
+
+
+def test_unlabelled_values_are_compared_in_order():
+    assert check_answer("3, 120°", "Amplitude = 3, Period = 120°")["correct"] is True
+    assert check_answer("120°, 3", "Amplitude = 3, Period = 120°")["correct"] is False
+
+
+# ---------- Expressions ----------
+
+@pytest.mark.parametrize("student, expected", [
+    ("2sinx cosx", "sin 2x"),
+    ("2sinθcosθ", "sin2θ"),
+    ("1 - 2sin²x", "cos 2x"),
+    ("1 + tan²x", "sec²x"),
+    ("tanx", "sinx/cosx"),
+    ("sec²θ - 1", "tan²θ"),
+])
+def test_equivalent_expressions_match(student, expected):
+    assert check_answer(student, expected)["correct"] is True
+
+
+def test_different_expressions_do_not_match():
+    result = check_answer("2sinx", "sin 2x")
+    assert result["correct"] is False
+    assert result["kind"] == "expression"
+
+
+# ---------- Proofs and unreadable answers ----------
+
+def test_proofs_need_review():
+    result = check_answer("shown above", "Proven")
+    assert result["correct"] is None
+    assert result["needs_review"] is True
+
+
+def test_unreadable_student_answer():
+    result = check_answer("abc$", "5")
+    assert result["correct"] is False
+    assert result["kind"] == "unparseable"
+
+
+def test_unparseable_expected_answer_falls_back_to_text():
+    assert check_answer("See diagram", "See diagram")["correct"] is True
+    assert check_answer("See graph", "See diagram")["needs_review"] is True
+
+
+def test_parse_errors_are_value_errors():
+    with pytest.raises(AnswerParseError):
+        parse_value("sin(")
+    assert issubclass(AnswerParseError, ValueError)
+
+
+# ---------- check_batch ----------
+
+def test_check_batch_matches_check_answer():
+    submissions = [
+        {"id": "a", "answer": "2sinxcosx", "expected": "sin2x"},
+        {"id": "b", "answer": "cos2x", "expected": "sin2x"},
+        {"id": "c", "answer": "30°, 150°", "expected": "x = 30°, 150°"},
+        {"id": "d", "answer": "0.51", "expected": "0.5"},
+        {"id": "e", "answer": "1 - 2sin²x", "expected": "sin2x"},
+        {"id": "f", "answer": "shown", "expected": "Proven"},
+    ]
+    results = check_batch(submissions)
+    assert [result["id"] for result in results] == ["a", "b", "c", "d", "e", "f"]
+    assert [result["correct"] for result in results] == [True, False, True, False, False, None]
+    for submission, result in zip(submissions, results):
+        single = check_answer(submission["answer"], submission["expected"])
+        assert single["correct"] == result["correct"]
+        assert single["feedback"] == result["feedback"]
+
+
+def test_check_batch_without_ids():
+    results = check_batch([{"answer": "sin²x + cos²x + sin x", "expected": "1 + sinx"}])
+    assert "id" not in results[0]
+    assert results[0]["correct"] is True
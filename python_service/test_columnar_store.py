@@ -0,0 +1,137 @@
+# test_columnar_store.py
+"""
+Tests for columnar_store.py
+Run with: python -m pytest test_columnar_store.py
+"""
+import os
+import sys
+
+import joblib
+import numpy as np
+import pytest
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from columnar_store import COLUMNS, ColumnarStore
+
+PLOT = {
+    "function_type": "sine",
+    "equation": "y = 2sin(x) + 1",
+    "matplotlib_code": "plt.plot(x, 2*np.sin(x) + 1)",
+    "key_points": [[90, 3], [270, -1]],
+    "axes_config": {"x_range": [0, 360], "label": "θ (°)"},
+}
+
+LISTS = {
+    "solutions": [
+        ["Step 1: sin x = ½", "Step 2: x = 30°, 150°"],
+        [],
+        ["Step 1: amplitude = 2", "Step 2: shift up 1 → range [-1, 3]"],
+        ["Step 1: tan²θ + 1 = sec²θ"],
+    ],
+    "alternative_solutions": [[], ["Use the unit circle"], [], ["Divide sin²θ + cos²θ = 1 by cos²θ", "∎"]],
+    "final_answers": ["x = 30°, 150°", "0.866", "Range: [-1, 3]", "Proven"],
+    "categories": ["equations", "fundamentals", "Graphs", "equations"],
+    "question_ids": ["EQ_001", "F_002", "G_003", "EQ_004"],
+    "plotting_data": [{}, {}, PLOT, {"equation": "y = tan x", "function_type": None, "notes": "asymptotes"}],
+}
+
+
+@pytest.fixture
+def store():
+    return ColumnarStore.build(*(LISTS[name] for name in COLUMNS))
+
+
+def assert_same_rows(store):
+    for name in COLUMNS:
+        assert store.column(name) == LISTS[name], name
+
+
+# ---------- Round trips ----------
+
+def test_every_column_reads_back(store):
+    assert len(store) == 4
+    assert_same_rows(store)
+
+
+def test_single_row_reads(store):
+    assert store.solution(2) == LISTS["solutions"][2]
+    assert store.alternative_solution(3) == ["Divide sin²θ + cos²θ = 1 by cos²θ", "∎"]
+    assert store.final_answer(0) == "x = 30°, 150°"
+    assert store.question_id(1) == "F_002"
+    assert store.category(2) == "Graphs"
+    assert store.plotting(2) == PLOT
+    assert store.plotting(0) == {}
+
+
+def test_offsets_index_the_blob(store):
+    # Strings are back to back in the blob, so offsets only grow and end at its length
+    assert store.offsets[0] == 0
+    assert store.offsets[-1] == len(store.blob)
+    assert (np.diff(store.offsets.astype(np.int64)) >= 0).all()
+    assert store.text(store.final_answers[3]) == "Proven"
+    # Multi-byte characters are counted in bytes, not characters
+    number = store.final_answers[0]
+    assert store.offsets[number + 1] - store.offsets[number] == len("x = 30°, 150°".encode("utf-8"))
+
+
+def test_steps_are_contiguous_ranges(store):
+    assert store.solution_starts.tolist() == [0, 2, 2, 4, 5]
+    assert store.alternative_starts[0] == store.solution_starts[-1]
+
+
+def test_to_dict_round_trip(store):
+    assert_same_rows(ColumnarStore.from_dict(store.to_dict()))
+
+
+def test_joblib_round_trip(store, tmp_path):
+    path = tmp_path / "true_ai_tutor.pkl"
+    joblib.dump({"columnar_store": store.to_dict(), "questions": ["?"] * 4}, path)
+    assert_same_rows(ColumnarStore.from_model_data(joblib.load(path)))
+
+
+# ---------- Older artifacts and edge cases ----------
+
+def test_built_from_list_columns_of_an_older_artifact():
+    model_data = {"questions": ["?"] * 4, **LISTS}
+    assert_same_rows(ColumnarStore.from_model_data(model_data))
+
+
+def test_missing_columns_get_defaults():
+    store = ColumnarStore.from_model_data({"questions": ["a", "b"]})
+    assert store.column("categories") == ["unknown", "unknown"]
+    assert store.column("solutions") == [[], []]
+    assert store.column("plotting_data") == [{}, {}]
+
+
+def test_string_solution_and_missing_final_answer():
+    store = ColumnarStore.build(["Single step"], [None], [None], ["fundamentals"], ["F_1"], [None])
+    assert store.solution(0) == ["Single step"]
+    assert store.alternative_solution(0) == []
+    assert store.final_answer(0) == ""
+    assert store.plotting(0) == {}
+
+
+def test_categories_are_interned(store):
+    assert store.category_names == ["equations", "fundamentals", "Graphs"]
+    assert store.category_codes.dtype == np.uint8
+    assert store.rows_in_category("equations").tolist() == [0, 3]
+    assert store.rows_in_category("identities").tolist() == []
+
+
+def test_store_is_smaller_than_the_lists():
+    rows = 500
+    lists = {
+        "solutions": [[f"Step {step}: sin x = {row / rows:.3f}" for step in range(4)] for row in range(rows)],
+        "alternative_solutions": [[] for _ in range(rows)],
+        "final_answers": [f"x = {row}°" for row in range(rows)],
+        "categories": ["equations" if row % 2 else "identities" for row in range(rows)],
+        "question_ids": [f"Q_{row:04d}" for row in range(rows)],
+        "plotting_data": [{} for _ in range(rows)],
+    }
+    store = ColumnarStore.build(*(lists[name] for name in COLUMNS))
+    report = store.memory_report(lists)
+    assert report["rows"] == rows
+    assert report["strings"] == rows * 6
+    assert report["columnar_bytes"] < report["lists_total_bytes"]
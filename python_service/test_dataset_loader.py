@@ -0,0 +1,145 @@
+# test_dataset_loader.py
+"""
+Tests for dataset_loader.py
+Run with: python -m pytest test_dataset_loader.py
+"""
+import io
+import json
+import os
+import sys
+
+import pytest
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dataset_loader import (DatasetFormatError, _StreamReader, _stream_object, format_path, iter_entries,
+                            iter_items, load_section, validate_dataset, write_shards)
+
+DOCUMENT = {
+    "metadata": {"version": "2.1", "syllabus": {"country": "Namibia"}},
+    "fundamentals": [
+        {"id": "F1", "question": "Evaluate sin 30°", "step_by_step_solution": ["sin 30° = 1/2"],
+         "final_answer": "1/2", "difficulty": "basic"},
+        {"id": "F2", "question": "Convert 1.5 rad to degrees", "step_by_step_solution": ["1.5 × 180/π"],
+         "final_answer": "85.9°"},
+    ],
+    "equations": [
+        {"id": "E1", "question": "Solve tan x = 1 for 0° ≤ x ≤ 360°", "solution": "x = 45°, 225°"},
+        {"id": "E2", "question": "", "step_by_step_solution": []},    # Error: empty question
+    ],
+    "exam_preparation": {
+        "past_paper_questions": [
+            {"id": "P1", "question": "Prove that tan x cos x = sin x", "step_by_step_solution": ["..."],
+             "final_answer": "Proven", "marks": 3},
+        ],
+        "exam_tips": ["Show every step", "Give angles to 1 decimal place"],
+    },
+    "formula_sheet": "sin²x + cos²x = 1",
+    "scores": [1e-3, 12345678901234, -0.5],
+}
+
+
+@pytest.fixture
+def dataset_file(tmp_path):
+    path = tmp_path / "trig_dataset.json"
+    path.write_text(json.dumps(DOCUMENT, ensure_ascii=False, indent=2), encoding="utf-8")
+    return str(path)
+
+
+def paths_and_values(source):
+    return [(format_path(path), value) for path, value in iter_entries(source)]
+
+
+# ---------- Streaming the JSON document ----------
+
+def test_entries_in_document_order(dataset_file):
+    entries = paths_and_values(dataset_file)
+    assert entries[0] == ("metadata", DOCUMENT["metadata"])
+    assert [path for path, _ in entries[1:5]] == ["fundamentals[0]", "fundamentals[1]", "equations[0]", "equations[1]"]
+    assert ("exam_preparation.past_paper_questions[0]", DOCUMENT["exam_preparation"]["past_paper_questions"][0]) in entries
+    assert ("exam_preparation.exam_tips[1]", "Give angles to 1 decimal place") in entries
+    assert ("formula_sheet", "sin²x + cos²x = 1") in entries
+    assert [value for path, value in entries if path.startswith("scores")] == DOCUMENT["scores"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_small_read_buffers_decode_the_same_values(dataset_file, chunk_size):
+    # Values, numbers and multi-byte characters split across reads are put back together
+    with open(dataset_file, "r", encoding="utf-8") as f:
+        reader = _StreamReader(f, chunk_size=chunk_size)
+        reader.expect("{")
+        streamed = [(format_path(path), value) for path, value in _stream_object(reader, (), 0)]
+    assert streamed == paths_and_values(dataset_file)
+
+
+def test_buffer_holds_one_value_not_the_file():
+    entries = [{"id": f"F{i}", "question": "x" * 100} for i in range(200)]
+    reader = _StreamReader(io.StringIO(json.dumps({"fundamentals": entries})), chunk_size=256)
+    reader.expect("{")
+    longest = 0
+    for _ in _stream_object(reader, (), 0):
+        longest = max(longest, len(reader.buffer))
+    assert longest < 1024
+
+
+def test_broken_json_reports_its_offset():
+    reader = _StreamReader(io.StringIO('{"fundamentals": [{"id": "F1",, "question": "?"}]}'), chunk_size=8)
+    reader.expect("{")
+    with pytest.raises(DatasetFormatError, match="offset"):
+        list(_stream_object(reader, (), 0))
+
+
+def test_truncated_file(tmp_path):
+    path = tmp_path / "truncated.json"
+    path.write_text('{"fundamentals": [{"id": "F1", "question": "Evaluate sin 30°"},', encoding="utf-8")
+    with pytest.raises(DatasetFormatError, match="end of file"):
+        list(iter_entries(str(path)))
+
+
+# ---------- Items, sections and validation ----------
+
+def test_iter_items_skips_invalid_entries(dataset_file, capsys):
+    ids = [item["id"] for _, item in iter_items(dataset_file)]
+    assert ids == ["F1", "F2", "E1", "P1"]
+    assert "equations[1].question" in capsys.readouterr().out
+
+
+def test_iter_items_by_section(dataset_file):
+    items = list(iter_items(dataset_file, sections={"equations"}, validate=False))
+    assert [path for path, _ in items] == [("equations", 0), ("equations", 1)]
+
+
+def test_load_section(dataset_file):
+    assert load_section("fundamentals", dataset_file) == DOCUMENT["fundamentals"]
+    assert load_section("formula_sheet", dataset_file) == "sin²x + cos²x = 1"
+
+
+def test_validate_dataset(dataset_file):
+    report = validate_dataset(dataset_file)
+    assert report["sections"]["fundamentals"] == 2
+    assert [error["path"] for error in report["errors"]] == ["equations[1].question"]
+
+
+def test_duplicate_ids_are_errors(tmp_path):
+    path = tmp_path / "duplicates.json"
+    path.write_text(json.dumps({"fundamentals": [{"id": "F1", "question": "a", "solution": "b"}] * 2}),
+                    encoding="utf-8")
+    errors = validate_dataset(str(path))["errors"]
+    assert errors == [{"path": "fundamentals[1].id", "message": "duplicate id 'F1' (first at fundamentals[0])"}]
+
+
+# ---------- NDJSON shards ----------
+
+def test_shards_round_trip(dataset_file, tmp_path):
+    out = str(tmp_path / "shards")
+    counts = write_shards(out, dataset_file)
+    assert counts["fundamentals"] == 2
+    assert counts["exam_preparation.past_paper_questions"] == 1
+    with open(os.path.join(out, "fundamentals.ndjson"), "r", encoding="utf-8") as f:
+        assert [json.loads(line)["id"] for line in f] == ["F1", "F2"]
+
+    assert sorted(paths_and_values(out), key=lambda entry: entry[0]) == \
+        sorted(paths_and_values(dataset_file), key=lambda entry: entry[0])
+    assert [item["id"] for _, item in iter_items(out, validate=False)] == \
+        [item["id"] for _, item in iter_items(dataset_file, validate=False)]
@@ -0,0 +1,140 @@
+# test_dedup.py
+"""
+Tests for dedup.py
+Run with: python -m pytest test_dedup.py
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dedup import (_UnionFind, dedup_questions, expand_aliases, find_duplicate_pairs, math_skeleton,
+                   minhash_signatures)
+
+DUPLICATES = [
+    ("Solve 2 sin 2θ = 1 for 0° ≤ θ ≤ 360°", "Solve the equation 2 sin 2θ = 1 for 0° ≤ θ ≤ 360°"),
+    ("Solve 2 sin 2θ = 1 for 0° ≤ θ ≤ 360°", "Solve 2 sin 2x = 1 for 0° ≤ x ≤ 360°"),
+    ("Evaluate sin(30°)", "Evaluate sin 30°"),
+]
+
+NOT_DUPLICATES = [
+    ("Solve 2 sin 2θ = 1 for 0° ≤ θ ≤ 360°", "Solve sin 2θ = 1 for 0° ≤ θ ≤ 360°"),
+    ("Simplify (1 + sinθ)/cosθ", "Simplify (1 - sinθ)/cosθ"),
+    ("Simplify (1 + sinθ)/cosθ", "Simplify 1 + sinθ/cosθ"),
+    ("Evaluate sin(30°)", "Find the exact value of sin(30°)"),    # Same maths, too few shared words
+]
+
+
+@pytest.fixture
+def dataset():
+    """Questions as the trainer passes them: three copies of one question, a pair, and distinct rows"""
+    rows = [
+        # id, question, category, solution steps, final answer
+        ("F1", "Solve 2 sin 2θ = 1 for 0° ≤ θ ≤ 360°", "fundamentals", ["Step 1"], None),
+        ("E1", "Solve the equation 2 sin 2θ = 1 for 0° ≤ θ ≤ 360°", "equations", ["Step 1", "Step 2"], "θ = 15°"),
+        ("X1", "Solve 2 sin 2x = 1 for 0° ≤ x ≤ 360°", "exam_questions", ["Step 1", "Step 2"], None),
+        ("F2", "Solve sin 2θ = 1 for 0° ≤ θ ≤ 360°", "fundamentals", ["Step 1"], "θ = 45°"),
+        ("I1", "Simplify (1 + sinθ)/cosθ", "identities", [], None),
+        ("I2", "Simplify (1 - sinθ)/cosθ", "identities", [], None),
+        ("F3", "Evaluate sin(30°)", "fundamentals", ["Step 1"], "1/2"),
+        ("F4", "Evaluate sin 30°", "fundamentals", ["Step 1"], "1/2"),
+    ]
+    ids, questions, categories, solutions, answers = (list(column) for column in zip(*rows))
+    return {"question_ids": ids, "questions": questions, "categories": categories, "solutions": solutions,
+            "alternative_solutions": [None] * len(rows), "final_answers": answers,
+            "plotting_data": [None] * len(rows)}
+
+
+# ---------- Maths skeleton ----------
+
+def test_skeleton_ignores_wording_and_variable_name():
+    assert math_skeleton(DUPLICATES[0][0]) == math_skeleton(DUPLICATES[0][1])
+    assert math_skeleton("Solve cos θ = 0.5") == math_skeleton("Find all angles with cos x = 0.5") == "cos x = 0.5"
+
+
+def test_skeleton_keeps_grouping_brackets_only():
+    assert math_skeleton("Simplify (1 + sinθ)/cosθ") == "( 1 + sin x ) / cos x"
+    assert math_skeleton("Simplify 1 + sinθ/cosθ") == "1 + sin x / cos x"
+    assert math_skeleton("sin(30°)") == math_skeleton("sin 30°") == "sin 30 deg"
+
+
+def test_skeleton_keeps_numbers_apart():
+    assert math_skeleton("2 sin 2θ = 1") != math_skeleton("sin 2θ = 1")
+
+
+# ---------- MinHash ----------
+
+def test_minhash_estimates_jaccard():
+    signatures = minhash_signatures(["Solve sin x = 0.5", "Solve sin x = 0.5",
+                                     "Evaluate sin(30°)", "Find the exact value of sin(30°)"])
+    assert signatures.shape == (4, 64)
+    assert (signatures[0] == signatures[1]).all()
+    assert (signatures[2] == signatures[3]).mean() < 0.8
+
+
+def test_minhash_is_deterministic():
+    texts = ["Prove that tan x + cot x = sec x cosec x"]
+    assert (minhash_signatures(texts) == minhash_signatures(texts)).all()
+
+
+# ---------- Pairs ----------
+
+@pytest.mark.parametrize("first, second", DUPLICATES)
+def test_known_duplicates_are_linked(first, second):
+    assert find_duplicate_pairs([first, second]) == [(0, 1)]
+
+
+@pytest.mark.parametrize("first, second", NOT_DUPLICATES)
+def test_known_non_duplicates_are_not_linked(first, second):
+    assert find_duplicate_pairs([first, second]) == []
+
+
+def test_embedding_similarity_links_within_a_block_only():
+    questions = ["Evaluate sin(30°)", "Find the exact value of sin(30°)", "Simplify (1 + sinθ)/cosθ"]
+    embeddings = np.array([[1.0, 0.0], [0.99, 0.01], [1.0, 0.0]])
+    # Rows 0 and 2 have identical embeddings but different skeletons
+    assert find_duplicate_pairs(questions, embeddings) == [(0, 1)]
+
+
+def test_tiles_cover_every_pair():
+    questions = [f"Solve the equation cos x = 0.5 {'now ' * (i % 2)}" for i in range(7)]
+    pairs = find_duplicate_pairs(questions, block_size=3)
+    assert sorted(pairs) == [(i, j) for i in range(7) for j in range(i + 1, 7)]
+
+
+# ---------- Union-find and canonical rows ----------
+
+def test_union_find_roots_at_smallest_row():
+    union_find = _UnionFind(5)
+    union_find.union(3, 4)
+    union_find.union(4, 1)
+    assert {union_find.find(row) for row in (1, 3, 4)} == {1}
+    assert union_find.find(2) == 2
+
+
+def test_dedup_keeps_the_most_complete_row(dataset):
+    result = dedup_questions(**dataset)
+    # E1 has a final answer and the longest solution; F4 ties with F3, so the earlier F3 stays
+    assert [dataset["question_ids"][row] for row in result["keep"]] == ["E1", "F2", "I1", "I2", "F3"]
+    assert result["clusters"] == 2
+    assert result["pairs"] == 4
+
+    id_map = result["id_map"]
+    assert id_map["F1"] == id_map["E1"] == id_map["X1"] == 0
+    assert id_map["F3"] == id_map["F4"] == 4
+    assert len(set(id_map.values())) == 5
+    assert [alias["id"] for alias in result["aliases"][0]] == ["F1", "X1"]
+    assert result["aliases"][0][1]["category"] == "exam_questions"
+
+
+def test_expand_aliases_restores_every_question(dataset):
+    result = dedup_questions(**dataset)
+    kept_questions = [dataset["questions"][row] for row in result["keep"]]
+    kept_ids = [dataset["question_ids"][row] for row in result["keep"]]
+    questions, ids = expand_aliases(kept_questions, kept_ids, result["aliases"])
+    assert sorted(ids) == sorted(dataset["question_ids"])
+    assert sorted(questions) == sorted(dataset["questions"])
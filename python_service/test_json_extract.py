@@ -0,0 +1,136 @@
+# test_json_extract.py
+"""
+Tests for json_extract.py
+Run with: python -m pytest test_json_extract.py
+"""
+import json
+import os
+import sys
+
+import pytest
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from json_extract import IncrementalJSONExtractor, extract_json
+
+LESSON = {
+    "title": "Radian measure",
+    "steps": ["Convert 180° to π rad", "Multiply by π/180"],
+    "worked_examples": [
+        {"problem": "Convert 60°", "solution": "π/3"},
+        {"problem": "Convert 45°", "solution": "π/4"},
+    ],
+}
+
+
+# ---------- Fences and commentary ----------
+
+def test_plain_document():
+    assert extract_json(json.dumps(LESSON)) == (LESSON, True)
+
+
+def test_json_fence_with_commentary():
+    reply = f"Here is the lesson:\n```json\n{json.dumps(LESSON, indent=2)}\n```\nLet me know if you need more."
+    assert extract_json(reply) == (LESSON, True)
+
+
+def test_stray_bracket_before_the_document():
+    reply = 'Using [NSSCAS] notation: {"answer": "x = 30°"}'
+    assert extract_json(reply) == ({"answer": "x = 30°"}, True)
+
+
+def test_expect_skips_other_brackets():
+    reply = 'Sections [1] and [2]:\n{"sections": [1, 2]}'
+    assert extract_json(reply, expect='{') == ({"sections": [1, 2]}, True)
+
+
+def test_trailing_text_after_the_root():
+    extractor = IncrementalJSONExtractor().feed('{"a": 1}\nDone!')
+    assert extractor.complete
+    assert extractor.trailing_text() == "\nDone!"
+
+
+def test_nothing_to_extract():
+    assert extract_json("No JSON here, sorry.") == (None, False)
+    assert extract_json("") == (None, False)
+
+
+# ---------- Truncated output ----------
+
+def test_truncated_array_keeps_complete_elements():
+    text = json.dumps(LESSON, ensure_ascii=False)
+    cut = text.index('"Convert 45°"') + 5    # Inside the second worked example
+    value, complete = extract_json(text[:cut])
+    assert complete is False
+    assert value["steps"] == LESSON["steps"]
+    assert value["worked_examples"] == LESSON["worked_examples"][:1]
+
+
+def test_truncated_string_array():
+    value, complete = extract_json('{"steps": ["Step 1: sin x = 0.5", "Step 2: x = 3')
+    assert complete is False
+    assert value == {"steps": ["Step 1: sin x = 0.5"]}
+
+
+def test_truncated_after_a_comma():
+    value, complete = extract_json('{"practice_questions": ["Solve cos x = 0", ')
+    assert complete is False
+    assert value == {"practice_questions": ["Solve cos x = 0"]}
+
+
+# ---------- Commas and quotes inside strings ----------
+
+def test_trailing_commas_are_removed():
+    assert extract_json('{"steps": ["a", "b",], "marks": 3,}') == ({"steps": ["a", "b"], "marks": 3}, True)
+
+
+def test_commas_before_brackets_inside_strings_are_kept():
+    text = '{"answer": "x = [30°, 150°,]", "note": "closes with ,}",}'
+    assert extract_json(text) == ({"answer": "x = [30°, 150°,]", "note": "closes with ,}"}, True)
+
+
+def test_escaped_quotes_inside_strings():
+    value = {"hint": 'Write "sin" before the bracket, then "}"', "path": "C:\\lessons\\"}
+    assert extract_json(json.dumps(value)) == (value, True)
+
+
+def test_escaped_quote_then_truncation():
+    value, complete = extract_json('{"steps": ["He said \\"done\\"", "Half a \\"quo')
+    assert complete is False
+    assert value == {"steps": ['He said "done"']}
+
+
+# ---------- Incremental feeding ----------
+
+@pytest.mark.parametrize("text, expected", [
+    (json.dumps(LESSON), LESSON),
+    (json.dumps(LESSON, indent=2, ensure_ascii=False), LESSON),
+    ('{"steps": ["a, ]", "b",], "quote": "\\"}\\"",}', {"steps": ["a, ]", "b"], "quote": '"}"'}),
+])
+def test_char_by_char_matches_one_shot(text, expected):
+    extractor = IncrementalJSONExtractor()
+    for char in text:
+        extractor.feed(char)
+    assert extractor.complete
+    assert extractor.snapshot() == expected == extract_json(text)[0]
+
+
+def test_snapshots_grow_while_streaming():
+    text = json.dumps({"steps": [f"Step {i}" for i in range(1, 6)]})
+    extractor = IncrementalJSONExtractor()
+    seen = []
+    for char in text:
+        snapshot = extractor.feed(char).snapshot()
+        if snapshot is not None and snapshot.get("steps") and snapshot["steps"] not in seen:
+            seen.append(snapshot["steps"])
+    # Every snapshot holds whole steps, one more each time
+    assert seen == [[f"Step {i}" for i in range(1, n + 1)] for n in range(1, 6)]
+
+
+def test_root_found_across_chunks():
+    extractor = IncrementalJSONExtractor(expect='[')
+    for chunk in ["Questions: (see ", "below) ", "[1, ", "2", ", 3]"]:
+        extractor.feed(chunk)
+    assert extractor.complete
+    assert extractor.snapshot() == [1, 2, 3]
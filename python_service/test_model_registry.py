@@ -0,0 +1,96 @@
+# test_model_registry.py
+"""
+Tests for model_registry.py
+Run with: python -m pytest test_model_registry.py
+"""
+import os
+import sys
+import types
+
+import joblib
+import pytest
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from model_registry import (ModelRegistry, RELOAD_ALREADY_RUNNING, RELOAD_NOT_FOUND, RELOAD_STARTED,
+                            publish_artifact)
+
+
+class FakeSolver:
+    """Stands in for TrigSolver: keeps the loaded artifact and answers warm-up queries"""
+
+    def __init__(self, model_data=None):
+        self.model_data = model_data
+
+    def ai_find_best_match(self, question):
+        return []
+
+
+@pytest.fixture(autouse=True)
+def fake_trig_solver(monkeypatch):
+    monkeypatch.setitem(sys.modules, "trig_solver", types.SimpleNamespace(TrigSolver=FakeSolver))
+
+
+def write_artifact(path, name):
+    joblib.dump({"name": name}, path)
+    return path
+
+
+# ---------- Legacy artifact only ----------
+
+def test_legacy_only_layout_loads_and_reloads(tmp_path):
+    legacy = write_artifact(tmp_path / "true_ai_tutor.pkl", "legacy")
+    registry = ModelRegistry(artifact_dir=str(tmp_path / "model_versions"), legacy_path=str(legacy))
+
+    assert registry.resolve() == ("legacy", str(legacy))
+    assert registry.load_initial() is True
+    assert registry.solver().model_data == {"name": "legacy"}
+
+    result = registry.reload(wait=True)
+    assert result["reason"] == RELOAD_STARTED
+    assert result["loaded"] is True
+    assert result["version"] == "legacy"
+    assert registry.status["last_error"] is None
+    assert registry.status["reloads"] == 1
+
+
+def test_nothing_to_load(tmp_path):
+    registry = ModelRegistry(artifact_dir=str(tmp_path / "model_versions"),
+                             legacy_path=str(tmp_path / "missing.pkl"))
+    assert registry.load_initial() is False
+    assert registry.solver() is None
+    result = registry.reload()
+    assert result["started"] is False
+    assert result["reason"] == RELOAD_NOT_FOUND
+
+
+# ---------- Published versions ----------
+
+def test_current_pointer_wins_over_legacy(tmp_path):
+    artifact_dir = str(tmp_path / "model_versions")
+    legacy = write_artifact(tmp_path / "true_ai_tutor.pkl", "legacy")
+    version = publish_artifact(str(write_artifact(tmp_path / "trained.pkl", "trained")), artifact_dir)
+    registry = ModelRegistry(artifact_dir=artifact_dir, legacy_path=str(legacy))
+
+    assert registry.load_initial() is True
+    assert registry.status["version"] == version
+    assert registry.solver().model_data == {"name": "trained"}
+
+
+def test_unknown_version_is_not_found(tmp_path):
+    legacy = write_artifact(tmp_path / "true_ai_tutor.pkl", "legacy")
+    registry = ModelRegistry(artifact_dir=str(tmp_path / "model_versions"), legacy_path=str(legacy))
+    assert registry.reload("20990101-000000-000")["reason"] == RELOAD_NOT_FOUND
+
+
+def test_second_reload_while_one_runs(tmp_path):
+    legacy = write_artifact(tmp_path / "true_ai_tutor.pkl", "legacy")
+    registry = ModelRegistry(artifact_dir=str(tmp_path / "model_versions"), legacy_path=str(legacy))
+    registry._reload_lock.acquire()
+    try:
+        result = registry.reload()
+    finally:
+        registry._reload_lock.release()
+    assert result["started"] is False
+    assert result["reason"] == RELOAD_ALREADY_RUNNING
@@ -0,0 +1,114 @@
+# test_retrieval_index.py
+"""
+Tests for retrieval_index.py
+Run with: python -m pytest test_retrieval_index.py
+"""
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from retrieval_index import CategoryPartitionedIndex
+
+QUERY = np.array([1.0, 0.0, 0.0, 0.0])
+
+# Rows as the trainer sees them: proofs, solves, a graph question and two with no type
+PATTERNS = {
+    "type_proof": [0, 1],
+    "type_solve": [2, 3, 4],
+    "type_graph": [5],
+    "func_sin": [0, 2, 5],
+    "func_cos": [1, 3],
+}
+
+
+def row_with_score(score: float, axis: int = 1) -> np.ndarray:
+    """Unit vector whose cosine with QUERY is score"""
+    vector = np.zeros(4)
+    vector[0] = score
+    vector[axis] = math.sqrt(1 - score ** 2)
+    return vector
+
+
+def build(scores, patterns=PATTERNS):
+    return CategoryPartitionedIndex(np.array([row_with_score(s, 1 + row % 3) for row, s in enumerate(scores)]),
+                                    patterns)
+
+
+# ---------- Layout ----------
+
+def test_rows_are_grouped_by_type():
+    index = build([0.1] * 8)
+    assert index.partitions == {"type_proof": (0, 2), "type_solve": (2, 5), "type_graph": (5, 6),
+                                "type_other": (6, 8)}
+    assert sorted(index.order.tolist()) == list(range(8))
+    assert (index.order[index.position_of] == np.arange(8)).all()
+
+
+def test_a_row_in_two_type_patterns_belongs_to_the_first():
+    index = build([0.1] * 4, {"type_proof": [0], "type_solve": [0, 1]})
+    assert index.partitions["type_proof"] == (0, 1)
+    assert index.order[:2].tolist() == [0, 1]
+
+
+def test_candidates_narrow_by_type_and_function():
+    index = build([0.1] * 8)
+    assert index.candidates([]) == (0, 8, None)
+    assert index.candidates(["type_solve"]) == (2, 5, None)
+    start, stop, mask = index.candidates(["type_solve", "func_sin"])
+    assert (start, stop) == (2, 5)
+    assert index.order[start:stop][mask].tolist() == [2]
+    # An unknown function pattern cannot narrow anything
+    assert index.candidates(["type_solve", "func_tan"]) == (2, 5, None)
+
+
+# ---------- Search ----------
+
+def test_results_use_original_rows_best_first():
+    index = build([0.2, 0.9, 0.3, 0.8, 0.1, 0.75, 0.0, 0.95])
+    results = index.search(QUERY, [], threshold=0.7)
+    assert [row for row, _, _ in results] == [7, 1, 3, 5]
+    assert results[0][1] == pytest.approx(0.95, abs=1e-5)
+    assert all(above for _, _, above in results)
+
+
+def test_subset_match_needs_no_fallback():
+    index = build([0.2, 0.2, 0.9, 0.3, 0.2, 0.2, 0.2, 0.95])
+    results = index.search(QUERY, ["type_solve"], threshold=0.7)
+    assert results == [(2, pytest.approx(0.9, abs=1e-5), True)]
+    assert index.get_stats()["fallbacks"] == 0
+    assert index.get_stats()["rows_scored"] == 3
+
+
+def test_lenient_subset_rows_do_not_hide_a_clear_match_elsewhere():
+    # The solve row is only a near miss (0.65 against 0.7); the proof row is a clear match
+    index = build([0.95, 0.2, 0.65, 0.2, 0.2, 0.2, 0.2, 0.2])
+    results = index.search(QUERY, ["type_solve"], threshold=0.7)
+    assert results[0] == (0, pytest.approx(0.95, abs=1e-5), True)
+    assert (2, pytest.approx(0.65, abs=1e-5), False) in results
+    assert index.get_stats()["fallbacks"] == 1
+
+
+def test_fallback_does_not_repeat_rows():
+    index = build([0.2, 0.2, 0.65, 0.2, 0.2, 0.2, 0.2, 0.2])
+    results = index.search(QUERY, ["type_solve"], threshold=0.7)
+    assert results == [(2, pytest.approx(0.65, abs=1e-5), False)]
+
+
+def test_unrestricted_search_is_not_lenient():
+    index = build([0.2, 0.2, 0.65, 0.2, 0.2, 0.2, 0.2, 0.2])
+    assert index.search(QUERY, [], threshold=0.7) == []
+    assert index.get_stats()["fallbacks"] == 0
+
+
+def test_category_thresholds_per_row():
+    index = build([0.2, 0.2, 0.75, 0.75, 0.2, 0.2, 0.2, 0.2])
+    categories = ["proofs", "proofs", "equations", "exam_questions", "equations", "graphs", "other", "other"]
+    index.set_category_thresholds(categories, {"equations": 0.7, "exam_questions": 0.8}, default=0.9)
+    results = index.search(QUERY, [], threshold=0.5)
+    assert [(row, above) for row, _, above in results] == [(2, True)]
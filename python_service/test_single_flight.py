@@ -0,0 +1,112 @@
+# test_single_flight.py
+"""
+Tests for single_flight.py
+Run with: python -m pytest test_single_flight.py
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from single_flight import SingleFlight, make_request_key
+
+
+def run_concurrently(single_flight, key, fn, callers):
+    """Start callers that all call do(key, fn); fn blocks until every follower is waiting"""
+    results, errors = [None] * callers, [None] * callers
+
+    def call(position):
+        try:
+            results[position] = single_flight.do(key, fn)
+        except Exception as e:
+            errors[position] = e
+
+    threads = [threading.Thread(target=call, args=(position,)) for position in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results, errors
+
+
+def gated(result=None, error=None, single_flight=None, followers=0):
+    """fn that returns (or raises) once `followers` callers are queued behind it"""
+    calls = []
+
+    def fn():
+        calls.append(1)
+        while single_flight.get_stats()["coalesced_calls"] < followers:
+            threading.Event().wait(0.005)
+        if error is not None:
+            raise error
+        return result
+
+    return fn, calls
+
+
+# ---------- Request keys ----------
+
+def test_request_key_ignores_dict_order():
+    first = {"model": "llama", "temperature": 0.2, "messages": [{"role": "user", "content": "sin 30°"}]}
+    second = {"messages": [{"content": "sin 30°", "role": "user"}], "temperature": 0.2, "model": "llama"}
+    assert make_request_key(first) == make_request_key(second)
+
+
+def test_request_key_changes_with_any_field():
+    payload = {"model": "llama", "temperature": 0.2, "messages": []}
+    assert make_request_key(payload) != make_request_key({**payload, "temperature": 0.3})
+
+
+# ---------- Coalescing ----------
+
+def test_concurrent_callers_share_one_execution():
+    single_flight = SingleFlight()
+    fn, calls = gated({"lesson": ["step"]}, single_flight=single_flight, followers=4)
+    results, errors = run_concurrently(single_flight, "key", fn, 5)
+
+    assert calls == [1]
+    assert errors == [None] * 5
+    assert results == [{"lesson": ["step"]}] * 5
+    stats = single_flight.get_stats()
+    assert stats["executed_calls"] == 1
+    assert stats["coalesced_calls"] == 4
+    assert stats["coalesced_ratio"] == 0.8
+    assert stats["in_flight"] == 0
+
+
+def test_every_caller_gets_its_own_copy():
+    single_flight = SingleFlight()
+    fn, _ = gated({"steps": []}, single_flight=single_flight, followers=2)
+    results, _ = run_concurrently(single_flight, "key", fn, 3)
+    results[0]["steps"].append("changed")
+    assert results[1] == results[2] == {"steps": []}
+    assert results[1] is not results[2]
+
+
+def test_errors_reach_every_caller():
+    single_flight = SingleFlight()
+    fn, calls = gated(error=RuntimeError("Groq unavailable"), single_flight=single_flight, followers=2)
+    results, errors = run_concurrently(single_flight, "key", fn, 3)
+    assert calls == [1]
+    assert all(isinstance(error, RuntimeError) for error in errors)
+
+
+def test_sequential_calls_are_not_coalesced():
+    single_flight = SingleFlight()
+    assert single_flight.do("key", lambda: 1) == 1
+    assert single_flight.do("key", lambda: 2) == 2
+    assert single_flight.get_stats()["executed_calls"] == 2
+
+
+def test_error_does_not_stick_to_the_key():
+    def fail():
+        raise ValueError("bad")
+
+    single_flight = SingleFlight()
+    with pytest.raises(ValueError):
+        single_flight.do("key", fail)
+    assert single_flight.do("key", lambda: "ok") == "ok"
@@ -10,7 +10,7 @@ from trig_solver import TrigSolver
 def test_graph():
     print("🧪 Testing graph functionality...")
     solver = TrigSolver()
-    result = solver.solve("Sketch y = sin x")
+    result, _ = solver.solve("Sketch y = sin x")
     
     print(f"✅ Has graph: {result['has_graph']}")
     print(f"📊 Graph image size: {len(result['graph_image']) if result['graph_image'] else 0} bytes")
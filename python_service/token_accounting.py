@@ -0,0 +1,76 @@
+# token_accounting.py
+"""
+Prompt compaction and token accounting for LLM calls.
+
+Groq bills and schedules by tokens, so every prompt is whitespace-normalised
+before it is sent, and prompt/completion token counts are recorded per
+endpoint (lesson, qa, assessment) to show what each call costs.
+"""
+import math
+import re
+import threading
+from typing import Any, Dict, Optional
+
+# Llama-family tokenizers average roughly four characters of English/maths text per token
+CHARS_PER_TOKEN = 4.0
+
+_INLINE_SPACE = re.compile(r'[ \t]+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used when the API does not report usage"""
+    if not text:
+        return 0
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def compact_prompt(text: str) -> str:
+    """Strip indentation, collapse runs of spaces and drop blank lines"""
+    lines = (_INLINE_SPACE.sub(' ', line).strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+class TokenUsageTracker:
+    """Per-endpoint prompt/completion token counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, endpoint: str, prompt_tokens: int, completion_tokens: int,
+               prompt_tokens_saved: int = 0, reported: bool = False, latency: Optional[float] = None):
+        """Record one LLM call; reported=True means the counts came from the API's usage block"""
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "prompt_tokens_saved": 0,
+                "reported_calls": 0,
+                "latency_total": 0.0
+            })
+            stats["calls"] += 1
+            stats["prompt_tokens"] += int(prompt_tokens)
+            stats["completion_tokens"] += int(completion_tokens)
+            stats["prompt_tokens_saved"] += max(int(prompt_tokens_saved), 0)
+            if reported:
+                stats["reported_calls"] += 1
+            if latency is not None:
+                stats["latency_total"] += latency
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {name: dict(stats) for name, stats in self._endpoints.items()}
+
+        for stats in endpoints.values():
+            calls = stats["calls"]
+            stats["avg_prompt_tokens"] = round(stats["prompt_tokens"] / calls, 1)
+            stats["avg_completion_tokens"] = round(stats["completion_tokens"] / calls, 1)
+            stats["avg_latency_ms"] = round(stats.pop("latency_total") / calls * 1000, 1)
+
+        return {
+            "endpoints": endpoints,
+            "total_prompt_tokens": sum(s["prompt_tokens"] for s in endpoints.values()),
+            "total_completion_tokens": sum(s["completion_tokens"] for s in endpoints.values()),
+            "total_prompt_tokens_saved": sum(s["prompt_tokens_saved"] for s in endpoints.values())
+        }
@@ -2,16 +2,19 @@ import matplotlib.pyplot as plt
 import numpy as np
 import io
 import re
-import json
 import math
 
+from dataset_loader import DATASET_SOURCE, DatasetFormatError, iter_items
+from plot_lock import serialised_plotting
+
 # Load dataset (with all graph data you provided)
 def load_dataset():
+    """Dataset entries that carry plotting instructions or matplotlib code, streamed from the loader"""
     try:
-        with open("trig_dataset.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("⚠️ Dataset not found.")
+        return [item for _, item in iter_items(DATASET_SOURCE)
+                if item.get("plotting_instructions") or item.get("matplotlib_code")]
+    except (FileNotFoundError, DatasetFormatError) as e:
+        print(f"⚠️ Dataset not available: {e}")
         return []
 
 dataset = load_dataset()
@@ -19,14 +22,23 @@ dataset = load_dataset()
 # ---------------------------
 # 1️⃣ Find question in dataset
 # ---------------------------
-# In trig_graphs.py, update the find_dataset_graph function:
+def _normalise_math(text):
+    """Lowercase, brackets dropped and spaces removed inside expressions but kept between words,
+    so 'y = sin(x) for 0° ≤ x' and 'y = sin x for 0° ≤ x' compare equal"""
+    text = re.sub(r"[()\[\]]", " ", text.lower())
+    text = re.sub(r"\s*([=+\-*/^])\s*", r"\1", text)
+    text = re.sub(r"\b(sin|cos|tan|sec|cosec|csc|cot)\s+", r"\1", text)    # sin x -> sinx
+    text = re.sub(r"(\d)\s+(?=sin|cos|tan|sec|cosec|csc|cot|[xθπ](?!\w))", r"\1", text)    # 2 sin -> 2sin
+    return re.sub(r"\s+", " ", text).strip()
+
 
 def find_dataset_graph(question):
-    """Find matching graph in dataset - FIXED VERSION"""
+    """Find the dataset graph for a question: same question, or the same plotted equation"""
     if not dataset or not isinstance(dataset, list):
         return None
         
-    question_lower = question.lower()
+    normalised_question = _normalise_math(question)
+    best_item, best_length = None, 0
     
     for item in dataset:
         # Skip if item is not a dictionary
@@ -34,26 +46,29 @@ def find_dataset_graph(question):
             continue
             
         item_question = item.get("question", "")
-        if not isinstance(item_question, str):
+        if isinstance(item_question, str) and _normalise_math(item_question) == normalised_question:
+            return item
+        
+        plotting_instructions = item.get("plotting_instructions", {})
+        if not isinstance(plotting_instructions, dict):
+            continue
+        equation = plotting_instructions.get("equation", "")
+        if not isinstance(equation, str) or not equation:
             continue
-            
-        item_question_lower = item_question.lower()
         
-        # Check if this is a graph-related question
-        if "graph" in item_question_lower or "sketch" in item_question_lower:
-            # Match based on function name (sin, cos, tan)
-            if any(func in question_lower for func in ["sin", "cos", "tan"]):
-                plotting_instructions = item.get("plotting_instructions", {})
-                if isinstance(plotting_instructions, dict):
-                    equation = plotting_instructions.get("equation", "").lower()
-                    if equation and any(func in equation for func in ["sin", "cos", "tan"]):
-                        return item
-    return None
+        # The whole equation must appear, not just a prefix of a longer one (y = sin x vs y = sin x + 1);
+        # words or a full stop after it are fine
+        normalised_equation = _normalise_math(equation)
+        if (len(normalised_equation) > best_length and
+                re.search(re.escape(normalised_equation) + r"(?![\w+\-*/^]|\.\d)", normalised_question)):
+            best_item, best_length = item, len(normalised_equation)
+    return best_item
 
 
 # ---------------------------
 # 2️⃣ Execute dataset matplotlib code
 # ---------------------------
+@serialised_plotting
 def execute_matplotlib_code(code):
     plt.close("all")  # reset current figure
     namespace = {"plt": plt, "np": np, "math": math}
@@ -176,6 +191,7 @@ def parse_trig_equation(equation):
     return func_type, a, b, c, d
 
 
+@serialised_plotting
 def generate_custom_graph(equation, use_radians=False):
     """
     Generates professional trigonometric graphs with key points
@@ -357,7 +373,7 @@ def generate_graph_for_question(question):
     # Step 1: Check dataset
     item = find_dataset_graph(question)
     if item and "matplotlib_code" in item:
-        print(f"✅ Found dataset-based graph for: {item['topic']}")
+        print(f"✅ Found dataset-based graph for: {item.get('topic', item.get('id', 'dataset item'))}")
         return execute_matplotlib_code(item["matplotlib_code"])
     
     # Step 2: Extract equation from question or use question as equation
@@ -1,102 +1,114 @@
 import joblib
 import os
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import re
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import tempfile
 import base64
+from dataclasses import dataclass
 from io import BytesIO
+from typing import Any, Optional, Tuple
 from template_manager import TrigTemplateManager
+from lexical_index import LexicalIndex
+from retrieval_index import CategoryPartitionedIndex
+from ann_index import IVFIndex
+from columnar_store import COLUMNS, ColumnarStore
+from plot_lock import serialised_plotting
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "true_ai_tutor.pkl")
 
 
-class ConversationMemory:
-    """Class to handle conversation memory and context"""
-    
-    def __init__(self):
-        self.current_question = None
-        self.current_solution = None
-        self.current_steps = None
-        self.current_final_answer = None
-        self.current_question_idx = None
-        self.step_explanations = {}
-    
-    def store_conversation(self, question, solution_steps, final_answer, question_idx):
-        """Store the current conversation context"""
-        self.current_question = question
-        self.current_solution = solution_steps
-        self.current_final_answer = final_answer
-        self.current_question_idx = question_idx
-        
-     
-        self.step_explanations = self._extract_step_explanations(solution_steps)
-    
-    def _extract_step_explanations(self, solution_steps):
-        """Extract step numbers and their explanations from solution steps"""
-        explanations = {}
-        current_step = None
-    
-        for step in solution_steps:
-            step_text = str(step)
-        
-     
-            step_match = re.search(r'Step\s*(\d+)', step_text, re.IGNORECASE)
-            if step_match:
-               current_step = int(step_match.group(1))
-               explanations[current_step] = step_text
-       
-            elif current_step and ('explanation' in step_text.lower() or '' in step_text):
-                 explanations[current_step] = step_text
+def _extract_step_explanations(solution_steps):
+    """Extract step numbers and their explanations from solution steps"""
+    explanations = {}
+    current_step = None
+
+    for step in solution_steps:
+        step_text = str(step)
+
+        step_match = re.search(r'Step\s*(\d+)', step_text, re.IGNORECASE)
+        if step_match:
+            current_step = int(step_match.group(1))
+            explanations[current_step] = step_text
+        elif current_step and ('explanation' in step_text.lower() or '' in step_text):
+            explanations[current_step] = step_text
         # If it's a continuation of the current step
-            elif current_step and step_text.strip():
-                if current_step in explanations:
-                   explanations[current_step] += "\n" + step_text
-                else:
-                   explanations[current_step] = step_text
-    
-        return explanations
-    
-    def get_step_explanation(self, step_number):
-        """Get explanation for a specific step number"""
-        return self.step_explanations.get(step_number, None)
-    
-    def clear_memory(self):
-        """Clear the conversation memory"""
-        self.current_question = None
-        self.current_solution = None
-        self.current_steps = None
-        self.current_final_answer = None
-        self.current_question_idx = None
-        self.step_explanations = {}
-    
-    def has_active_conversation(self):
-        """Check if there's an active conversation"""
-        return self.current_question is not None
+        elif current_step and step_text.strip():
+            if current_step in explanations:
+                explanations[current_step] += "\n" + step_text
+            else:
+                explanations[current_step] = step_text
+
+    return explanations
+
+
+@dataclass(frozen=True)
+class ConversationContext:
+    """What a conversation last solved. Immutable: solve() returns a new context instead of changing this one"""
+    question: Optional[str] = None
+    solution_steps: Tuple[str, ...] = ()
+    final_answer: Optional[str] = None
+    question_idx: Any = None
+    step_explanations: Tuple[Tuple[int, str], ...] = ()
+
+    @classmethod
+    def from_solution(cls, question, solution_steps, final_answer, question_idx) -> "ConversationContext":
+        steps = tuple(str(step) for step in (solution_steps or []))
+        return cls(question, steps, final_answer, question_idx,
+                   tuple(sorted(_extract_step_explanations(steps).items())))
+
+    def has_active_conversation(self) -> bool:
+        return self.question is not None
+
+    def get_step_explanation(self, step_number) -> Optional[str]:
+        return dict(self.step_explanations).get(step_number)
+
+
+EMPTY_CONTEXT = ConversationContext()
+
 
 class TrigSolver:
-    def __init__(self):
+    """Read-only after load_model: solve() keeps no per-request state, so one instance serves every thread"""
+    
+    def __init__(self, model_data=None):
         self.model_data = None
-        self.memory = ConversationMemory()
         self.template_manager = TrigTemplateManager()
-        self.load_model()
+        self.store = None
+        self.lexical_index = None
+        self.retrieval_index = None
+        self.load_model(model_data)
     
-    def load_model(self):
-        """Load the trained AI model"""
+    def load_model(self, model_data=None):
+        """Load the trained AI model, or use an artifact already loaded by the model registry"""
         try:
-            self.model_data = joblib.load(MODEL_PATH)
+            model_data = model_data if model_data is not None else joblib.load(MODEL_PATH)
+            # Solutions, answers, ids, categories and plotting data are read from the columnar store
+            self.store = ColumnarStore.from_model_data(model_data)
+            self.model_data = {key: value for key, value in model_data.items()
+                               if key not in COLUMNS and key != 'columnar_store'}
             print(" AI Tutor model loaded successfully!")
             print(f"Loaded {len(self.model_data['questions'])} questions")
-            print(f" Loaded {len(self.model_data['solutions'])} solutions")
-            if 'final_answers' in self.model_data:
-                final_answers_count = sum(1 for fa in self.model_data['final_answers'] if fa)
-                print(f"Loaded {final_answers_count} final answers")
+            print(f" Loaded {len(self.store)} solutions ({len(self.store.blob) / 1024:.0f} KiB of step text)")
+            final_answers_count = int(np.count_nonzero(np.diff(self.store.offsets)[self.store.final_answers]))
+            print(f"Loaded {final_answers_count} final answers")
+            if self.model_data.get('lexical_index'):
+                self.lexical_index = LexicalIndex.from_dict(self.model_data['lexical_index'])
+            else:
+                # Artifacts trained before the lexical index: build it from the stored questions
+                self.lexical_index = LexicalIndex.build(self.model_data['questions'])
+            ann_index = IVFIndex.from_dict(self.model_data['ann_index']) if self.model_data.get('ann_index') else None
+            self.retrieval_index = CategoryPartitionedIndex(self.model_data['question_embeddings'],
+                                                            self.model_data.get('question_patterns', {}), ann_index)
+            if self.model_data.get('category_thresholds'):
+                self.retrieval_index.set_category_thresholds(self.store.column('categories'),
+                                                             self.model_data['category_thresholds'],
+                                                             self.model_data['similarity_threshold'])
         except Exception as e:
             print(f" Error loading model: {e}")
             self.model_data = None
+            self.store = None
 
     def _ai_analyze_user_request(self, user_question):
         """AI analyzes what solution approach the user wants - OPTIMIZED FOR YOUR DATASET"""
@@ -147,9 +159,9 @@ class TrigSolver:
         
         return intent
 
-    def _is_follow_up_question(self, user_question):
+    def _is_follow_up_question(self, user_question, context):
         """Check if the user is asking a follow-up question about the current solution"""
-        if not self.memory.has_active_conversation():
+        if not context.has_active_conversation():
             return False
         
         user_lower = user_question.lower()
@@ -185,12 +197,12 @@ class TrigSolver:
         
         return False
 
-    def _handle_follow_up_question(self, user_question, step_number):
+    def _handle_follow_up_question(self, user_question, step_number, context):
         """Handle follow-up questions about specific steps or general explanation"""
         if step_number == 'general':
-            return self._provide_general_explanation()
+            return self._provide_general_explanation(context)
         
-        explanation = self.memory.get_step_explanation(step_number)
+        explanation = context.get_step_explanation(step_number)
         
         if explanation:
             response = {
@@ -216,15 +228,15 @@ class TrigSolver:
         
         return self._make_serializable(response)
 
-    def _provide_general_explanation(self):
+    def _provide_general_explanation(self, context):
         """Provide a general explanation of the current solution"""
-        if not self.memory.has_active_conversation():
+        if not context.has_active_conversation():
             return self._error_response("No active conversation to explain.")
         
         enhanced_steps = ["🤔 Let me explain this solution in more detail:\n"]
         
         # Add all steps with enhanced formatting
-        for step_num, explanation in self.memory.step_explanations.items():
+        for step_num, explanation in context.step_explanations:
             enhanced_steps.append(f"📝 **Step {step_num}:** {explanation}")
         
         enhanced_steps.append("\n💡 Remember: Each step builds on the previous one using trigonometric identities and algebraic manipulation.")
@@ -241,46 +253,52 @@ class TrigSolver:
         
         return self._make_serializable(response)
 
-    def ai_find_best_match(self, user_question):
-        """AI finds the best matching question using MULTIPLE INTELLIGENT STRATEGIES"""
+    def ai_find_best_match(self, user_question, return_embedding=False):
+        """AI finds the best matching question using MULTIPLE INTELLIGENT STRATEGIES
+
+        With return_embedding=True the result is (matches, embedding), where embedding is
+        the question's MiniLM vector, or None if a lexical match made encoding unnecessary.
+        """
+        matches, embedding = self._find_best_match(user_question)
+        return (matches, embedding) if return_embedding else matches
+
+    def _find_best_match(self, user_question):
         if not self.model_data:
-            return []
+            return [], None
         
         # Check if semantic model components are available
         if 'semantic_model' not in self.model_data or 'question_embeddings' not in self.model_data:
             print("❌ Semantic model components not loaded properly")
-            return []
+            return [], None
         
+        user_embedding = None
         try:
-            user_embedding = self.model_data['semantic_model'].encode([user_question])
-            semantic_similarities = cosine_similarity(user_embedding, self.model_data['question_embeddings'])[0]
+            # Exact and near-exact textbook questions are answered from the lexical index, no encoding needed
+            if self.lexical_index is not None:
+                exact_idx = self.lexical_index.exact_match(user_question)
+                if exact_idx is not None:
+                    return [(exact_idx, 1.0, "lexical_exact")], None
+                near = self.lexical_index.near_exact(user_question)
+                if near is not None:
+                    return [(near[0], near[1], "lexical_near_exact")], None
             
-            semantic_matches = []
-            for i, similarity in enumerate(semantic_similarities):
-                if similarity >= self.model_data['similarity_threshold']:
-                    semantic_matches.append((i, similarity, "ai_semantic"))
+            user_embedding = self.model_data['semantic_model'].encode([user_question])
+            # BM25 over maths tokens lifts questions with the same functions, powers and numbers
+            lexical_scores = self.lexical_index.score(user_question)['bm25'] if self.lexical_index is not None else None
             
+            # Only the rows sharing the question's detected type and functions are scored
             user_intent = self._ai_analyze_question_intent(user_question)
-            pattern_matches = []
+            method = "ai_hybrid" if lexical_scores is not None else "ai_semantic"
+            pattern_method = f"ai_pattern_{user_intent['patterns'][0]}" if user_intent['patterns'] else method
+            results = self.retrieval_index.search(
+                user_embedding[0], user_intent['patterns'], self.model_data['similarity_threshold'], lexical_scores)
             
-            for pattern in user_intent['patterns']:
-                if pattern in self.model_data['question_patterns']:
-                    for question_idx in self.model_data['question_patterns'][pattern]:
-                        similarity = cosine_similarity(
-                            user_embedding, 
-                            [self.model_data['question_embeddings'][question_idx]]
-                        )[0][0]
-                        if similarity >= self.model_data['similarity_threshold'] - 0.1:
-                            pattern_matches.append((question_idx, similarity, f"ai_pattern_{pattern}"))
-            
-            all_matches = semantic_matches + pattern_matches
-            all_matches.sort(key=lambda x: x[1], reverse=True)
-            
-            return all_matches
+            return [(idx, similarity, method if above_threshold else pattern_method)
+                    for idx, similarity, above_threshold in results], user_embedding[0]
             
         except Exception as e:
             print(f"❌ Error in semantic matching: {e}")
-            return []
+            return [], (None if user_embedding is None else user_embedding[0])
 
     def _ai_analyze_question_intent(self, question):
         """AI analyzes what the question is asking for"""
@@ -314,13 +332,11 @@ class TrigSolver:
     def get_solution_from_dataset(self, question_idx, user_question):
         """GET ORIGINAL SOLUTION FROM DATASET - Enhanced for your format"""
         try:
-            main_solution = self.model_data['solutions'][question_idx]
-            alternative_solution = self.model_data['alternative_solutions'][question_idx]
+            main_solution = self.store.solution(question_idx)
+            alternative_solution = self.store.alternative_solution(question_idx)
             
             # Get final_answer from dataset if available
-            final_answer = None
-            if 'final_answers' in self.model_data and question_idx < len(self.model_data['final_answers']):
-                final_answer = self.model_data['final_answers'][question_idx]
+            final_answer = self.store.final_answer(question_idx) or None
             
             user_intent = self._ai_analyze_user_request(user_question)
             
@@ -474,6 +490,7 @@ class TrigSolver:
         # Priority 3: If no clear answer found, return the last step
         return solution_steps[-1]
 
+    @serialised_plotting
     def generate_graph(self, plotting_instructions, question_text):
         """Generate graph from plotting instructions or matplotlib code"""
         try:
@@ -556,19 +573,23 @@ class TrigSolver:
             print(f"❌ Error generating from instructions: {e}")
             return None
 
-    def solve(self, user_question):
-        """Main solving function - ALWAYS try template first with enhanced NLP"""
+    def solve(self, user_question, context=None):
+        """Main solving function - ALWAYS try template first with enhanced NLP
+        
+        Returns (result, context): the conversation context to pass to the next call.
+        The given context is never modified, so concurrent callers cannot see each other's solutions.
+        """
+        context = context or EMPTY_CONTEXT
         if not self.model_data:
-            return self._error_response("AI model not loaded. Please train the model first.")
+            return self._error_response("AI model not loaded. Please train the model first."), context
 
         # Check if this is a follow-up question
-        follow_up_step = self._is_follow_up_question(user_question)
+        follow_up_step = self._is_follow_up_question(user_question, context)
         if follow_up_step:
-            return self._handle_follow_up_question(user_question, follow_up_step)
+            return self._handle_follow_up_question(user_question, follow_up_step, context), context
 
         # Check if user wants to clear conversation
         if user_question.lower() in ['clear', 'reset', 'new question', 'start over']:
-            self.memory.clear_memory()
             return self._make_serializable({
                 "final_answer": "🔄 Conversation cleared. Ask me a new trigonometry question!",
                 "solution_steps": ["Conversation memory has been cleared."],
@@ -576,7 +597,7 @@ class TrigSolver:
                 "method": "conversation_clear",
                 "source": "ai_tutor",
                 "conversational_response": True
-            })
+            }), EMPTY_CONTEXT
 
         # ALWAYS try template first (now with enhanced NLP capabilities)
         template_result = self.template_manager.solve_with_template(user_question)
@@ -600,21 +621,21 @@ class TrigSolver:
                 response['has_graph'] = True
                 response['graph_image'] = template_result.get('graph_image')
             
-            # Store in conversation memory
-            self.memory.store_conversation(
+            # Remember it for follow-up questions
+            new_context = ConversationContext.from_solution(
                 user_question, 
                 template_result.get('solution_steps', []), 
                 template_result.get('final_answer', ''), 
                 "template_nlp"
             )
             
-            return self._make_serializable(response)
+            return self._make_serializable(response), new_context
 
         # Fallback to semantic only if template completely fails
         print(f"🔍 Template failed or low confidence, using semantic fallback for: '{user_question}'")
-        return self._fallback_semantic_solution(user_question)
+        return self._fallback_semantic_solution(user_question, context)
 
-    def _fallback_semantic_solution(self, user_question):
+    def _fallback_semantic_solution(self, user_question, context):
         """Fallback to semantic matching when templates don't work"""
         print(f"🔍 Using SEMANTIC matching for: '{user_question}'")
         
@@ -623,14 +644,14 @@ class TrigSolver:
         
         # Handle pure help requests
         if user_intent['request_type'] == 'help' and not self._contains_math_content(user_question):
-            return self._provide_general_help(user_question)
+            return self._provide_general_help(user_question), context
 
         # Find best match using semantic approach
         ai_matches = self.ai_find_best_match(user_question)
         
         if not ai_matches:
             print("❌ No semantic matches found")
-            return self._no_match_response()
+            return self._no_match_response(), context
 
         best_idx, confidence, method = ai_matches[0]
         print(f"🔍 Semantic match found: idx={best_idx}, confidence={confidence:.3f}")
@@ -638,14 +659,14 @@ class TrigSolver:
         # Get enhanced solution
         solution_steps, solution_type, final_answer = self.get_solution_from_dataset(best_idx, user_question)
 
-        # Store in conversation memory
-        self.memory.store_conversation(user_question, solution_steps, final_answer, best_idx)
+        # Remember it for follow-up questions
+        new_context = ConversationContext.from_solution(user_question, solution_steps, final_answer, best_idx)
 
         # Generate graph if available
         graph_image = None
         has_plotting_data = False
-        if 'plotting_data' in self.model_data and best_idx < len(self.model_data["plotting_data"]):
-            plotting_data = self.model_data["plotting_data"][best_idx]
+        if best_idx < len(self.store):
+            plotting_data = self.store.plotting(best_idx)
             if plotting_data:
                 graph_image = self.generate_graph(plotting_data, self.model_data["questions"][best_idx])
                 has_plotting_data = bool(plotting_data)
@@ -675,8 +696,10 @@ class TrigSolver:
             "method": str(method),
             "source": "semantic_dataset",
             "matched_question": str(self.model_data["questions"][best_idx]),
-            "category": str(self.model_data["categories"][best_idx]),
-            "question_id": str(self.model_data["question_ids"][best_idx]),
+            "category": self.store.category(best_idx),
+            "question_id": self.store.question_id(best_idx),
+            "alias_question_ids": [str(alias["id"]) for alias in
+                                   self.model_data.get("question_aliases", {}).get(best_idx, [])],
             "solution_type": str(solution_type),
             "has_graph": bool(graph_image is not None),
             "graph_image": str(graph_image) if graph_image else None,
@@ -685,7 +708,7 @@ class TrigSolver:
             "fallback_used": True
         }
 
-        return self._make_serializable(response)
+        return self._make_serializable(response), new_context
 
     def _error_response(self, message):
         return {
@@ -720,10 +743,10 @@ class TrigSolver:
         return obj
 
 # Simple usage function
-def solve_question(question):
-    """Simple function to solve a question with conversation memory"""
+def solve_question(question, context=None):
+    """Simple function to solve a question; returns (result, context) for follow-ups"""
     solver = TrigSolver()
-    return solver.solve(question)
+    return solver.solve(question, context)
 
 # Interactive testing with conversation memory
 if __name__ == "__main__":
@@ -739,13 +762,14 @@ if __name__ == "__main__":
     print("🔄 Type 'clear' to start a new conversation")
     print("=" * 60)
     
+    context = None
     while True:
         user_input = input("\n🎯 Your question (or 'quit'): ").strip()
         
         if user_input.lower() in ['quit', 'exit']:
             break
         
-        result = solver.solve(user_input)
+        result, context = solver.solve(user_input, context)
         
         print(f"\n🤖 AI Analysis:")
         print(f"   Confidence: {result['confidence']:.3f}")
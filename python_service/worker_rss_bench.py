@@ -0,0 +1,160 @@
+# worker_rss_bench.py
+"""
+Per-worker memory of the pre-fork server, with and without model preload.
+
+For each mode this starts gunicorn with gunicorn.conf.py, waits for /health
+and sends a few /solve requests so every worker touches the model. It then
+reads /proc/<pid>/smaps_rollup for the master and each worker:
+
+    Rss      resident pages, counting shared pages in full for every process
+    Pss      shared pages divided between the processes sharing them
+    Shared   pages also mapped by another process (copy-on-write from the master)
+    Private  pages only this process has (its own copies)
+
+With preload the model pages stay shared, so Pss and Private per worker drop.
+The sum of Pss is the real footprint of the whole server.
+
+    python worker_rss_bench.py --workers 4 --threads 4
+    python worker_rss_bench.py --modes preload --json rss.json
+
+The server defaults to one worker because conversations and student progress
+are still per-process (see gunicorn.conf.py); this bench starts several only
+to measure what sharing the model would save once that state moves out.
+
+Linux only (/proc).
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import requests
+
+SOLVE_QUESTIONS = [
+    "Solve sin x = 0.5 for 0° ≤ x ≤ 360°",
+    "Prove that sin²θ + cos²θ = 1",
+    "Solve the equation 2/cosθ = 7 - 3cosθ for 0° ≤ θ ≤ 360°",
+    "Prove that cotx - tanx = 2cot2x",
+]
+_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def smaps_rollup(pid: int) -> Dict[str, int]:
+    """Memory counters of one process in KiB"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in _FIELDS:
+                values[name] = int(rest.split()[0])
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+        "private": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+            return [int(child) for child in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def run_mode(preload: bool, workers: int, threads: int, port: int, requests_per_worker: int,
+             startup_timeout: float) -> Dict[str, Any]:
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "GUNICORN_THREADS": str(threads),
+           "PORT": str(port), "GUNICORN_PRELOAD": "1" if preload else "0"}
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:application"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        started = time.time()
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+            if time.time() - started > startup_timeout:
+                raise RuntimeError(f"server not ready after {startup_timeout:.0f}s")
+            try:
+                if requests.get(f"{base_url}/health", timeout=2).ok and len(child_pids(server.pid)) >= workers:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        ready_seconds = time.time() - started
+
+        # Enough requests that every worker has answered a few
+        for i in range(requests_per_worker * workers):
+            question = SOLVE_QUESTIONS[i % len(SOLVE_QUESTIONS)]
+            requests.post(f"{base_url}/solve", json={"question": question}, timeout=60)
+
+        master = smaps_rollup(server.pid)
+        worker_stats = [{"pid": pid, **smaps_rollup(pid)} for pid in child_pids(server.pid)]
+        return {
+            "preload": preload,
+            "ready_seconds": round(ready_seconds, 1),
+            "master": master,
+            "workers": worker_stats,
+            "total_pss_kib": master["pss"] + sum(w["pss"] for w in worker_stats),
+            "total_rss_kib": master["rss"] + sum(w["rss"] for w in worker_stats),
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def print_report(result: Dict[str, Any]):
+    mib = lambda kib: f"{kib / 1024:8.1f}"
+    mode = "preload" if result["preload"] else "no preload"
+    print(f"\n📊 {mode}: ready in {result['ready_seconds']}s")
+    print(f"   {'process':<14}{'RSS MiB':>9}{'PSS MiB':>9}{'shared':>9}{'private':>9}")
+    rows = [("master", result["master"])] + [(f"worker {w['pid']}", w) for w in result["workers"]]
+    for name, stats in rows:
+        print(f"   {name:<14}{mib(stats['rss'])} {mib(stats['pss'])} {mib(stats['shared'])} {mib(stats['private'])}")
+    print(f"   {'total':<14}{mib(result['total_rss_kib'])} {mib(result['total_pss_kib'])}   (PSS total = real footprint)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker RSS/PSS of the gunicorn server")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--port", type=int, default=7100)
+    parser.add_argument("--modes", nargs="+", choices=["preload", "no-preload"], default=["preload", "no-preload"])
+    parser.add_argument("--requests-per-worker", type=int, default=5)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("❌ /proc/<pid>/smaps_rollup is not available (Linux 4.14+ only)")
+
+    results = []
+    for mode in args.modes:
+        result = run_mode(mode == "preload", args.workers, args.threads, args.port,
+                          args.requests_per_worker, args.startup_timeout)
+        print_report(result)
+        results.append(result)
+
+    if len(results) == 2:
+        preload, separate = sorted(results, key=lambda r: not r["preload"])
+        saved = separate["total_pss_kib"] - preload["total_pss_kib"]
+        print(f"\n💾 Preload saves {saved / 1024:.1f} MiB in total "
+              f"({saved / 1024 / max(args.workers, 1):.1f} MiB per worker)")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+# wsgi.py
+"""
+WSGI entry point for production.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+With preload_app (the default in gunicorn.conf.py) this module is imported
+once, in the gunicorn master. The model registry, the retrieval indexes and
+the lesson data are loaded there, before any worker is forked, so every
+worker starts with the same physical pages and only copies the ones it
+writes to.
+"""
+import gc
+
+from app import app, model_registry
+
+application = app
+
+# Everything allocated during startup is long-lived; collect the garbage once now,
+# then gunicorn.conf.py freezes the survivors before forking
+gc.collect()
+
+__all__ = ["application", "model_registry"]